@@ -1,27 +1,94 @@
 # backend/auth.py
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from pydantic import BaseModel
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
+from .metrics import LatencyWindow
+import asyncio
 import os
+import time
 
 # Загрузка переменных окружения
 load_dotenv()
 
 # Настройки для JWT
-SECRET_KEY = os.getenv("SECRET_KEY", "your_default_secret_key") 
+SECRET_KEY = os.getenv("SECRET_KEY", "your_default_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Размер кэша проверенных токенов
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+
+# Ограничения для хеширования паролей вне event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 32))
+
 # Контекст для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Схема OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+class Principal(BaseModel):
+    """Данные пользователя, извлечённые из проверенного токена."""
+    user_id: int
+    email: str
+    role: str
+
+class TokenCache:
+    """LRU-кэш проверенных токенов: токен -> (Principal, время истечения)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Principal]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.time():
+            # Токен истёк — удаляем его, дальше decode вернёт ошибку
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return principal
+
+    def put(self, token: str, principal: Principal, expires_at: float):
+        if self.maxsize <= 0:
+            return
+        self._entries[token] = (principal, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка соответствия пароля хешу."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -30,6 +97,71 @@ def get_password_hash(password: str) -> str:
     """Хеширование пароля."""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Выполнение bcrypt в отдельном пуле потоков с ограничением очереди.
+
+    bcrypt занимает ~200 мс CPU и освобождает GIL, поэтому в потоках он не блокирует
+    event loop. Если в работе и в очереди уже слишком много задач, запрос сразу
+    отклоняется с 503, а не копится.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self.wait = LatencyWindow()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def run(self, func, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        submitted_at = time.perf_counter()
+
+        def task():
+            # Время ожидания в очереди — от постановки до начала выполнения
+            self.wait.record(time.perf_counter() - submitted_at)
+            return func(*args)
+
+        # Место освобождается, когда поток закончил работу, а не когда ожидающий запрос
+        # отменён: иначе отменённые запросы обходят ограничение очереди
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(task)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.pending -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": min(self.pending, self.workers),
+            "queue_depth": max(self.pending - self.workers, 0),
+            "rejected": self.rejected,
+            "queue_wait": self.wait.stats(),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля в пуле потоков, не блокируя event loop."""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Хеширование пароля в пуле потоков, не блокируя event loop."""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """Создание JWT токена."""
     to_encode = data.copy()
@@ -39,4 +171,41 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def decode_access_token(token: str) -> Principal:
+    """Проверка JWT токена с использованием кэша. Бросает JWTError для невалидного токена."""
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email = payload.get("sub")
+    role = payload.get("role")
+    user_id = payload.get("user_id")
+    expires_at = payload.get("exp")
+    if email is None or role is None or user_id is None or expires_at is None:
+        raise JWTError("В токене отсутствуют обязательные поля")
+
+    principal = Principal(user_id=user_id, email=email, role=role)
+    token_cache.put(token, principal, float(expires_at))
+    return principal
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Общая зависимость: проверяет токен один раз за запрос и возвращает Principal."""
+    try:
+        return decode_access_token(token)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный токен.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+def require_roles(*roles: str):
+    """Создание зависимости, пропускающей только пользователей с указанными ролями."""
+    async def dependency(principal: Principal = Depends(get_current_principal)) -> Principal:
+        if principal.role not in roles:
+            raise HTTPException(status_code=403, detail="Доступ запрещён")
+        return principal
+    return dependency
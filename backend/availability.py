@@ -0,0 +1,76 @@
+# backend/availability.py
+
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+def _parse_time(value: str) -> time:
+    return datetime.strptime(value, "%H:%M").time()
+
+# Рабочий день антикафе; если закрытие не позже открытия, оно приходится на следующие сутки
+OPENING_TIME = _parse_time(os.getenv('OPENING_TIME', '10:00'))
+CLOSING_TIME = _parse_time(os.getenv('CLOSING_TIME', '01:00'))
+
+# Бронирование не длиннее суток: выборка бронирований, начавшихся раньше
+# первого рабочего дня, ограничивается этим запасом
+MAX_BOOKING_LENGTH = timedelta(days=1)
+
+def workday_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Начало и конец рабочего дня, открывающегося в указанную дату."""
+    start = datetime.combine(day, OPENING_TIME)
+    end = datetime.combine(day, CLOSING_TIME)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+def workdays(date_from: date, date_to: date) -> List[Tuple[datetime, datetime]]:
+    """Рабочие дни с date_from по date_to включительно, по возрастанию."""
+    return [workday_bounds(date_from + timedelta(days=i)) for i in range((date_to - date_from).days + 1)]
+
+def free_windows(
+    bookings: Iterable,
+    resource_ids: List[int],
+    date_from: date,
+    date_to: date,
+    min_minutes: int = 0,
+) -> Dict[int, List[Dict]]:
+    """
+    Свободные окна ресурсов за рабочие дни [date_from, date_to].
+
+    bookings — строки с resource_id, start_time, end_time (datetime), отсортированные
+    по (resource_id, start_time), как их возвращает запрос booking_list_for_availability.
+    Для каждого ресурса бронирования и рабочие дни проходятся одним совместным проходом.
+    Окна короче min_minutes отбрасываются.
+    """
+    days = workdays(date_from, date_to)
+    min_length = timedelta(minutes=min_minutes)
+
+    by_resource: Dict[int, List[Tuple[datetime, datetime]]] = {r_id: [] for r_id in resource_ids}
+    for booking in bookings:
+        by_resource.setdefault(booking['resource_id'], []).append((booking['start_time'], booking['end_time']))
+
+    result: Dict[int, List[Dict]] = {}
+    for r_id in resource_ids:
+        reserved = by_resource[r_id]
+        windows = []
+        first = 0
+        for day_start, day_end in days:
+            # Бронирования, закончившиеся до начала дня, не влияют ни на этот, ни на следующие дни
+            while first < len(reserved) and reserved[first][1] <= day_start:
+                first += 1
+            current = day_start
+            i = first
+            while i < len(reserved) and reserved[i][0] < day_end:
+                reserved_start, reserved_end = reserved[i]
+                if reserved_start > current:
+                    _append_window(windows, current, reserved_start, min_length)
+                current = max(current, reserved_end)
+                i += 1
+            if current < day_end:
+                _append_window(windows, current, day_end, min_length)
+        result[r_id] = windows
+    return result
+
+def _append_window(windows: List[Dict], start: datetime, end: datetime, min_length: timedelta):
+    if end - start >= min_length:
+        windows.append({"start_time": start, "end_time": end})
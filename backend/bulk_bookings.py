@@ -0,0 +1,160 @@
+# backend/bulk_bookings.py
+
+import logging
+import os
+from datetime import timedelta
+from typing import Dict, List
+import asyncpg
+from fastapi import HTTPException
+from . import queries
+from .models import BookingCreate, RecurrenceRule
+
+logger = logging.getLogger(__name__)
+
+# Максимум бронирований в одном запросе (после разворачивания правила повторения)
+MAX_BULK_BOOKINGS = int(os.getenv('MAX_BULK_BOOKINGS', 500))
+# Повторы транзакции, если параллельное бронирование заняло время между проверкой и вставкой
+BULK_RETRIES = 3
+
+BULK_MODES = ("all_or_nothing", "partial")
+RECURRENCE_STEPS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+def expand_recurrence(first: BookingCreate, rule: RecurrenceRule) -> List[BookingCreate]:
+    """Повторения бронирования first по правилу: каждые interval дней или недель, count раз или до until."""
+    if rule.frequency not in RECURRENCE_STEPS:
+        raise HTTPException(status_code=400, detail="Частота повторения: daily или weekly.")
+    if rule.interval < 1:
+        raise HTTPException(status_code=400, detail="Интервал повторения должен быть не меньше 1.")
+    if rule.count is None and rule.until is None:
+        raise HTTPException(status_code=400, detail="Укажите число повторений или дату окончания.")
+    step = RECURRENCE_STEPS[rule.frequency] * rule.interval
+    occurrences = []
+    start_time, end_time = first.start_time, first.end_time
+    while (rule.count is None or len(occurrences) < rule.count) and (rule.until is None or start_time <= rule.until):
+        if len(occurrences) >= MAX_BULK_BOOKINGS:
+            raise HTTPException(status_code=400, detail=f"Не больше {MAX_BULK_BOOKINGS} бронирований за один запрос.")
+        occurrences.append(first.copy(update={"start_time": start_time, "end_time": end_time}))
+        start_time, end_time = start_time + step, end_time + step
+    return occurrences
+
+def _item(index: int, booking: BookingCreate) -> Dict:
+    return {
+        "index": index,
+        "user_id": booking.user_id,
+        "resource_id": booking.resource_id,
+        "start_time": booking.start_time,
+        "end_time": booking.end_time,
+        "status": booking.status,
+        "result": None,
+        "booking_id": None,
+        "conflict_booking_id": None,
+        "error": None,
+    }
+
+def _fail(item: Dict, result: str, error: str, conflict_booking_id: int = None):
+    item["result"] = result
+    item["error"] = error
+    item["conflict_booking_id"] = conflict_booking_id
+
+def _mark_batch_overlaps(items: List[Dict]):
+    """Пересечения активных бронирований внутри запроса: остаётся более раннее по порядку в запросе."""
+    by_resource: Dict[int, List[Dict]] = {}
+    for item in items:
+        if item["result"] is None and item["status"] == "active":
+            by_resource.setdefault(item["resource_id"], []).append(item)
+    for group in by_resource.values():
+        accepted: List[Dict] = []
+        for item in group:
+            clash = next(
+                (other for other in accepted
+                 if other["start_time"] < item["end_time"] and item["start_time"] < other["end_time"]),
+                None,
+            )
+            if clash is not None:
+                _fail(item, "conflict", f"Пересекается с бронированием №{clash['index']} этого запроса.")
+            else:
+                accepted.append(item)
+
+async def _check(conn, items: List[Dict]):
+    """Проверка всех бронирований тремя запросами независимо от их числа."""
+    refs = await queries.fetchrow(
+        conn, "booking_bulk_refs",
+        list({item["user_id"] for item in items}), list({item["resource_id"] for item in items}),
+    )
+    user_ids, resource_ids = set(refs["user_ids"]), set(refs["resource_ids"])
+    for item in items:
+        if item["result"] is not None:
+            continue
+        if item["user_id"] not in user_ids:
+            _fail(item, "invalid", "Пользователь не найден.")
+        elif item["resource_id"] not in resource_ids:
+            _fail(item, "invalid", "Ресурс не найден.")
+
+    _mark_batch_overlaps(items)
+
+    # С существующими бронированиями сравниваются только активные: ограничение
+    # bookings_no_overlap действует для status = 'active'
+    active = [item for item in items if item["result"] is None and item["status"] == "active"]
+    if not active:
+        return
+    conflicts = await queries.fetch(
+        conn, "booking_bulk_conflicts",
+        [item["index"] for item in active],
+        [item["resource_id"] for item in active],
+        [item["start_time"] for item in active],
+        [item["end_time"] for item in active],
+    )
+    for row in conflicts:
+        _fail(items[row["idx"]], "conflict", "Ресурс уже забронирован на указанное время.", row["booking_id"])
+
+async def create_bookings(pool, bookings: List[BookingCreate], mode: str) -> Dict:
+    """
+    Создание бронирований в одной транзакции: проверка набором запросов и вставка
+    одним INSERT ... SELECT FROM unnest. В режиме all_or_nothing при любой ошибке
+    ничего не вставляется, в режиме partial вставляются прошедшие проверку.
+    """
+    items = [_item(index, booking) for index, booking in enumerate(bookings)]
+    for item in items:
+        if item["end_time"] <= item["start_time"]:
+            _fail(item, "invalid", "Время окончания должно быть позже времени начала.")
+    invalid = {item["index"] for item in items if item["result"] is not None}
+
+    async with pool.acquire() as conn:
+        for attempt in range(1, BULK_RETRIES + 1):
+            for item in items:
+                if item["index"] not in invalid:
+                    item.update(result=None, booking_id=None, conflict_booking_id=None, error=None)
+            try:
+                async with conn.transaction():
+                    await _check(conn, items)
+                    failed = any(item["result"] is not None for item in items)
+                    if failed and mode == "all_or_nothing":
+                        for item in items:
+                            if item["result"] is None:
+                                item["result"] = "skipped"
+                        break
+                    pending = [item for item in items if item["result"] is None]
+                    if pending:
+                        rows = await queries.fetch(
+                            conn, "booking_bulk_insert",
+                            [item["user_id"] for item in pending],
+                            [item["resource_id"] for item in pending],
+                            [item["start_time"] for item in pending],
+                            [item["end_time"] for item in pending],
+                            [item["status"] for item in pending],
+                        )
+                        # ord — позиция во входных массивах, начиная с 1
+                        for row in rows:
+                            item = pending[row["ord"] - 1]
+                            item["result"] = "created"
+                            item["booking_id"] = row["booking_id"]
+                break
+            except asyncpg.exceptions.ExclusionViolationError:
+                # Параллельное бронирование заняло время после проверки — проверка повторяется
+                if attempt == BULK_RETRIES:
+                    raise
+                logger.info(f"Пакет бронирований пересёкся с параллельной вставкой, повтор {attempt}")
+
+    created = sum(1 for item in items if item["result"] == "created")
+    logger.info(f"Пакет бронирований: создано {created} из {len(items)}")
+    return {"created": created, "failed": len(items) - created, "items": items}
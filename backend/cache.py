@@ -0,0 +1,192 @@
+# backend/cache.py
+
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional
+from . import queries
+from .database import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+class RoleTable:
+    """Таблица Roles в памяти процесса. Загружается при старте и перечитывается при промахе."""
+
+    def __init__(self):
+        self._by_id: Dict[int, str] = {}
+        self._by_name: Dict[str, int] = {}
+
+    async def load(self, conn):
+        rows = await queries.fetch(conn, "role_list")
+        self._by_id = {row['role_id']: row['role_name'] for row in rows}
+        self._by_name = {row['role_name']: row['role_id'] for row in rows}
+        logger.info(f"Загружено ролей: {len(self._by_id)}")
+
+    async def name(self, conn, role_id: int) -> Optional[str]:
+        """Имя роли по id; при неизвестном id таблица перечитывается из базы."""
+        if role_id not in self._by_id:
+            await self.load(conn)
+        return self._by_id.get(role_id)
+
+    async def id(self, conn, role_name: str) -> Optional[int]:
+        """Id роли по имени; при неизвестном имени таблица перечитывается из базы."""
+        if role_name not in self._by_name:
+            await self.load(conn)
+        return self._by_name.get(role_name)
+
+    def all(self) -> List[Dict]:
+        return [{"role_id": role_id, "role_name": name} for role_id, name in self._by_id.items()]
+
+role_table = RoleTable()
+
+class OpenSessionIndex:
+    """Открытые сессии (end_time IS NULL) по user_id в памяти процесса.
+
+    Загружается при старте и обновляется обработчиками, которые открывают, закрывают
+    и удаляют сессии, поэтому проверка «есть ли у клиента открытая сессия» и список
+    клиентов в зале не обращаются к базе.
+    """
+
+    def __init__(self):
+        self._by_user: Dict[int, Dict] = {}
+        self._user_by_session: Dict[int, int] = {}
+
+    async def load(self, conn):
+        rows = await queries.fetch(conn, "session_open_list")
+        self._by_user = {}
+        self._user_by_session = {}
+        # Строки отсортированы по start_time: у пользователя остаётся самая поздняя сессия
+        for row in rows:
+            self.opened(dict(row))
+        logger.info(f"Загружено открытых сессий: {len(self._by_user)}")
+
+    async def refresh_users(self, conn, user_ids: List[int]):
+        """
+        Перечитывание открытых сессий указанных пользователей из базы. Записи заменяются
+        после ответа базы, поэтому во время запроса пользователь не пропадает из зала.
+        """
+        rows = await queries.fetch(conn, "session_open_by_users", user_ids)
+        for user_id in user_ids:
+            self.remove_user(user_id)
+        for row in rows:
+            self.opened(dict(row))
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        return self._by_user.get(user_id)
+
+    def all(self) -> List[Dict]:
+        return sorted(self._by_user.values(), key=lambda session: session['start_time'])
+
+    def opened(self, session: Dict):
+        previous = self._by_user.get(session['user_id'])
+        if previous is not None:
+            self._user_by_session.pop(previous['session_id'], None)
+        self._by_user[session['user_id']] = session
+        self._user_by_session[session['session_id']] = session['user_id']
+
+    def closed(self, session_id: int):
+        """Сессия закрыта или удалена."""
+        user_id = self._user_by_session.pop(session_id, None)
+        if user_id is not None:
+            self._by_user.pop(user_id, None)
+
+    def remove_user(self, user_id: int):
+        session = self._by_user.pop(user_id, None)
+        if session is not None:
+            self._user_by_session.pop(session['session_id'], None)
+
+    def __len__(self):
+        return len(self._by_user)
+
+open_sessions = OpenSessionIndex()
+
+class ResourceCatalog:
+    """Каталог ресурсов в памяти процесса с готовым JSON-ответом и ETag.
+
+    Ответ сериализуется один раз при загрузке; ETag — хэш его содержимого, поэтому
+    у всех процессов с одинаковым каталогом он совпадает. Изменение ресурсов сбрасывает
+    каталог, следующий запрос перечитывает его из базы.
+    """
+
+    def __init__(self):
+        self._resources: Optional[List[Dict]] = None
+        self._names: Dict[int, str] = {}
+        self.body = b"[]"
+        self.etag = ""
+        self.version = 0
+
+    async def load(self, conn):
+        rows = await queries.fetch(conn, "resource_list")
+        resources = [
+            {
+                "resource_id": row['resource_id'],
+                "name": row['name'],
+                "description": row['description'],
+                "hourly_rate": float(row['hourly_rate']),
+            }
+            for row in rows
+        ]
+        self.body = json.dumps(resources, ensure_ascii=False).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self._resources = resources
+        self._names = {resource["resource_id"]: resource["name"] for resource in resources}
+        self.version += 1
+        logger.info(f"Загружено ресурсов: {len(resources)}, версия каталога {self.version}")
+
+    async def ensure_loaded(self, conn):
+        if self._resources is None:
+            await self.load(conn)
+
+    def invalidate(self):
+        self._resources = None
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Совпадает ли заголовок If-None-Match с текущим ETag."""
+        if not if_none_match or self._resources is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags or f"W/{self.etag}" in tags
+
+    def all(self) -> List[Dict]:
+        return self._resources or []
+
+    def names(self, resource_ids) -> Dict[int, str]:
+        """Названия ресурсов по id; неизвестные id пропускаются."""
+        return {resource_id: self._names[resource_id] for resource_id in resource_ids if resource_id in self._names}
+
+resource_catalog = ResourceCatalog()
+
+# --- Инвалидация между процессами (database.InvalidationBus) ---
+# Роли API не меняет: RoleTable перечитывается при неизвестном id или имени
+# и при переподключении слушателя, отдельной темы для неё нет.
+
+OPEN_SESSIONS_TOPIC = "open_sessions"
+RESOURCES_TOPIC = "resources"
+
+async def publish_open_sessions(conn, user_ids: Optional[List[int]] = None):
+    """Сообщить другим процессам об изменении открытых сессий; None — изменились все."""
+    await invalidation_bus.publish(conn, OPEN_SESSIONS_TOPIC, {"user_ids": user_ids})
+
+async def publish_resources(conn):
+    """Сообщить другим процессам об изменении каталога ресурсов."""
+    await invalidation_bus.publish(conn, RESOURCES_TOPIC)
+
+async def _resources_changed(pool, data: Dict):
+    resource_catalog.invalidate()
+
+async def _open_sessions_changed(pool, data: Dict):
+    async with pool.acquire() as conn:
+        if data.get("user_ids") is None:
+            await open_sessions.load(conn)
+        else:
+            await open_sessions.refresh_users(conn, data["user_ids"])
+
+async def _reload_all(pool):
+    async with pool.acquire() as conn:
+        await role_table.load(conn)
+        await open_sessions.load(conn)
+    resource_catalog.invalidate()
+
+invalidation_bus.subscribe(OPEN_SESSIONS_TOPIC, _open_sessions_changed)
+invalidation_bus.subscribe(RESOURCES_TOPIC, _resources_changed)
+invalidation_bus.on_reconnect(_reload_all)
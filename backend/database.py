@@ -1,10 +1,17 @@
 # backend/database.py
 
+import asyncio
 import asyncpg
+import json
 import os
 import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from .metrics import LatencyWindow
+from . import queries
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
@@ -18,17 +25,282 @@ DATABASE_CONFIG = {
     'port': int(os.getenv('POSTGRES_PORT', 5432))
 }
 
+# Параметры пула соединений
+POOL_CONFIG = {
+    'min_size': int(os.getenv('POSTGRES_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10)),
+    'max_inactive_connection_lifetime': float(os.getenv('POSTGRES_POOL_MAX_INACTIVE_LIFETIME', 300)),
+    'statement_cache_size': int(os.getenv('POSTGRES_STATEMENT_CACHE_SIZE', queries.statement_cache_size())),
+    'command_timeout': float(os.getenv('POSTGRES_COMMAND_TIMEOUT', 30)),
+}
+
+# Повторные попытки подключения при старте
+CONNECT_RETRIES = int(os.getenv('POSTGRES_CONNECT_RETRIES', 5))
+CONNECT_BACKOFF = float(os.getenv('POSTGRES_CONNECT_BACKOFF', 0.5))
+
+# Параметры сессии для каждого нового соединения, например
+# "application_name=anticafe;statement_timeout=5000".
+# Передаются при подключении (server_settings) и становятся значениями сессии
+# по умолчанию, поэтому переживают RESET ALL, который пул выполняет при возврате соединения.
+SESSION_SETTINGS = {
+    name.strip(): value.strip()
+    for name, value in (
+        item.split('=', 1)
+        for item in os.getenv('POSTGRES_SESSION_SETTINGS', '').split(';')
+        if '=' in item
+    )
+}
+
+ConnectionHook = Callable[[asyncpg.Connection], Awaitable[None]]
+
+# Хуки, вызываемые для каждого нового соединения пула (init) и при каждой выдаче соединения (setup)
+_init_hooks: List[ConnectionHook] = []
+_setup_hooks: List[ConnectionHook] = []
+
+def register_connection_init(hook: ConnectionHook):
+    """Регистрация хука, выполняемого один раз для каждого нового соединения пула."""
+    _init_hooks.append(hook)
+
+def register_connection_setup(hook: ConnectionHook):
+    """Регистрация хука, выполняемого каждый раз при выдаче соединения из пула."""
+    _setup_hooks.append(hook)
+
+async def _set_json_codecs(conn: asyncpg.Connection):
+    # json/jsonb приходят из базы уже разобранными
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+register_connection_init(_set_json_codecs)
+
+async def _init_connection(conn: asyncpg.Connection):
+    for hook in _init_hooks:
+        await hook(conn)
+
+async def _setup_connection(conn: asyncpg.Connection):
+    for hook in _setup_hooks:
+        await hook(conn)
+
+class _TimedAcquire:
+    """Контекстный менеджер выдачи соединения с замером времени ожидания."""
+
+    def __init__(self, context, wait: LatencyWindow):
+        self._context = context
+        self._wait = wait
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        conn = await self._context.__aenter__()
+        self._wait.record(time.perf_counter() - started)
+        return conn
+
+    async def __aexit__(self, *exc):
+        return await self._context.__aexit__(*exc)
+
+class ObservablePool:
+    """Обёртка над asyncpg.Pool, собирающая время ожидания соединения."""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+        self.acquire_wait = LatencyWindow()
+
+    def acquire(self, *, timeout=None):
+        return _TimedAcquire(self._pool.acquire(timeout=timeout), self.acquire_wait)
+
+    def stats(self) -> Dict:
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "size": size,
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "idle": idle,
+            "in_use": size - idle,
+            "acquire_wait": self.acquire_wait.stats(),
+        }
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+async def create_pool() -> ObservablePool:
+    """Создание пула с повторными попытками и экспоненциальной задержкой."""
+    for attempt in range(1, CONNECT_RETRIES + 1):
+        try:
+            pool = await asyncpg.create_pool(
+                **DATABASE_CONFIG,
+                **POOL_CONFIG,
+                server_settings=SESSION_SETTINGS or None,
+                init=_init_connection,
+                setup=_setup_connection if _setup_hooks else None,
+            )
+            return ObservablePool(pool)
+        except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            if attempt == CONNECT_RETRIES:
+                raise
+            delay = CONNECT_BACKOFF * 2 ** (attempt - 1)
+            logging.warning(f"Не удалось подключиться к базе (попытка {attempt}/{CONNECT_RETRIES}): {e}. Повтор через {delay} с")
+            await asyncio.sleep(delay)
+
+# Канал LISTEN/NOTIFY для событий инвалидации кэшей между процессами
+INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'anticafe_cache')
+# Пауза перед переподключением слушателя и период проверки его соединения
+INVALIDATION_RECONNECT_DELAY = float(os.getenv('CACHE_INVALIDATION_RECONNECT_DELAY', 1))
+INVALIDATION_KEEPALIVE = float(os.getenv('CACHE_INVALIDATION_KEEPALIVE', 30))
+
+InvalidationHandler = Callable[[ObservablePool, Dict], Awaitable[None]]
+RefreshHandler = Callable[[ObservablePool], Awaitable[None]]
+
+class InvalidationBus:
+    """Шина инвалидации кэшей процесса через Postgres LISTEN/NOTIFY.
+
+    Обработчик, изменивший данные, публикует событие (тема + данные) через pg_notify;
+    внутри транзакции оно уходит только после COMMIT. Каждый процесс слушает канал
+    на отдельном соединении вне пула и передаёт чужие события подписчикам темы,
+    свои события пропускает — локальный кэш уже обновлён обработчиком.
+    События одной темы обрабатываются по очереди в порядке получения (одна задача-обработчик
+    на тему), поэтому более позднее перечитывание не может завершиться раньше предыдущего.
+    Пока слушатель был отключён, события могли потеряться, поэтому после
+    переподключения все кэши перезагружаются целиком.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        # Идентификатор процесса-отправителя
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.reconnects = 0
+        # Задержка доставки события от публикации до обработки в этом процессе
+        self.delivery_lag = LatencyWindow()
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._refreshers: List[RefreshHandler] = []
+        self._pool = None
+        self._task = None
+        # Очередь событий и задача-обработчик для каждой темы
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._consumers: Dict[str, asyncio.Task] = {}
+
+    def subscribe(self, topic: str, handler: InvalidationHandler):
+        """Подписка на события темы от других процессов: handler(pool, data)."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def on_reconnect(self, refresher: RefreshHandler):
+        """Полная перезагрузка кэша после переподключения слушателя: refresher(pool)."""
+        self._refreshers.append(refresher)
+
+    async def publish(self, conn, topic: str, data: Dict = None):
+        """Публикация события; вызывается на соединении, которое изменило данные."""
+        payload = json.dumps({"origin": self.origin, "topic": topic, "data": data or {}, "sent": time.time()})
+        await queries.execute(conn, "cache_notify", self.channel, payload)
+        self.published += 1
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logging.warning(f"Некорректное событие инвалидации: {payload}")
+            return
+        if event.get("origin") == self.origin:
+            return
+        self.received += 1
+        self.delivery_lag.record(max(time.time() - event.get("sent", time.time()), 0))
+        topic = event.get("topic")
+        if topic not in self._handlers:
+            return
+        if topic not in self._queues:
+            self._queues[topic] = asyncio.Queue()
+            self._consumers[topic] = asyncio.create_task(self._consume(topic, self._queues[topic]))
+        self._queues[topic].put_nowait(event.get("data", {}))
+
+    async def _consume(self, topic: str, queue: asyncio.Queue):
+        while True:
+            data = await queue.get()
+            for handler in self._handlers[topic]:
+                try:
+                    await handler(self._pool, data)
+                except Exception as e:
+                    logging.error(f"Ошибка обработки события инвалидации {topic}: {e}")
+
+    async def _refresh_all(self):
+        for refresher in self._refreshers:
+            try:
+                await refresher(self._pool)
+            except Exception as e:
+                logging.error(f"Ошибка перезагрузки кэша: {e}")
+
+    async def _listen(self):
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**DATABASE_CONFIG)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                if connected_before:
+                    self.reconnects += 1
+                    logging.info("Слушатель инвалидации переподключён, кэши перезагружаются")
+                    await self._refresh_all()
+                connected_before = True
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=INVALIDATION_KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        # Разрыв без закрытия сокета обнаруживается только запросом
+                        await conn.execute("SELECT 1", timeout=INVALIDATION_KEEPALIVE)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Соединение слушателя инвалидации потеряно: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            await asyncio.sleep(INVALIDATION_RECONNECT_DELAY)
+
+    def start(self, pool):
+        self._pool = pool
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        for consumer in self._consumers.values():
+            consumer.cancel()
+        self._consumers = {}
+        self._queues = {}
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "published": self.published,
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "queued": sum(queue.qsize() for queue in self._queues.values()),
+            "delivery_lag": self.delivery_lag.stats(),
+        }
+
+invalidation_bus = InvalidationBus(INVALIDATION_CHANNEL)
+
 async def init_db(app: FastAPI):
     """Инициализация пула соединений с базой данных и сохранение его в состоянии приложения."""
+    app.state.pool = None
+    logging.info(f"Database config: {dict(DATABASE_CONFIG, password='***')}, pool config: {POOL_CONFIG}")
     try:
-        logging.info(f"Database config: {DATABASE_CONFIG}")
-        app.state.pool = await asyncpg.create_pool(**DATABASE_CONFIG)
+        app.state.pool = await create_pool()
         logging.info("Pool created")
+        invalidation_bus.start(app.state.pool)
     except Exception as e:
+        # Без пула приложение не может обслуживать запросы — прерываем запуск
         logging.error(f"Error connecting to the database: {e}")
+        raise
 
 async def close_db(app: FastAPI):
     """Закрытие пула соединений с базой данных."""
+    await invalidation_bus.stop()
     if hasattr(app.state, 'pool') and app.state.pool:
         await app.state.pool.close()
-        logging.info("Pool closed")
\ No newline at end of file
+        logging.info("Pool closed")
@@ -0,0 +1,95 @@
+# backend/export.py
+
+import csv
+import io
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional
+from .pagination import KeysetQuery
+from .queries import LIST_QUERIES
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк курсор забирает с сервера за раз; столько же строк уходит в одном куске ответа
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 1000))
+
+# Таблицы, доступные для выгрузки: основа запроса, ключ сортировки и колонка времени для фильтра
+EXPORT_TABLES = {
+    "bookings": {"query": "booking_page", "key": "booking_id", "time_column": "start_time"},
+    "sessions": {"query": "session_page", "key": "session_id", "time_column": "start_time"},
+    "payments": {"query": "payment_page", "key": "payment_id", "time_column": "payment_date"},
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+def export_query(table: str, user_id: Optional[int], date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Запрос выгрузки таблицы с фильтрами; строки идут по возрастанию первичного ключа."""
+    spec = EXPORT_TABLES[table]
+    query = KeysetQuery(LIST_QUERIES[spec["query"]], [(spec["key"], int)], descending=False)
+    query.where("user_id = {}", user_id)
+    query.where(f"{spec['time_column']} >= {{}}", date_from)
+    query.where(f"{spec['time_column']} < {{}}", date_to)
+    return query.build_all()
+
+def _csv_value(value: Any):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _csv_header(columns: List[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+def _encode_chunk(rows: List, fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([_csv_value(v) for v in row.values()] for row in rows)
+        return buffer.getvalue().encode()
+    # Строки кодируются так же, как ответы API: Decimal — числом, время — в ISO 8601
+    return b"".join(dumps(dict(row)) + b"\n" for row in rows)
+
+def _compress(compressor, data: bytes) -> bytes:
+    return compressor.compress(data) if compressor else data
+
+async def stream_export(pool, sql: str, args: List, fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    """
+    Потоковая выгрузка результата запроса кусками по EXPORT_CHUNK_ROWS строк.
+
+    Серверный курсор asyncpg живёт только внутри транзакции, поэтому соединение
+    занято всё время выгрузки. В памяти одновременно находится не больше одного куска,
+    первый кусок отправляется клиенту до того, как запрос прочитан до конца.
+    Заголовок CSV берётся из описания колонок запроса и отправляется, даже если строк нет.
+    При compress=True поток сжимается в формат gzip.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    total = 0
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            stmt = await conn.prepare(sql)
+            if fmt == "csv":
+                yield _compress(compressor, _csv_header([attr.name for attr in stmt.get_attributes()]))
+            chunk = []
+            async for row in stmt.cursor(*args, prefetch=EXPORT_CHUNK_ROWS):
+                chunk.append(row)
+                if len(chunk) >= EXPORT_CHUNK_ROWS:
+                    data = _encode_chunk(chunk, fmt)
+                    total += len(chunk)
+                    chunk = []
+                    yield _compress(compressor, data)
+            if chunk:
+                data = _encode_chunk(chunk, fmt)
+                total += len(chunk)
+                yield _compress(compressor, data)
+    if compressor:
+        yield compressor.flush()
+    logger.info(f"Выгрузка завершена: {total} строк")
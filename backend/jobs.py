@@ -0,0 +1,121 @@
+# backend/jobs.py
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from . import queries
+from .availability import CLOSING_TIME
+from .cache import open_sessions, publish_open_sessions
+
+logger = logging.getLogger(__name__)
+
+# Запускать ли задачу закрытия по расписанию в этом процессе
+CLOSING_JOB_ENABLED = os.getenv('CLOSING_JOB_ENABLED', '1') == '1'
+# Сколько строк обновляется одним оператором; каждая пачка — отдельная короткая транзакция
+CLOSING_JOB_BATCH_SIZE = int(os.getenv('CLOSING_JOB_BATCH_SIZE', 500))
+# Ключ advisory-блокировки: плановый запуск выполняет только воркер, получивший её
+CLOSING_JOB_LOCK_KEY = int(os.getenv('CLOSING_JOB_LOCK_KEY', 7240001))
+
+def next_closing(now: datetime) -> datetime:
+    """Ближайший после now момент закрытия антикафе."""
+    closing = datetime.combine(now.date(), CLOSING_TIME)
+    if closing <= now:
+        closing += timedelta(days=1)
+    return closing
+
+def _forget_sessions(rows):
+    for row in rows:
+        open_sessions.closed(row['session_id'])
+
+class ClosingJob:
+    """Закрытие дня: завершение открытых сессий и истёкших активных бронирований.
+
+    Строки обновляются пачками по batch_size с FOR UPDATE SKIP LOCKED: каждая пачка
+    коммитится сразу, блокировки держатся миллисекунды, а строки, которые в этот момент
+    меняет сотрудник, пропускаются и попадут в следующую пачку или следующий запуск.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.last_run: Optional[Dict] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _drain(self, pool, query_name: str, cutoff: datetime, on_rows=None) -> int:
+        total = 0
+        while True:
+            async with pool.acquire() as conn:
+                rows = await queries.fetch(conn, query_name, cutoff, self.batch_size)
+            if on_rows is not None:
+                on_rows(rows)
+            total += len(rows)
+            if len(rows) < self.batch_size:
+                return total
+
+    async def run(self, pool, cutoff: datetime) -> Dict:
+        """Один запуск: сессии закрываются временем cutoff, бронирования с end_time <= cutoff завершаются."""
+        async with self._lock:
+            started = time.perf_counter()
+            sessions = await self._drain(pool, "job_close_open_sessions", cutoff, _forget_sessions)
+            bookings = await self._drain(pool, "job_complete_expired_bookings", cutoff)
+            if sessions:
+                async with pool.acquire() as conn:
+                    await publish_open_sessions(conn)
+            elapsed = time.perf_counter() - started
+            self.last_run = {
+                "cutoff": cutoff,
+                "sessions_closed": sessions,
+                "bookings_completed": bookings,
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "rows_per_second": round((sessions + bookings) / elapsed) if elapsed > 0 else 0,
+            }
+            logger.info(
+                f"Закрытие дня: сессий закрыто {sessions}, бронирований завершено {bookings} "
+                f"за {elapsed:.3f} с ({self.last_run['rows_per_second']} строк/с)"
+            )
+            return self.last_run
+
+    async def run_elected(self, pool, cutoff: datetime) -> Optional[Dict]:
+        """Запуск только в одном воркере: остальные видят занятую блокировку и пропускают его.
+
+        Воркер, проснувшийся после освобождения блокировки, повторит запуск с тем же
+        cutoff, но тот ничего не изменит: строки уже закрыты первым исполнителем.
+        """
+        async with pool.acquire() as conn:
+            if not await queries.fetchval(conn, "job_try_lock", CLOSING_JOB_LOCK_KEY):
+                logger.info("Закрытие дня выполняет другой воркер, запуск пропущен")
+                return None
+            try:
+                return await self.run(pool, cutoff)
+            finally:
+                await queries.fetchval(conn, "job_unlock", CLOSING_JOB_LOCK_KEY)
+
+    async def _schedule(self, pool):
+        while True:
+            closing = next_closing(datetime.now())
+            await asyncio.sleep((closing - datetime.now()).total_seconds())
+            try:
+                await self.run_elected(pool, closing)
+            except Exception as e:
+                # Ошибка одного запуска не останавливает расписание
+                logger.error(f"Ошибка задачи закрытия дня: {e}")
+
+    def start(self, pool):
+        """Запуск расписания в фоне (из startup-хука приложения)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule(pool))
+            logger.info(f"Задача закрытия дня запланирована на {next_closing(datetime.now())}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+closing_job = ClosingJob(CLOSING_JOB_BATCH_SIZE)
@@ -1,26 +1,28 @@
 from typing import List, Dict  # Убедитесь, что импортировали List
-from fastapi import FastAPI, Depends, HTTPException, status
-from .database import init_db, close_db
-from .models import User, Token
-from .schemas import UserRegister, UserLogin as UserLoginSchema
-from .auth import verify_password, get_password_hash, create_access_token, oauth2_scheme
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from .database import init_db, close_db, invalidation_bus
+from .cache import role_table, open_sessions, publish_open_sessions, resource_catalog, publish_resources
+from .availability import free_windows, workday_bounds, MAX_BOOKING_LENGTH
+from . import queries
+from .jobs import CLOSING_JOB_ENABLED, closing_job
+from .bulk_bookings import BULK_MODES, MAX_BULK_BOOKINGS, create_bookings, expand_recurrence
+from .export import EXPORT_FORMATS, EXPORT_TABLES, export_query, stream_export
+from .pagination import KeysetQuery, DEFAULT_LIMIT, MAX_LIMIT, NEXT_CURSOR_HEADER, parse_datetime
+from .schemas import UserRegister, AdminUserCreate, UserLogin as UserLoginSchema
+from .auth import verify_password_async, get_password_hash_async, create_access_token, oauth2_scheme
+from .auth import Principal, get_current_principal, require_roles, token_cache, password_hasher
 from .models import User, Token, Booking, BookingCreate, Resource, ResourceCreate, Session, SessionCreate, Payment, PaymentCreate
-from jose import JWTError, jwt
+from .models import StaffDashboard, CheckoutRequest, CheckoutResult, SessionEnd, BulkBookingCreate, BulkBookingResult, LookupLabels
+from .pricing import visit_cost
+from .serialization import RowEncoder, json_response, rows_response
 from datetime import timedelta
+import asyncpg
 import logging
 from typing import Optional
-import os
 from datetime import datetime
-from dotenv import load_dotenv  # Для загрузки переменных окружения
 
 
-# Загрузка переменных окружения из .env файла
-load_dotenv()
-
-# Глобальные переменные
-SECRET_KEY = os.getenv("SECRET_KEY", "your_default_secret_key")
-ALGORITHM = "HS256"
-
 app = FastAPI(title="Система Управления Антикафе")
 
 # Настройка логирования
@@ -31,10 +33,19 @@ logger.setLevel(logging.DEBUG)
 @app.on_event("startup")
 async def startup_event():
     await init_db(app)
+    pool = getattr(app.state, 'pool', None)
+    if pool is not None:
+        async with pool.acquire() as conn:
+            await role_table.load(conn)
+            await open_sessions.load(conn)
+        if CLOSING_JOB_ENABLED:
+            closing_job.start(pool)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await closing_job.stop()
     await close_db(app)
+    password_hasher.shutdown()
 
 @app.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
 async def register(user: UserRegister):
@@ -42,32 +53,23 @@ async def register(user: UserRegister):
     if pool is None:
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
     
+    hashed_pw = await get_password_hash_async(user.password)
+    
     async with pool.acquire() as conn:
-        # Проверка наличия пользователя с таким email
-        existing_user = await conn.fetchrow("SELECT * FROM Users WHERE email = $1", user.email)
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует.")
-        
-        # Получение role_id для роли 'client'
-        client_role = await conn.fetchrow("SELECT role_id FROM Roles WHERE role_name = 'client'")
-        if not client_role:
+        # Получение role_id для роли 'client' из таблицы ролей в памяти
+        role_id = await role_table.id(conn, 'client')
+        if role_id is None:
             raise HTTPException(status_code=500, detail="Роль 'client' не найдена в базе данных.")
-        role_id = client_role['role_id']
         
-        hashed_pw = get_password_hash(user.password)
-        
-        # Вставка нового пользователя
+        # Вставка нового пользователя; занятый email проверяется уникальным индексом
         try:
-            user_id = await conn.fetchval("""
-                INSERT INTO Users (first_name, last_name, email, password_hash, role_id)
-                VALUES ($1, $2, $3, $4, $5)
-                RETURNING user_id
-            """, user.first_name, user.last_name, user.email, hashed_pw, role_id)
+            user_id = await queries.fetchval(
+                conn, "user_insert", user.first_name, user.last_name, user.email, hashed_pw, role_id
+            )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Ошибка при регистрации: {e}")
-        
-        # Получение имени роли
-        role_name = await conn.fetchval("SELECT role_name FROM Roles WHERE role_id = $1", role_id)
+        if user_id is None:
+            raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует.")
         
         return User(
             user_id=user_id,
@@ -75,7 +77,7 @@ async def register(user: UserRegister):
             last_name=user.last_name,
             email=user.email,
             role_id=role_id,
-            role_name=role_name
+            role_name='client'
         )
 
 @app.post("/login", response_model=Token)
@@ -85,49 +87,39 @@ async def login(user: UserLoginSchema):
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
     
     async with pool.acquire() as conn:
-        db_user = await conn.fetchrow("SELECT * FROM Users WHERE email = $1", user.email)
+        db_user = await queries.fetchrow(conn, "user_credentials_by_email", user.email)
         if not db_user:
             raise HTTPException(status_code=400, detail="Неверный email или пароль.")
-        if not verify_password(user.password, db_user['password_hash']):
-            raise HTTPException(status_code=400, detail="Неверный email или пароль.")
-        
-        # Получение имени роли
-        role_name = await conn.fetchval("SELECT role_name FROM Roles WHERE role_id = $1", db_user['role_id'])
-        
-        # Создание JWT токена
-        access_token_expires = timedelta(minutes=30)
-        access_token = create_access_token(
-            data={"sub": db_user['email'], "role": role_name},  # Передаём role_name вместо role_id
-            expires_delta=access_token_expires
-        )
-        return Token(access_token=access_token, token_type="bearer")
-@app.get("/users/me", response_model=User)
-async def read_users_me(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Неверный токен.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        role: str = payload.get("role")
-        if role is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        # Имя роли берётся из таблицы в памяти, без отдельного запроса
+        role_name = await role_table.name(conn, db_user['role_id'])
     
+    # Проверка пароля выполняется уже после возврата соединения в пул
+    if not await verify_password_async(user.password, db_user['password_hash']):
+        raise HTTPException(status_code=400, detail="Неверный email или пароль.")
+    
+    # Создание JWT токена
+    access_token_expires = timedelta(minutes=30)
+    access_token = create_access_token(
+        data={"sub": db_user['email'], "role": role_name, "user_id": db_user['user_id']},  # Передаём role_name вместо role_id
+        expires_delta=access_token_expires
+    )
+    return Token(access_token=access_token, token_type="bearer")
+
+@app.get("/users/me", response_model=User)
+async def read_users_me(principal: Principal = Depends(get_current_principal)):
     pool = app.state.pool
     if pool is None:
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
     
     async with pool.acquire() as conn:
-        db_user = await conn.fetchrow("SELECT * FROM Users WHERE email = $1", email)
+        db_user = await queries.fetchrow(conn, "user_profile_by_id", principal.user_id)
         if db_user is None:
-            raise credentials_exception
-        role_name = await conn.fetchval("SELECT role_name FROM Roles WHERE role_id = $1", db_user['role_id'])
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Неверный токен.",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        role_name = await role_table.name(conn, db_user['role_id'])
         return User(
             user_id=db_user['user_id'],
             first_name=db_user['first_name'],
@@ -137,90 +129,142 @@ async def read_users_me(token: str = Depends(oauth2_scheme)):
             role_name=role_name
         )
 
-# Проверка роли администратора
-def admin_required(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        role = payload.get("role")
-        if role != "admin":
-            raise HTTPException(status_code=403, detail="Доступ запрещён")
-    except JWTError:
-        raise HTTPException(status_code=403, detail="Доступ запрещён")
-
-def admin_staff_required(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        role = payload.get("role")
-        if (role != "admin") and (role != "staff"):
-            raise HTTPException(status_code=403, detail="Доступ запрещён")
-    except JWTError:
-        raise HTTPException(status_code=403, detail="Доступ запрещён")
+# Проверка ролей: токен проверяется один раз в get_current_principal
+admin_required = require_roles("admin")
+admin_staff_required = require_roles("admin", "staff")
+all_required = require_roles("admin", "client", "staff")
+staff_required = require_roles("staff")
 
-def all_required(token: str = Depends(oauth2_scheme)):
+@app.get("/health/ready")
+async def health_ready():
+    """Готовность к работе: доступность базы и состояние пула соединений"""
+    pool = getattr(app.state, 'pool', None)
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Пул соединений не инициализирован.")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        role = payload.get("role")
-        if (role != "admin") and (role != "client") and (role != "staff"):
-            raise HTTPException(status_code=403, detail="Доступ запрещён")
-    except JWTError:
-        raise HTTPException(status_code=403, detail="Доступ запрещён")
+        async with pool.acquire(timeout=2) as conn:
+            await conn.fetchval("SELECT 1")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"База данных недоступна: {e}")
+    return {"status": "ready", "pool": pool.stats()}
 
-def staff_required(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        role = payload.get("role")
-        if (role != "staff"):
-            raise HTTPException(status_code=403, detail="Доступ запрещён")
-    except JWTError:
-        raise HTTPException(status_code=403, detail="Доступ запрещён")
+@app.get("/metrics", dependencies=[Depends(admin_required)])
+async def get_metrics():
+    """Счётчики внутренних кэшей"""
+    return {
+        "token_cache": token_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "queries": queries.stats(),
+        "open_sessions": len(open_sessions),
+        "resource_catalog_version": resource_catalog.version,
+        "closing_job": closing_job.last_run,
+        "invalidation": invalidation_bus.stats(),
+    }
 
 # --- Маршруты для администраторов ---
-@app.get("/admin/users", dependencies=[Depends(admin_staff_required)], response_model=List[User])
-async def get_users():
-    """Получение всех пользователей"""
+async def fetch_page(query: KeysetQuery, name: str, cursor: Optional[str], limit: int, response: Response):
+    """Выполнение запроса страницы; курсор следующей страницы возвращается в заголовке X-Next-Cursor."""
+    sql, args = query.build(cursor, limit)
     pool = app.state.pool
     async with pool.acquire() as conn:
-        users = await conn.fetch("""
-            SELECT u.user_id, u.first_name, u.last_name, u.email, u.role_id, r.role_name
-            FROM Users u
-            JOIN Roles r ON u.role_id = r.role_id
-        """)
-    # Преобразуем записи в модели User
-    return [
-        User(
-            user_id=user['user_id'],
-            first_name=user['first_name'],
-            last_name=user['last_name'],
-            email=user['email'],
-            role_id=user['role_id'],
-            role_name=user['role_name']
-        )
-        for user in users
-    ]
+        rows = await queries.fetch_dynamic(conn, name, sql, *args)
+    rows, next_cursor = query.page(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+# Кодировщики строк для быстрой сериализации списков (backend/serialization.py)
+USER_ROWS = RowEncoder.for_model(User)
+BOOKING_ROWS = RowEncoder.for_model(Booking)
+SESSION_ROWS = RowEncoder.for_model(Session)
+PAYMENT_ROWS = RowEncoder.for_model(Payment)
+
+# Подписи для expand в списках: колонка с id -> добавляемое поле с подписью
+EXPAND_LABELS = {"user": ("user_id", "user_email"), "resource": ("resource_id", "resource_name")}
+# Максимум id в одном запросе подписей
+MAX_LOOKUP_IDS = MAX_LIMIT
+
+async def lookup_labels(conn, user_ids, resource_ids) -> Dict[str, Dict[int, str]]:
+    """Email пользователей одним запросом = ANY($1) и названия ресурсов из каталога в памяти."""
+    users = {}
+    if user_ids:
+        rows = await queries.fetch(conn, "user_labels", list(set(user_ids)))
+        users = {row['user_id']: row['email'] for row in rows}
+    resources = {}
+    if resource_ids:
+        await resource_catalog.ensure_loaded(conn)
+        resources = resource_catalog.names(set(resource_ids))
+    return {"users": users, "resources": resources}
+
+# Email других пользователей (expand=user) видят только эти роли
+EXPAND_USER_ROLES = ("admin", "staff")
+
+def parse_expand(expand: Optional[str], allowed: List[str], principal: Principal) -> List[str]:
+    names = [name.strip() for name in (expand or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"expand поддерживает: {', '.join(allowed)}.")
+    if "user" in names and principal.role not in EXPAND_USER_ROLES:
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+    return names
+
+async def list_response(rows, encoder: RowEncoder, response: Response, expand: List[str]):
+    """
+    Ответ списка; с expand к каждой строке добавляются подписи (user_email, resource_name),
+    полученные одним запросом для всех id страницы.
+    """
+    if not expand:
+        return rows_response(rows, encoder, response)
+    items = encoder.to_dicts(rows)
+    ids = {name: [item[EXPAND_LABELS[name][0]] for item in items] for name in expand}
+    async with app.state.pool.acquire() as conn:
+        labels = await lookup_labels(conn, ids.get("user"), ids.get("resource"))
+    for name in expand:
+        column, field = EXPAND_LABELS[name]
+        names = labels["users" if name == "user" else "resources"]
+        for item in items:
+            item[field] = names.get(item[column])
+    return json_response(items, response)
+
+@app.get("/lookup/labels", dependencies=[Depends(admin_staff_required)], response_model=LookupLabels)
+async def get_labels(user_id: List[int] = Query([]), resource_id: List[int] = Query([])):
+    """Подписи для id: email пользователей и названия ресурсов. Неизвестные id в ответ не попадают."""
+    if len(user_id) + len(resource_id) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_LOOKUP_IDS} id за один запрос.")
+    async with app.state.pool.acquire() as conn:
+        return await lookup_labels(conn, user_id, resource_id)
+
+@app.get("/admin/users", dependencies=[Depends(admin_staff_required)], response_model=List[User])
+async def get_users(
+    response: Response,
+    role_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+):
+    """Получение пользователей постранично (по возрастанию user_id)"""
+    query = KeysetQuery(queries.LIST_QUERIES["user_page"], [("u.user_id", int)], descending=False)
+    query.where("u.role_id = {}", role_id)
+    users = await fetch_page(query, "user_page", cursor, limit, response)
+    return rows_response(users, USER_ROWS, response)
 
 @app.post("/admin/users", dependencies=[Depends(admin_staff_required)])
-async def add_user(user: UserRegister):
+async def add_user(user: AdminUserCreate):
     """Добавление нового пользователя"""
     try:
         logger.info(f"Добавление нового пользователя {user.email}")
+        hashed_pw = await get_password_hash_async(user.password)
         pool = app.state.pool
         async with pool.acquire() as conn:
-            # Проверка, существует ли пользователь с таким email
-            existing_user = await conn.fetchrow("SELECT * FROM Users WHERE email = $1", user.email)
-            if existing_user:
-                raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует.")
-            
-            hashed_pw = get_password_hash(user.password)
-            # Проверка валидности роли
-            role = await conn.fetchrow("SELECT role_id FROM Roles WHERE role_id = $1", user.role_id)
-            if not role:
+            # Проверка валидности роли по таблице в памяти
+            if await role_table.name(conn, user.role_id) is None:
                 raise HTTPException(status_code=400, detail="Указанная роль не найдена.")
             
-            # Вставка нового пользователя
-            await conn.execute("""
-                INSERT INTO Users (first_name, last_name, email, password_hash, role_id)
-                VALUES ($1, $2, $3, $4, $5)
-            """, user.first_name, user.last_name, user.email, hashed_pw, user.role_id)
+            # Вставка нового пользователя; занятый email проверяется уникальным индексом
+            user_id = await queries.fetchval(
+                conn, "user_insert", user.first_name, user.last_name, user.email, hashed_pw, user.role_id
+            )
+            if user_id is None:
+                raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует.")
         return {"message": "Пользователь успешно добавлен"}
     except HTTPException as he:
         logger.error(f"HTTPException: {he.detail}")
@@ -229,48 +273,105 @@ async def add_user(user: UserRegister):
         logger.error(f"Ошибка при добавлении пользователя: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
+@app.post("/admin/jobs/closing", dependencies=[Depends(admin_required)])
+async def run_closing_job():
+    """Ручной запуск закрытия дня: открытые сессии закрываются текущим временем."""
+    pool = app.state.pool
+    if pool is None:
+        raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
+    return await closing_job.run(pool, datetime.now())
+
+# Число пользователей в ответе поиска по умолчанию и максимальное
+USER_SEARCH_LIMIT = 20
+MAX_USER_SEARCH_LIMIT = 100
+
+@app.get("/users/search", dependencies=[Depends(admin_staff_required)], response_model=List[User])
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(USER_SEARCH_LIMIT, ge=1, le=MAX_USER_SEARCH_LIMIT),
+):
+    """
+    Поиск пользователей по подстроке имени, фамилии или email (триграммный индекс
+    users_search_trgm_idx); числовой q также ищет по user_id. Лучшие совпадения первыми.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    # Символы шаблона LIKE в запросе ищутся буквально
+    pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    user_id = int(q) if q.isdecimal() and len(q) <= 9 else None
+    pool = app.state.pool
+    async with pool.acquire() as conn:
+        users = await queries.fetch(conn, "user_search", pattern, q, user_id, limit)
+    return rows_response(users, USER_ROWS)
+
 @app.get("/roles", dependencies=[Depends(admin_required)])
 async def get_roles():
     """Получение списка ролей"""
-    pool = app.state.pool
-    async with pool.acquire() as conn:
-        roles = await conn.fetch("SELECT role_id, role_name FROM Roles")
-    return [dict(role) for role in roles]
+    roles = role_table.all()
+    if not roles:
+        pool = app.state.pool
+        async with pool.acquire() as conn:
+            await role_table.load(conn)
+        roles = role_table.all()
+    return roles
 
 @app.delete("/admin/users/{user_id}", dependencies=[Depends(admin_required)])
 async def delete_user(user_id: int):
     """Удаление пользователя"""
     pool = app.state.pool
     async with pool.acquire() as conn:
-        result = await conn.execute("DELETE FROM Users WHERE user_id = $1", user_id)
+        result = await queries.execute(conn, "user_delete", user_id)
         if result == "DELETE 0":
             raise HTTPException(status_code=404, detail="Пользователь не найден.")
+        # Сессии пользователя удалены каскадом
+        await publish_open_sessions(conn, [user_id])
+    open_sessions.remove_user(user_id)
     return {"message": "Пользователь удалён"}
 
 # --- Новые маршруты для бронирований ---
 
-# Получение всех бронирований
-@app.get("/admin/bookings", dependencies=[Depends(all_required)], response_model=List[Booking])
-async def get_bookings():
-    """Получение всех бронирований"""
-    pool = app.state.pool
-    async with pool.acquire() as conn:
-        bookings = await conn.fetch("""
-            SELECT b.booking_id, b.user_id, b.resource_id, b.start_time, b.end_time, b.status
-            FROM Bookings b
-        """)
-    # Преобразуем записи в модели Booking
-    return [
-        Booking(
-            booking_id=booking['booking_id'],
-            user_id=booking['user_id'],
-            resource_id=booking['resource_id'],
-            start_time=booking['start_time'],
-            end_time=booking['end_time'],
-            status=booking['status']
-        )
-        for booking in bookings
-    ]
+# Получение бронирований
+@app.get("/admin/bookings", response_model=List[Booking])
+async def get_bookings(
+    response: Response,
+    user_id: Optional[int] = None,
+    resource_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    principal: Principal = Depends(all_required),
+):
+    """
+    Получение бронирований постранично, от новых к старым.
+    date_from/date_to ограничивают время начала: [date_from, date_to).
+    expand=user,resource добавляет к строкам user_email и resource_name (user — только админ и персонал).
+    """
+    expand_names = parse_expand(expand, ["user", "resource"], principal)
+    query = KeysetQuery(queries.LIST_QUERIES["booking_page"], [("start_time", parse_datetime), ("booking_id", int)])
+    query.where("user_id = {}", user_id)
+    query.where("resource_id = {}", resource_id)
+    query.where("status = {}", status)
+    query.where("start_time >= {}", date_from)
+    query.where("start_time < {}", date_to)
+    bookings = await fetch_page(query, "booking_page", cursor, limit, response)
+    return await list_response(bookings, BOOKING_ROWS, response, expand_names)
+
+def booking_constraint_error(e: asyncpg.PostgresError) -> Exception:
+    """Преобразование нарушения ограничений таблицы Bookings в ответ API."""
+    if isinstance(e, asyncpg.exceptions.ExclusionViolationError):
+        return HTTPException(status_code=400, detail="Ресурс уже забронирован на указанное время.")
+    if isinstance(e, asyncpg.exceptions.ForeignKeyViolationError):
+        if e.constraint_name == 'bookings_user_id_fkey':
+            return HTTPException(status_code=404, detail="Пользователь не найден.")
+        return HTTPException(status_code=404, detail="Ресурс не найден.")
+    if isinstance(e, asyncpg.exceptions.CheckViolationError) and e.constraint_name == 'bookings_time_order':
+        return HTTPException(status_code=400, detail="Время окончания должно быть позже времени начала.")
+    # Прочие ошибки (например, слишком длинный статус) пробрасываются как есть
+    return e
 
 # Добавление нового бронирования
 @app.post("/admin/bookings", dependencies=[Depends(all_required)], response_model=Booking, status_code=status.HTTP_201_CREATED)
@@ -278,35 +379,21 @@ async def add_booking(booking: BookingCreate):
     """Добавление нового бронирования"""
     try:
         logger.info(f"Добавление нового бронирования для пользователя {booking.user_id}")
+        # Обратный интервал база отвергает ещё при вычислении period, общей DataError
+        # без имени ограничения, поэтому порядок времени проверяется до вставки
+        if booking.end_time <= booking.start_time:
+            raise HTTPException(status_code=400, detail="Время окончания должно быть позже времени начала.")
         pool = app.state.pool
         async with pool.acquire() as conn:
-            # Проверка существования пользователя
-            user = await conn.fetchrow("SELECT * FROM Users WHERE user_id = $1", booking.user_id)
-            if not user:
-                raise HTTPException(status_code=404, detail="Пользователь не найден.")
-            
-            # Проверка существования ресурса
-            resource = await conn.fetchrow("SELECT * FROM Resources WHERE resource_id = $1", booking.resource_id)
-            if not resource:
-                raise HTTPException(status_code=404, detail="Ресурс не найден.")
-            
-            # Проверка доступности ресурса на заданное время
-            overlapping_booking = await conn.fetchrow("""
-                SELECT * FROM Bookings
-                WHERE resource_id = $1
-                AND status = 'active'
-                AND ($2 < end_time AND $3 > start_time)
-            """, booking.resource_id, booking.start_time, booking.end_time)
-            
-            if overlapping_booking:
-                raise HTTPException(status_code=400, detail="Ресурс уже забронирован на указанное время.")
-            
-            # Вставка нового бронирования
-            booking_id = await conn.fetchval("""
-                INSERT INTO Bookings (user_id, resource_id, start_time, end_time, status)
-                VALUES ($1, $2, $3, $4, $5)
-                RETURNING booking_id
-            """, booking.user_id, booking.resource_id, booking.start_time, booking.end_time, booking.status)
+            # Одна вставка: существование пользователя и ресурса проверяют внешние ключи,
+            # пересечение с активными бронированиями — ограничение bookings_no_overlap
+            try:
+                booking_id = await queries.fetchval(
+                    conn, "booking_insert",
+                    booking.user_id, booking.resource_id, booking.start_time, booking.end_time, booking.status
+                )
+            except asyncpg.PostgresError as e:
+                raise booking_constraint_error(e)
             
             return Booking(
                 booking_id=booking_id,
@@ -323,6 +410,41 @@ async def add_booking(booking: BookingCreate):
         logger.error(f"Ошибка при добавлении бронирования: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
+@app.post(
+    "/admin/bookings/bulk",
+    dependencies=[Depends(admin_staff_required)],
+    response_model=BulkBookingResult,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_bookings_bulk(request: BulkBookingCreate, response: Response):
+    """
+    Создание нескольких бронирований в одной транзакции: явным списком (bookings)
+    или первым бронированием с правилом повторения (first + recurrence).
+    Результат возвращается по каждому бронированию; если ничего не создано — ответ 409.
+    """
+    if request.mode not in BULK_MODES:
+        raise HTTPException(status_code=400, detail="Режим: all_or_nothing или partial.")
+    if request.bookings is not None and (request.first is not None or request.recurrence is not None):
+        raise HTTPException(status_code=400, detail="Укажите либо список бронирований, либо правило повторения.")
+    if request.bookings is not None:
+        bookings = request.bookings
+    elif request.first is not None and request.recurrence is not None:
+        bookings = expand_recurrence(request.first, request.recurrence)
+    else:
+        raise HTTPException(status_code=400, detail="Укажите список бронирований или первое бронирование и правило повторения.")
+    if not bookings:
+        raise HTTPException(status_code=400, detail="Нет бронирований для создания.")
+    if len(bookings) > MAX_BULK_BOOKINGS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_BULK_BOOKINGS} бронирований за один запрос.")
+
+    try:
+        result = await create_bookings(app.state.pool, bookings, request.mode)
+    except asyncpg.PostgresError as e:
+        raise booking_constraint_error(e)
+    if result["created"] == 0:
+        response.status_code = status.HTTP_409_CONFLICT
+    return result
+
 async def create_booking(booking_data: Dict) -> Dict:
     """Добавление нового бронирования через сервер"""
     try:
@@ -353,12 +475,12 @@ async def delete_booking(booking_id: int):
     pool = app.state.pool
     async with pool.acquire() as conn:
         # Проверка существования бронирования
-        booking = await conn.fetchrow("SELECT * FROM Bookings WHERE booking_id = $1", booking_id)
+        booking = await queries.fetchrow(conn, "booking_by_id", booking_id)
         if not booking:
             raise HTTPException(status_code=404, detail="Бронирование не найдено.")
         
         # Удаление бронирования
-        result = await conn.execute("DELETE FROM Bookings WHERE booking_id = $1", booking_id)
+        result = await queries.execute(conn, "booking_delete", booking_id)
         if result == "DELETE 0":
             raise HTTPException(status_code=500, detail="Ошибка при удалении бронирования.")
     return {"message": "Бронирование успешно удалено"}
@@ -375,46 +497,28 @@ async def get_user_bookings(user_id: Optional[int] = None):
 
     async with pool.acquire() as conn:
         if user_id:
-            bookings = await conn.fetch("""
-                SELECT booking_id, user_id, resource_id, start_time, end_time, status
-                FROM Bookings
-                WHERE user_id = $1
-                ORDER BY start_time DESC
-            """, user_id)
+            bookings = await queries.fetch(conn, "booking_list_by_user", user_id)
         else:
-            bookings = await conn.fetch("""
-                SELECT booking_id, user_id, resource_id, start_time, end_time, status
-                FROM Bookings
-                ORDER BY start_time DESC
-            """)
+            bookings = await queries.fetch(conn, "booking_list_recent")
 
-    return [
-        Booking(
-            booking_id=booking['booking_id'],
-            user_id=booking['user_id'],
-            resource_id=booking['resource_id'],
-            start_time=booking['start_time'],
-            end_time=booking['end_time'],
-            status=booking['status'],
-        )
-        for booking in bookings
-    ]
+    return rows_response(bookings, BOOKING_ROWS)
 
 @app.get("/admin/resources", response_model=List[Resource])
-async def get_resources(token: str = Depends(oauth2_scheme)):
-    """Получение списка ресурсов"""
+async def get_resources(
+    if_none_match: Optional[str] = Header(None),
+    token: str = Depends(oauth2_scheme),
+):
+    """
+    Получение списка ресурсов из каталога в памяти.
+    Ответ отдаётся готовыми байтами с ETag; при совпадении If-None-Match — 304 без тела.
+    """
     pool = app.state.pool
     async with pool.acquire() as conn:
-        resources = await conn.fetch("SELECT resource_id, name, description, hourly_rate FROM Resources")
-    return [
-        {
-            "resource_id": resource["resource_id"],
-            "name": resource["name"],
-            "description": resource["description"],
-            "hourly_rate": resource["hourly_rate"]
-        }
-        for resource in resources
-    ]
+        await resource_catalog.ensure_loaded(conn)
+    headers = {"ETag": resource_catalog.etag, "Cache-Control": "no-cache"}
+    if resource_catalog.matches(if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=resource_catalog.body, media_type="application/json", headers=headers)
 
 
 @app.post("/admin/resources", response_model=dict)
@@ -422,10 +526,9 @@ async def add_resource(resource: ResourceCreate, token: str = Depends(oauth2_sch
     """Добавление нового ресурса"""
     pool = app.state.pool
     async with pool.acquire() as conn:
-        await conn.execute("""
-            INSERT INTO Resources (name, description, hourly_rate)
-            VALUES ($1, $2, $3)
-        """, resource.name, resource.description, resource.hourly_rate)
+        await queries.execute(conn, "resource_insert", resource.name, resource.description, resource.hourly_rate)
+        await publish_resources(conn)
+        await resource_catalog.load(conn)
     return {"message": "Ресурс успешно добавлен"}
 
 @app.delete("/admin/resources/{resource_id}", response_model=dict)
@@ -433,26 +536,36 @@ async def delete_resource(resource_id: int, token: str = Depends(oauth2_scheme))
     """Удаление ресурса"""
     pool = app.state.pool
     async with pool.acquire() as conn:
-        await conn.execute("DELETE FROM Resources WHERE resource_id = $1", resource_id)
+        await queries.execute(conn, "resource_delete", resource_id)
+        await publish_resources(conn)
+        await resource_catalog.load(conn)
     return {"message": "Ресурс успешно удалён"}
 
 @app.get("/admin/sessions", response_model=List[dict])
-async def fetch_sessions(token: str = Depends(oauth2_scheme)):
-    pool = app.state.pool
-    async with pool.acquire() as conn:
-        sessions = await conn.fetch("""
-            SELECT session_id, user_id, start_time, end_time 
-            FROM Sessions
-        """)
-    return [
-        {
-            "session_id": session["session_id"],
-            "user_id": session["user_id"],
-            "start_time": session["start_time"],
-            "end_time": session["end_time"],
-        }
-        for session in sessions
-    ]
+async def fetch_sessions(
+    response: Response,
+    user_id: Optional[int] = None,
+    open_only: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    principal: Principal = Depends(admin_staff_required),
+):
+    """
+    Получение сессий постранично, от новых к старым; open_only — только незакрытые.
+    expand=user добавляет к строкам user_email.
+    """
+    expand_names = parse_expand(expand, ["user"], principal)
+    query = KeysetQuery(queries.LIST_QUERIES["session_page"], [("start_time", parse_datetime), ("session_id", int)])
+    query.where("user_id = {}", user_id)
+    query.where("start_time >= {}", date_from)
+    query.where("start_time < {}", date_to)
+    if open_only:
+        query.where_sql("end_time IS NULL")
+    sessions = await fetch_page(query, "session_page", cursor, limit, response)
+    return await list_response(sessions, SESSION_ROWS, response, expand_names)
 
 @app.post("/admin/sessions", dependencies=[Depends(admin_required)])
 async def add_session(session: dict):
@@ -461,19 +574,25 @@ async def add_session(session: dict):
     try:
         # Конвертация времени из строки в datetime
         start_time = datetime.fromisoformat(session["start_time"])
-        end_time = datetime.fromisoformat(session["end_time"])
+        # Без end_time добавляется открытая сессия
+        end_time = datetime.fromisoformat(session["end_time"]) if session.get("end_time") else None
 
         async with pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO Sessions (user_id, start_time, end_time)
-                VALUES ($1, $2, $3)
-            """, session["user_id"], start_time, end_time)
+            session_id = await queries.fetchval(conn, "session_insert", session["user_id"], start_time, end_time)
+            if end_time is None:
+                await publish_open_sessions(conn, [session["user_id"]])
+        if end_time is None:
+            open_sessions.opened(
+                {"session_id": session_id, "user_id": session["user_id"], "start_time": start_time, "end_time": None}
+            )
 
         return {"message": "Сессия успешно добавлена"}
     except KeyError as e:
         return {"error": f"Отсутствует обязательное поле: {e}"}
     except ValueError as e:
         return {"error": f"Ошибка формата времени: {e}"}
+    except asyncpg.exceptions.UniqueViolationError:
+        return {"error": "У пользователя уже есть открытая сессия."}
     except Exception as e:
         return {"error": f"Ошибка сервера: {str(e)}"}
 
@@ -481,74 +600,159 @@ async def add_session(session: dict):
 async def delete_session(session_id: int, token: str = Depends(oauth2_scheme)):
     pool = app.state.pool
     async with pool.acquire() as conn:
-        result = await conn.execute("DELETE FROM Sessions WHERE session_id = $1", session_id)
-        if result == "DELETE 1":
+        deleted = await queries.fetchrow(conn, "session_delete", session_id)
+        if deleted:
+            if deleted['end_time'] is None:
+                await publish_open_sessions(conn, [deleted['user_id']])
+            open_sessions.closed(session_id)
             return {"message": "Сессия успешно удалена"}
         else:
             raise HTTPException(status_code=404, detail="Сессия не найдена")
 
-@app.get("/admin/payments", dependencies=[Depends(admin_required)])
-async def get_payments():
-    pool = app.state.pool
-    async with pool.acquire() as conn:
-        payments = await conn.fetch("SELECT payment_id, user_id, amount FROM Payments")
-    return payments
+@app.get("/admin/payments")
+async def get_payments(
+    response: Response,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    principal: Principal = Depends(admin_required),
+):
+    """Получение платежей постранично, от новых к старым; expand=user добавляет user_email."""
+    expand_names = parse_expand(expand, ["user"], principal)
+    query = KeysetQuery(queries.LIST_QUERIES["payment_page"], [("payment_date", parse_datetime), ("payment_id", int)])
+    query.where("user_id = {}", user_id)
+    query.where("payment_date >= {}", date_from)
+    query.where("payment_date < {}", date_to)
+    payments = await fetch_page(query, "payment_page", cursor, limit, response)
+    return await list_response(payments, PAYMENT_ROWS, response, expand_names)
+
+@app.get("/admin/export/{table}", dependencies=[Depends(admin_required)])
+async def export_table(
+    table: str,
+    format: str = "csv",
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Потоковая выгрузка бронирований, сессий или платежей в CSV или NDJSON
+    (при gzip=true — сжатый файл). Строки читаются серверным курсором кусками.
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail="Таблица для выгрузки не найдена.")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Поддерживаются форматы csv и ndjson.")
+    sql, args = export_query(table, user_id, date_from, date_to)
+    filename = f"{table}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(app.state.pool, sql, args, format, gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @app.post("/admin/payments", dependencies=[Depends(admin_required)])
 async def add_payment(payment: dict):
     pool = app.state.pool
     async with pool.acquire() as conn:
-        await conn.execute("""
-            INSERT INTO Payments (user_id, amount)
-            VALUES ($1, $2)
-        """, payment["user_id"], payment["amount"])
+        await queries.execute(conn, "payment_insert", payment["user_id"], payment["amount"])
     return {"message": "Платеж успешно добавлен"}
 
 @app.delete("/admin/payments/{payment_id}", dependencies=[Depends(admin_required)])
 async def delete_payment(payment_id: int):
     pool = app.state.pool
     async with pool.acquire() as conn:
-        await conn.execute("DELETE FROM Payments WHERE payment_id = $1", payment_id)
+        await queries.execute(conn, "payment_delete", payment_id)
     return {"message": "Платеж успешно удалён"}
 
-from datetime import datetime
 
-@app.get("/resources/bookings")
-async def get_resource_bookings(resource_id: int, date: str, token: str = Depends(oauth2_scheme)):
+# Максимальная длина интервала дат в одном запросе бронирований
+MAX_BOOKINGS_RANGE_DAYS = 31
+# Максимальное число ресурсов в одном запросе бронирований или свободных окон
+MAX_RESOURCES_PER_REQUEST = 100
+
+def check_resource_ids(resource_id: List[int]):
+    if len(resource_id) > MAX_RESOURCES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_RESOURCES_PER_REQUEST} ресурсов за один запрос.")
+
+def parse_date_range(date: str, date_to: Optional[str]):
+    """Разбор интервала дат [date, date_to] включительно; date_to по умолчанию равен date."""
+    try:
+        date_from = datetime.strptime(date, "%Y-%m-%d").date()
+        last_date = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else date_from
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=f"Некорректный формат даты: {ve}")
+    if last_date < date_from:
+        raise HTTPException(status_code=400, detail="date_to не может быть раньше date.")
+    if (last_date - date_from).days >= MAX_BOOKINGS_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Интервал не может превышать {MAX_BOOKINGS_RANGE_DAYS} дней.")
+    return date_from, last_date
+
+@app.get("/resources/bookings", dependencies=[Depends(all_required)])
+async def get_resource_bookings(
+    resource_id: List[int] = Query(...),
+    date: str = Query(...),
+    date_to: Optional[str] = None,
+):
     """
-    Получение бронирований ресурса на определённую дату.
+    Получение бронирований нескольких ресурсов за интервал дат [date, date_to] включительно.
+    Результат сгруппирован по resource_id; date_to по умолчанию равен date.
     """
+    check_resource_ids(resource_id)
+    date_from, last_date = parse_date_range(date, date_to)
+    # Полуоткрытый интервал [начало первого дня, начало дня после последнего)
+    range_start = datetime.combine(date_from, datetime.min.time())
+    range_end = datetime.combine(last_date + timedelta(days=1), datetime.min.time())
     try:
-        # Преобразование строки даты в объект datetime.date
-        booking_date = datetime.strptime(date, "%Y-%m-%d").date()
-
         pool = app.state.pool
         async with pool.acquire() as conn:
-            bookings = await conn.fetch("""
-                SELECT booking_id, user_id, resource_id, start_time, end_time, status
-                FROM Bookings
-                WHERE resource_id = $1 AND DATE(start_time) = $2
-            """, resource_id, booking_date)
-
-        return [
-            {
+            bookings = await queries.fetch(conn, "booking_list_by_resources_range", resource_id, range_start, range_end)
+
+        grouped = {r_id: [] for r_id in resource_id}
+        for booking in bookings:
+            grouped[booking["resource_id"]].append({
                 "booking_id": booking["booking_id"],
                 "user_id": booking["user_id"],
                 "resource_id": booking["resource_id"],
                 "start_time": booking["start_time"],
                 "end_time": booking["end_time"],
                 "status": booking["status"],
-            }
-            for booking in bookings
-        ]
-    except ValueError as ve:
-        raise HTTPException(status_code=400, detail=f"Некорректный формат даты: {ve}")
+            })
+        return grouped
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка сервера: {e}")
+
+@app.get("/resources/availability", dependencies=[Depends(all_required)])
+async def get_resource_availability(
+    resource_id: List[int] = Query(...),
+    date: str = Query(...),
+    date_to: Optional[str] = None,
+    min_minutes: int = Query(0, ge=0),
+):
+    """
+    Свободные окна ресурсов в рабочие дни [date, date_to] (рабочий день 10:00 - 01:00 следующих суток).
+    Результат сгруппирован по resource_id; окна короче min_minutes не возвращаются.
+    """
+    check_resource_ids(resource_id)
+    date_from, last_date = parse_date_range(date, date_to)
+    range_start = workday_bounds(date_from)[0]
+    range_end = workday_bounds(last_date)[1]
+    try:
+        pool = app.state.pool
+        async with pool.acquire() as conn:
+            bookings = await queries.fetch(
+                conn, "booking_list_for_availability", resource_id, range_start, range_end, MAX_BOOKING_LENGTH
+            )
+        return free_windows(bookings, resource_id, date_from, last_date, min_minutes)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка сервера: {e}")
 
 
 @app.post("/staff/sessions/start", response_model=Session)
-async def start_session(session: SessionCreate, staff: User = Depends(staff_required)):
+async def start_session(session: SessionCreate, staff: Principal = Depends(staff_required)):
     """
     Установка начала сессии посещения пользователя.
     """
@@ -558,20 +762,17 @@ async def start_session(session: SessionCreate, staff: User = Depends(staff_requ
     
     async with pool.acquire() as conn:
         # Проверка существующих открытых сессий
-        existing_session = await conn.fetchrow("""
-            SELECT * FROM Sessions
-            WHERE user_id = $1 AND end_time IS NULL
-        """, session.user_id)
+        existing_session = await queries.fetchrow(conn, "session_active_by_user", session.user_id)
         
         if existing_session:
             raise HTTPException(status_code=400, detail="У пользователя уже есть открытая сессия.")
         
-        # Создание новой сессии
-        session_id = await conn.fetchval("""
-            INSERT INTO Sessions (user_id, start_time)
-            VALUES ($1, $2)
-            RETURNING session_id
-        """, session.user_id, session.start_time)
+        # Создание новой сессии; одновременный старт из другого процесса, прошедший ту же
+        # проверку, отсекает уникальный индекс sessions_open_user_idx
+        try:
+            session_id = await queries.fetchval(conn, "session_insert", session.user_id, session.start_time, None)
+        except asyncpg.exceptions.UniqueViolationError:
+            raise HTTPException(status_code=400, detail="У пользователя уже есть открытая сессия.")
         
         new_session = Session(
             session_id=session_id,
@@ -579,62 +780,41 @@ async def start_session(session: SessionCreate, staff: User = Depends(staff_requ
             start_time=session.start_time,
             end_time=None
         )
+        await publish_open_sessions(conn, [session.user_id])
+        open_sessions.opened(new_session.dict())
         return new_session
 
-@app.post("/staff/sessions/end", response_model=Session)
-async def end_session(session_id: int, end_time: datetime, staff: User = Depends(staff_required)):
+@app.post("/staff/sessions/end", response_model=SessionEnd)
+async def end_session(session_id: int, end_time: datetime, staff: Principal = Depends(staff_required)):
     """
     Установка конца сессии посещения пользователя.
     Если есть активное бронирование, оно автоматически завершается.
+    Оба изменения выполняются одним запросом (CTE с UPDATE).
     """
     pool = app.state.pool
     if pool is None:
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
     
     async with pool.acquire() as conn:
-        # Получение сессии
-        session = await conn.fetchrow("""
-            SELECT * FROM Sessions
-            WHERE session_id = $1 AND end_time IS NULL
-        """, session_id)
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="Активная сессия не найдена.")
-        
-        # Обновление конца сессии
-        await conn.execute("""
-            UPDATE Sessions
-            SET end_time = $1
-            WHERE session_id = $2
-        """, end_time, session_id)
-        
-        # Проверка наличия активного бронирования
-        active_booking = await conn.fetchrow("""
-            SELECT * FROM Bookings
-            WHERE user_id = $1 AND status = 'active'
-            ORDER BY start_time DESC
-            LIMIT 1
-        """, session['user_id'])
-        
-        if active_booking:
-            # Завершение бронирования
-            await conn.execute("""
-                UPDATE Bookings
-                SET status = 'completed'
-                WHERE booking_id = $1
-            """, active_booking['booking_id'])
-        
-        updated_session = Session(
-            session_id=session_id,
-            user_id=session['user_id'],
-            start_time=session['start_time'],
-            end_time=end_time
-        )
-        return updated_session
+        session = await queries.fetchrow(conn, "session_end_with_booking", session_id, end_time)
+        if session:
+            await publish_open_sessions(conn, [session['user_id']])
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Активная сессия не найдена.")
+    open_sessions.closed(session_id)
+
+    return SessionEnd(
+        session_id=session['session_id'],
+        user_id=session['user_id'],
+        start_time=session['start_time'],
+        end_time=session['end_time'],
+        completed_booking_ids=session['completed_booking_ids'],
+    )
 
 # 2. Управление бронированиями
 @app.get("/staff/users/{user_id}/bookings", response_model=List[Booking])
-async def get_user_bookings_staff(user_id: int, staff: User = Depends(staff_required)):
+async def get_user_bookings_staff(user_id: int, staff: Principal = Depends(staff_required)):
     """
     Получение бронирований конкретного пользователя.
     """
@@ -643,27 +823,12 @@ async def get_user_bookings_staff(user_id: int, staff: User = Depends(staff_requ
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
     
     async with pool.acquire() as conn:
-        bookings = await conn.fetch("""
-            SELECT booking_id, user_id, resource_id, start_time, end_time, status
-            FROM Bookings
-            WHERE user_id = $1
-            ORDER BY start_time DESC
-        """, user_id)
-    
-    return [
-        Booking(
-            booking_id=booking['booking_id'],
-            user_id=booking['user_id'],
-            resource_id=booking['resource_id'],
-            start_time=booking['start_time'],
-            end_time=booking['end_time'],
-            status=booking['status'],
-        )
-        for booking in bookings
-    ]
+        bookings = await queries.fetch(conn, "booking_list_by_user", user_id)
+
+    return rows_response(bookings, BOOKING_ROWS)
 
 @app.patch("/staff/bookings/{booking_id}/cancel", response_model=Booking)
-async def cancel_booking_staff(booking_id: int, staff: User = Depends(staff_required)):
+async def cancel_booking_staff(booking_id: int, staff: Principal = Depends(staff_required)):
     """
     Изменение статуса бронирования на 'cancelled'.
     """
@@ -673,10 +838,7 @@ async def cancel_booking_staff(booking_id: int, staff: User = Depends(staff_requ
     
     async with pool.acquire() as conn:
         # Получение бронирования
-        booking = await conn.fetchrow("""
-            SELECT * FROM Bookings
-            WHERE booking_id = $1
-        """, booking_id)
+        booking = await queries.fetchrow(conn, "booking_by_id", booking_id)
         
         if not booking:
             raise HTTPException(status_code=404, detail="Бронирование не найдено.")
@@ -684,19 +846,8 @@ async def cancel_booking_staff(booking_id: int, staff: User = Depends(staff_requ
         if booking['status'] == 'cancelled':
             raise HTTPException(status_code=400, detail="Бронирование уже отменено.")
         
-        # Обновление статуса бронирования
-        await conn.execute("""
-            UPDATE Bookings
-            SET status = 'cancelled'
-            WHERE booking_id = $1
-        """, booking_id)
-        
-        # Возврат обновленного бронирования
-        updated_booking = await conn.fetchrow("""
-            SELECT booking_id, user_id, resource_id, start_time, end_time, status
-            FROM Bookings
-            WHERE booking_id = $1
-        """, booking_id)
+        # Обновление статуса бронирования с возвратом обновлённой строки
+        updated_booking = await queries.fetchrow(conn, "booking_set_status", booking_id, 'cancelled')
     
     return Booking(
         booking_id=updated_booking['booking_id'],
@@ -710,7 +861,7 @@ async def cancel_booking_staff(booking_id: int, staff: User = Depends(staff_requ
 # 3. Управление платежами
 
 @app.get("/staff/users/{user_id}/payments", response_model=List[Payment])
-async def get_user_payments(user_id: int, staff: User = Depends(staff_required)):
+async def get_user_payments(user_id: int, staff: Principal = Depends(staff_required)):
     """
     Получение платежей пользователя.
     """
@@ -719,12 +870,7 @@ async def get_user_payments(user_id: int, staff: User = Depends(staff_required))
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
     
     async with pool.acquire() as conn:
-        payments = await conn.fetch("""
-            SELECT payment_id, user_id, amount, payment_date
-            FROM Payments
-            WHERE user_id = $1
-            ORDER BY payment_date DESC
-        """, user_id)
+        payments = await queries.fetch(conn, "payment_list_by_user", user_id)
     
     return [
         Payment(
@@ -737,7 +883,7 @@ async def get_user_payments(user_id: int, staff: User = Depends(staff_required))
     ]
 
 @app.post("/staff/users/{user_id}/payments", response_model=Payment, status_code=201)
-async def add_user_payment(user_id: int, payment: PaymentCreate, staff: User = Depends(staff_required)):
+async def add_user_payment(user_id: int, payment: PaymentCreate, staff: Principal = Depends(staff_required)):
     """
     Добавление нового платежа для пользователя.
     """
@@ -747,20 +893,13 @@ async def add_user_payment(user_id: int, payment: PaymentCreate, staff: User = D
     
     async with pool.acquire() as conn:
         # Проверка существования пользователя
-        user = await conn.fetchrow("""
-            SELECT * FROM Users
-            WHERE user_id = $1
-        """, user_id)
+        user = await queries.fetchval(conn, "user_exists", user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="Пользователь не найден.")
         
         # Создание платежа
-        payment_id = await conn.fetchval("""
-            INSERT INTO Payments (user_id, amount, payment_date)
-            VALUES ($1, $2, $3)
-            RETURNING payment_id
-        """, user_id, payment.amount, payment.payment_date)
+        payment_id = await queries.fetchval(conn, "payment_insert_dated", user_id, payment.amount, payment.payment_date)
         
         new_payment = Payment(
             payment_id=payment_id,
@@ -770,58 +909,113 @@ async def add_user_payment(user_id: int, payment: PaymentCreate, staff: User = D
         )
         return new_payment
 
-# main.py
+@app.post("/staff/checkout", response_model=CheckoutResult)
+async def checkout(request: CheckoutRequest, staff: Principal = Depends(staff_required)):
+    """
+    Расчёт посещения клиента в одной транзакции: закрытие открытой сессии, завершение
+    активных бронирований, начавшихся к end_time, одним UPDATE, расчёт стоимости
+    и (по запросу) запись платежа.
+    """
+    pool = app.state.pool
+    if pool is None:
+        raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
 
-@app.get("/staff/sessions/active", response_model=Optional[Session], dependencies=[Depends(staff_required)])
-async def get_active_session(user_id: int):
+    end_time = request.end_time or datetime.now()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            sessions = await queries.fetch(conn, "session_end_open_by_user", request.user_id, end_time)
+            bookings = await queries.fetch(conn, "booking_complete_active_by_user", request.user_id, end_time)
+            if not sessions and not bookings:
+                raise HTTPException(status_code=404, detail="У пользователя нет открытой сессии и активных бронирований.")
+
+            session_minutes = sum(
+                max(int((session['end_time'] - session['start_time']).total_seconds() // 60), 0)
+                for session in sessions
+            )
+            cost = visit_cost(session_minutes, [(b['minutes'], b['hourly_rate']) for b in bookings])
+
+            payment_id = None
+            if request.record_payment and cost["total"] > 0:
+                payment_id = await queries.fetchval(conn, "payment_insert_dated", request.user_id, cost["total"], end_time)
+            # Уведомление уходит вместе с COMMIT
+            if sessions:
+                await publish_open_sessions(conn, [request.user_id])
+
+    for session in sessions:
+        open_sessions.closed(session['session_id'])
+    logger.info(f"Расчёт посещения пользователя {request.user_id}: {cost['total']} руб.")
+    return CheckoutResult(
+        user_id=request.user_id,
+        sessions=[Session(**dict(session)) for session in sessions],
+        completed_booking_ids=[b['booking_id'] for b in bookings],
+        cost=cost,
+        payment_id=payment_id,
+    )
+
+# Сколько последних платежей показывать на экране сотрудника
+DASHBOARD_PAYMENTS_LIMIT = 10
+
+@app.get("/staff/users/{user_id}/dashboard", response_model=StaffDashboard)
+async def get_staff_dashboard(user_id: int, staff: Principal = Depends(staff_required)):
     """
-    Получение активной сессии пользователя.
+    Данные экрана сотрудника по клиенту за один запрос: открытая сессия, начавшиеся
+    активные бронирования с названиями ресурсов, последние платежи и текущая стоимость посещения.
     """
     pool = app.state.pool
     if pool is None:
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
-    
+
     async with pool.acquire() as conn:
-        session = await conn.fetchrow("""
-            SELECT session_id, user_id, start_time, end_time
-            FROM Sessions
-            WHERE user_id = $1 AND end_time IS NULL
-        """, user_id)
-    
-    if session:
-        return Session(
-            session_id=session['session_id'],
-            user_id=session['user_id'],
-            start_time=session['start_time'],
-            end_time=session['end_time']
-        )
-    else:
-        return None
+        row = await queries.fetchrow(conn, "staff_dashboard", user_id, datetime.now(), DASHBOARD_PAYMENTS_LIMIT)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден.")
+
+    active_session = row['active_session']
+    session_minutes = active_session['minutes'] if active_session else 0
+    cost = visit_cost(session_minutes, [(b['minutes'], b['hourly_rate']) for b in row['bookings']])
+    return StaffDashboard(
+        user_id=row['user_id'],
+        first_name=row['first_name'],
+        last_name=row['last_name'],
+        email=row['email'],
+        active_session=active_session,
+        bookings=row['bookings'],
+        payments=row['payments'],
+        cost=cost,
+    )
+
+# main.py
+
+@app.get("/staff/sessions/active", response_model=Optional[Session], dependencies=[Depends(staff_required)])
+async def get_active_session(user_id: int):
+    """
+    Получение активной сессии пользователя (из индекса открытых сессий в памяти).
+    """
+    session = open_sessions.get(user_id)
+    return Session(**session) if session else None
+
+@app.get("/staff/sessions/open", response_model=List[Session], dependencies=[Depends(staff_required)])
+async def get_open_sessions():
+    """
+    Все открытые сессии — кто сейчас в антикафе (из индекса в памяти).
+    """
+    return [Session(**session) for session in open_sessions.all()]
 
 @app.patch("/staff/bookings/{booking_id}/complete", response_model=Booking)
-async def complete_booking_staff(booking_id: int, staff: User = Depends(staff_required)):
+async def complete_booking_staff(booking_id: int, staff: Principal = Depends(staff_required)):
     pool = app.state.pool
     if pool is None:
         raise HTTPException(status_code=500, detail="Пул соединений не инициализирован.")
 
     async with pool.acquire() as conn:
-        booking = await conn.fetchrow("SELECT * FROM bookings WHERE booking_id = $1", booking_id)
+        booking = await queries.fetchrow(conn, "booking_by_id", booking_id)
         if not booking:
             raise HTTPException(status_code=404, detail="Бронирование не найдено.")
 
         if booking['status'] == 'completed':
             raise HTTPException(status_code=400, detail="Бронирование уже завершено.")
 
-        await conn.execute("""
-            UPDATE bookings
-            SET status = 'completed'
-            WHERE booking_id = $1
-        """, booking_id)
-
-        updated_booking = await conn.fetchrow("""
-            SELECT booking_id, user_id, resource_id, start_time, end_time, status
-            FROM bookings WHERE booking_id = $1
-        """, booking_id)
+        updated_booking = await queries.fetchrow(conn, "booking_set_status", booking_id, 'completed')
 
     return Booking(
         booking_id=updated_booking['booking_id'],
@@ -833,8 +1027,20 @@ async def complete_booking_staff(booking_id: int, staff: User = Depends(staff_re
     )
 
 @app.get("/logs/sessions")
-async def get_session_logs():
-    pool = app.state.pool
-    async with pool.acquire() as conn:
-        logs = await conn.fetch("SELECT * FROM session_logs")
-        return [{"id": log["log_id"], "user_id": log["user_id"], "event_type": log["event_type"], "event_time": log["event_time"]} for log in logs]
\ No newline at end of file
+async def get_session_logs(
+    response: Response,
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+):
+    """Получение журнала сессий постранично, от новых событий к старым."""
+    query = KeysetQuery(queries.LIST_QUERIES["session_log_page"], [("event_time", parse_datetime), ("log_id", int)])
+    query.where("user_id = {}", user_id)
+    query.where("event_type = {}", event_type)
+    query.where("event_time >= {}", date_from)
+    query.where("event_time < {}", date_to)
+    logs = await fetch_page(query, "session_log_page", cursor, limit, response)
+    return [{"id": log["log_id"], "user_id": log["user_id"], "event_type": log["event_type"], "event_time": log["event_time"]} for log in logs]
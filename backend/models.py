@@ -1,6 +1,6 @@
 # backend/models.py
 
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 class User(BaseModel):
@@ -67,6 +67,9 @@ class Session(BaseModel):
     start_time: datetime
     end_time: Optional[datetime] = None
 
+class SessionEnd(Session):
+    completed_booking_ids: List[int]  # бронирования, завершённые вместе с сессией
+
 class PaymentCreate(BaseModel):
     user_id: int
     amount: float
@@ -76,4 +79,76 @@ class Payment(BaseModel):
     payment_id: int
     user_id: int
     amount: float
-    payment_date: datetime
\ No newline at end of file
+    payment_date: datetime
+
+class DashboardBooking(BaseModel):
+    booking_id: int
+    resource_id: int
+    resource_name: str
+    hourly_rate: float
+    start_time: datetime
+    end_time: datetime
+    status: str
+    minutes: int
+
+class VisitCost(BaseModel):
+    session_minutes: int
+    booking_minutes: int
+    session_cost: float
+    booking_cost: float
+    stop_check: bool  # применён ли стоп-чек
+    total: float
+
+class StaffDashboard(BaseModel):
+    user_id: int
+    first_name: str
+    last_name: str
+    email: str
+    active_session: Optional[Session] = None
+    bookings: List[DashboardBooking]  # активные бронирования с названиями ресурсов
+    payments: List[Payment]  # последние платежи
+    cost: VisitCost  # текущая стоимость посещения
+
+class CheckoutRequest(BaseModel):
+    user_id: int
+    end_time: Optional[datetime] = None  # по умолчанию — текущее время
+    record_payment: bool = False  # записать платёж на рассчитанную сумму
+
+class CheckoutResult(BaseModel):
+    user_id: int
+    sessions: List[Session]  # закрытые сессии
+    completed_booking_ids: List[int]
+    cost: VisitCost
+    payment_id: Optional[int] = None
+
+class RecurrenceRule(BaseModel):
+    frequency: str = "weekly"  # 'daily' или 'weekly'
+    interval: int = 1  # каждые interval дней/недель
+    count: Optional[int] = None  # число повторений
+    until: Optional[datetime] = None  # или дата, до которой начинаются повторения (включительно)
+
+class BulkBookingCreate(BaseModel):
+    bookings: Optional[List[BookingCreate]] = None  # явный список бронирований
+    first: Optional[BookingCreate] = None  # или первое повторение ...
+    recurrence: Optional[RecurrenceRule] = None  # ... и правило повторения
+    mode: str = "all_or_nothing"  # 'all_or_nothing' или 'partial'
+
+class BulkBookingItem(BaseModel):
+    index: int
+    user_id: int
+    resource_id: int
+    start_time: datetime
+    end_time: datetime
+    result: str  # 'created', 'conflict', 'invalid' или 'skipped'
+    booking_id: Optional[int] = None
+    conflict_booking_id: Optional[int] = None  # существующее бронирование, с которым пересечение
+    error: Optional[str] = None
+
+class BulkBookingResult(BaseModel):
+    created: int
+    failed: int
+    items: List[BulkBookingItem]
+
+class LookupLabels(BaseModel):
+    users: Dict[int, str]  # user_id -> email
+    resources: Dict[int, str]  # resource_id -> название
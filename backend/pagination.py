@@ -0,0 +1,99 @@
+# backend/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+
+# Размер страницы списков по умолчанию и максимальный
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Заголовок ответа с курсором следующей страницы; на последней странице его нет
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Курсор — значения ключей сортировки последней строки страницы в base64(JSON)."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str, types: Sequence[Callable]) -> List[Any]:
+    """Разбор курсора; types — преобразования значений к типам ключей сортировки."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("неверное число значений")
+        return [convert(value) for convert, value in zip(types, values)]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный курсор: {e}")
+
+class KeysetQuery:
+    """
+    Построитель запроса страницы списка: фильтры и условие курсора попадают в WHERE,
+    сортировка всегда по полному уникальному ключу (например, время + id), поэтому
+    страницы не пересекаются и не теряют строки при одинаковом времени.
+    """
+
+    def __init__(self, select_sql: str, keys: Sequence[Tuple[str, Callable]], descending: bool = True):
+        self.select_sql = select_sql
+        self.keys = keys
+        self.descending = descending
+        self.conditions: List[str] = []
+        self.args: List[Any] = []
+
+    def where(self, condition: str, value: Any) -> "KeysetQuery":
+        """Фильтр с одним параметром, обозначенным в условии как {}; None — фильтр не задан."""
+        if value is not None:
+            self.args.append(value)
+            self.conditions.append(condition.format(f"${len(self.args)}"))
+        return self
+
+    def where_sql(self, condition: str) -> "KeysetQuery":
+        """Фильтр без параметров, например 'end_time IS NULL'."""
+        self.conditions.append(condition)
+        return self
+
+    def order_by(self) -> str:
+        direction = " DESC" if self.descending else ""
+        return "\nORDER BY " + ", ".join(column + direction for column, _ in self.keys)
+
+    def build_all(self) -> Tuple[str, List[Any]]:
+        """Запрос всех строк без курсора и LIMIT (для потоковых выгрузок)."""
+        sql = self.select_sql
+        if self.conditions:
+            sql += "\nWHERE " + " AND ".join(self.conditions)
+        return sql + self.order_by(), list(self.args)
+
+    def build(self, cursor: Optional[str], limit: int) -> Tuple[str, List[Any]]:
+        columns = [column for column, _ in self.keys]
+        conditions = list(self.conditions)
+        args = list(self.args)
+        if cursor:
+            values = decode_cursor(cursor, [convert for _, convert in self.keys])
+            placeholders = []
+            for value in values:
+                args.append(value)
+                placeholders.append(f"${len(args)}")
+            operator = "<" if self.descending else ">"
+            conditions.append(f"({', '.join(columns)}) {operator} ({', '.join(placeholders)})")
+
+        sql = self.select_sql
+        if conditions:
+            sql += "\nWHERE " + " AND ".join(conditions)
+        sql += self.order_by()
+        # Лишняя строка показывает, что есть следующая страница
+        args.append(limit + 1)
+        sql += f"\nLIMIT ${len(args)}"
+        return sql, args
+
+    def page(self, rows: List, limit: int) -> Tuple[List, Optional[str]]:
+        """Строки страницы и курсор следующей страницы (None, если страница последняя)."""
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor([last[column.split(".")[-1]] for column, _ in self.keys])
+
+def parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
@@ -0,0 +1,32 @@
+# backend/pricing.py
+
+from typing import Dict, Iterable, Tuple
+
+# Тарифы антикафе
+SESSION_RATE_PER_MINUTE = 5      # руб/минута пребывания
+STOP_CHECK_MINUTES = 3 * 60      # после 3 часов (сессия + бронирования) действует стоп-чек
+STOP_CHECK_AMOUNT = 900          # руб
+
+def visit_cost(session_minutes: int, bookings: Iterable[Tuple[int, float]]) -> Dict:
+    """
+    Стоимость посещения: минуты сессии по тарифу плюс бронирования по часовой ставке ресурса.
+    bookings — пары (длительность бронирования в минутах, hourly_rate ресурса).
+    Если общее время превышает STOP_CHECK_MINUTES, итог равен STOP_CHECK_AMOUNT.
+    """
+    booking_minutes = 0
+    booking_cost = 0.0
+    for minutes, hourly_rate in bookings:
+        booking_minutes += minutes
+        booking_cost += (minutes / 60) * float(hourly_rate)
+
+    session_cost = session_minutes * SESSION_RATE_PER_MINUTE
+    stop_check = session_minutes + booking_minutes > STOP_CHECK_MINUTES
+    total = STOP_CHECK_AMOUNT if stop_check else session_cost + booking_cost
+    return {
+        "session_minutes": session_minutes,
+        "booking_minutes": booking_minutes,
+        "session_cost": round(session_cost, 2),
+        "booking_cost": round(booking_cost, 2),
+        "stop_check": stop_check,
+        "total": round(total, 2),
+    }
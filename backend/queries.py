@@ -0,0 +1,400 @@
+# backend/queries.py
+
+import logging
+import os
+import time
+from typing import Dict
+from .metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Подготавливать ли запросы на сервере (например, за PgBouncer в transaction-режиме
+# подготовку нужно отключить — тогда кэш подготовленных запросов asyncpg выключается)
+PREPARE_QUERIES = os.getenv('POSTGRES_PREPARE_QUERIES', '1') == '1'
+# Запас кэша под запросы, собираемые в обработчиках (fetch_dynamic)
+DYNAMIC_STATEMENTS = int(os.getenv('POSTGRES_DYNAMIC_STATEMENTS', 100))
+
+# Реестр именованных запросов API. Все горячие запросы обработчиков описаны здесь,
+# чтобы их можно было держать подготовленными в кэше соединения, увидеть в одном месте и замерить.
+QUERIES: Dict[str, str] = {
+    # --- Инвалидация кэшей (database.InvalidationBus) ---
+    "cache_notify": """
+        SELECT pg_notify($1, $2)
+    """,
+
+    # --- Роли ---
+    "role_list": """
+        SELECT role_id, role_name FROM Roles
+    """,
+
+    # --- Пользователи ---
+    "user_insert": """
+        INSERT INTO Users (first_name, last_name, email, password_hash, role_id)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING user_id
+    """,
+    "user_credentials_by_email": """
+        SELECT user_id, email, password_hash, role_id
+        FROM Users
+        WHERE email = $1
+    """,
+    "user_profile_by_id": """
+        SELECT user_id, first_name, last_name, email, role_id
+        FROM Users
+        WHERE user_id = $1
+    """,
+    "user_search": """
+        SELECT u.user_id, u.first_name, u.last_name, u.email, u.role_id, r.role_name
+        FROM Users u
+        JOIN Roles r ON u.role_id = r.role_id
+        WHERE (u.first_name || ' ' || u.last_name || ' ' || u.email) ILIKE '%' || $1 || '%'
+           OR u.user_id = $3
+        ORDER BY u.user_id = $3 DESC,
+                 word_similarity($2, u.first_name || ' ' || u.last_name || ' ' || u.email) DESC,
+                 u.user_id
+        LIMIT $4
+    """,
+    "user_labels": """
+        SELECT user_id, email FROM Users WHERE user_id = ANY($1::int[])
+    """,
+    "user_exists": """
+        SELECT 1 FROM Users WHERE user_id = $1
+    """,
+    "user_delete": """
+        DELETE FROM Users WHERE user_id = $1
+    """,
+
+    # --- Ресурсы ---
+    "resource_list": """
+        SELECT resource_id, name, description, hourly_rate FROM Resources
+        ORDER BY resource_id
+    """,
+    "resource_insert": """
+        INSERT INTO Resources (name, description, hourly_rate)
+        VALUES ($1, $2, $3)
+    """,
+    "resource_delete": """
+        DELETE FROM Resources WHERE resource_id = $1
+    """,
+
+    # --- Бронирования ---
+    "booking_list_recent": """
+        SELECT booking_id, user_id, resource_id, start_time, end_time, status
+        FROM Bookings
+        ORDER BY start_time DESC
+    """,
+    "booking_list_by_user": """
+        SELECT booking_id, user_id, resource_id, start_time, end_time, status
+        FROM Bookings
+        WHERE user_id = $1
+        ORDER BY start_time DESC
+    """,
+    "booking_by_id": """
+        SELECT booking_id, user_id, resource_id, start_time, end_time, status
+        FROM Bookings
+        WHERE booking_id = $1
+    """,
+    "booking_insert": """
+        INSERT INTO Bookings (user_id, resource_id, start_time, end_time, status)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING booking_id
+    """,
+    "booking_bulk_refs": """
+        SELECT ARRAY(SELECT user_id FROM Users WHERE user_id = ANY($1::int[])) AS user_ids,
+               ARRAY(SELECT resource_id FROM Resources WHERE resource_id = ANY($2::int[])) AS resource_ids
+    """,
+    "booking_bulk_conflicts": """
+        SELECT c.idx, min(b.booking_id) AS booking_id
+        FROM unnest($1::int[], $2::int[], $3::timestamp[], $4::timestamp[])
+             AS c(idx, resource_id, start_time, end_time)
+        JOIN Bookings b ON b.resource_id = c.resource_id
+            AND b.status = 'active'
+            AND b.period && tsrange(c.start_time, c.end_time, '[)')
+        GROUP BY c.idx
+    """,
+    # Номер берётся из последовательности заранее, чтобы вернуть его вместе с ord —
+    # позицией строки во входных массивах (RETURNING не видит столбцы источника)
+    "booking_bulk_insert": """
+        WITH c AS (
+            SELECT nextval(pg_get_serial_sequence('bookings', 'booking_id')) AS booking_id, c.*
+            FROM unnest($1::int[], $2::int[], $3::timestamp[], $4::timestamp[], $5::varchar[])
+                 WITH ORDINALITY AS c(user_id, resource_id, start_time, end_time, status, ord)
+        ),
+        inserted AS (
+            INSERT INTO Bookings (booking_id, user_id, resource_id, start_time, end_time, status)
+            SELECT booking_id, user_id, resource_id, start_time, end_time, status
+            FROM c
+            RETURNING booking_id
+        )
+        SELECT c.ord, inserted.booking_id
+        FROM inserted JOIN c USING (booking_id)
+    """,
+    "booking_delete": """
+        DELETE FROM Bookings WHERE booking_id = $1
+    """,
+    "booking_set_status": """
+        UPDATE Bookings
+        SET status = $2
+        WHERE booking_id = $1
+        RETURNING booking_id, user_id, resource_id, start_time, end_time, status
+    """,
+    "booking_list_by_resources_range": """
+        SELECT booking_id, user_id, resource_id, start_time, end_time, status
+        FROM Bookings
+        WHERE resource_id = ANY($1::int[])
+        AND start_time >= $2 AND start_time < $3
+        ORDER BY resource_id, start_time
+    """,
+    "booking_list_for_availability": """
+        SELECT resource_id, start_time, end_time
+        FROM Bookings
+        WHERE resource_id = ANY($1::int[])
+        AND start_time >= $2::timestamp - $4::interval AND start_time < $3
+        AND end_time > $2
+        AND status <> 'cancelled'
+        ORDER BY resource_id, start_time
+    """,
+
+    # --- Сессии ---
+    "session_insert": """
+        INSERT INTO Sessions (user_id, start_time, end_time)
+        VALUES ($1, $2, $3)
+        RETURNING session_id
+    """,
+    "session_delete": """
+        DELETE FROM Sessions WHERE session_id = $1
+        RETURNING user_id, end_time
+    """,
+    "session_open_list": """
+        SELECT session_id, user_id, start_time, end_time
+        FROM Sessions
+        WHERE end_time IS NULL
+        ORDER BY start_time
+    """,
+    "session_active_by_user": """
+        SELECT session_id, user_id, start_time, end_time
+        FROM Sessions
+        WHERE user_id = $1 AND end_time IS NULL
+    """,
+    "session_open_by_users": """
+        SELECT session_id, user_id, start_time, end_time
+        FROM Sessions
+        WHERE user_id = ANY($1::int[]) AND end_time IS NULL
+        ORDER BY start_time
+    """,
+    # Вместе с сессией завершается последнее начавшееся к $2 активное бронирование,
+    # а не самое позднее будущее повторение
+    "session_end_with_booking": """
+        WITH ended AS (
+            UPDATE Sessions
+            SET end_time = $2
+            WHERE session_id = $1 AND end_time IS NULL
+            RETURNING session_id, user_id, start_time, end_time
+        ), completed AS (
+            UPDATE Bookings
+            SET status = 'completed'
+            WHERE booking_id = (
+                SELECT b.booking_id
+                FROM Bookings b
+                JOIN ended e ON b.user_id = e.user_id
+                WHERE b.status = 'active' AND b.start_time <= $2
+                ORDER BY b.start_time DESC
+                LIMIT 1
+            )
+            RETURNING booking_id
+        )
+        SELECT e.session_id, e.user_id, e.start_time, e.end_time,
+               ARRAY(SELECT booking_id FROM completed) AS completed_booking_ids
+        FROM ended e
+    """,
+
+    # --- Экран сотрудника ---
+    # Одним запросом: пользователь, открытая сессия, начавшиеся к $2 активные бронирования
+    # с ресурсами и последние платежи ($1 — user_id, $2 — текущее время, $3 — число платежей).
+    # Будущие бронирования (например, повторения из /admin/bookings/bulk) в стоимость не входят.
+    "staff_dashboard": """
+        SELECT
+            u.user_id, u.first_name, u.last_name, u.email,
+            (
+                SELECT row_to_json(s)
+                FROM (
+                    SELECT session_id, user_id, start_time, end_time,
+                           GREATEST(FLOOR(EXTRACT(EPOCH FROM $2::timestamp - start_time) / 60), 0)::int AS minutes
+                    FROM Sessions
+                    WHERE user_id = u.user_id AND end_time IS NULL
+                    ORDER BY start_time DESC
+                    LIMIT 1
+                ) s
+            ) AS active_session,
+            (
+                SELECT COALESCE(json_agg(b ORDER BY b.start_time), '[]')
+                FROM (
+                    SELECT b.booking_id, b.resource_id, r.name AS resource_name, r.hourly_rate,
+                           b.start_time, b.end_time, b.status,
+                           FLOOR(EXTRACT(EPOCH FROM b.end_time - b.start_time) / 60)::int AS minutes
+                    FROM Bookings b
+                    JOIN Resources r ON r.resource_id = b.resource_id
+                    WHERE b.user_id = u.user_id AND b.status = 'active' AND b.start_time <= $2
+                ) b
+            ) AS bookings,
+            (
+                SELECT COALESCE(json_agg(p ORDER BY p.payment_date DESC), '[]')
+                FROM (
+                    SELECT payment_id, user_id, amount, payment_date
+                    FROM Payments
+                    WHERE user_id = u.user_id
+                    ORDER BY payment_date DESC
+                    LIMIT $3
+                ) p
+            ) AS payments
+        FROM Users u
+        WHERE u.user_id = $1
+    """,
+
+    # --- Расчёт посещения (checkout) ---
+    "session_end_open_by_user": """
+        UPDATE Sessions
+        SET end_time = $2
+        WHERE user_id = $1 AND end_time IS NULL
+        RETURNING session_id, user_id, start_time, end_time
+    """,
+    # Завершаются только бронирования, начавшиеся к моменту расчёта $2: будущие
+    # повторения остаются активными и не оплачиваются
+    "booking_complete_active_by_user": """
+        UPDATE Bookings b
+        SET status = 'completed'
+        FROM Resources r
+        WHERE r.resource_id = b.resource_id
+        AND b.user_id = $1 AND b.status = 'active' AND b.start_time <= $2
+        RETURNING b.booking_id, r.hourly_rate,
+                  FLOOR(EXTRACT(EPOCH FROM b.end_time - b.start_time) / 60)::int AS minutes
+    """,
+
+    # --- Закрытие дня (jobs.py): пачки по $2 строк, занятые строки пропускаются ---
+    "job_close_open_sessions": """
+        WITH batch AS (
+            SELECT session_id FROM Sessions
+            WHERE end_time IS NULL AND start_time < $1
+            ORDER BY session_id
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE Sessions s
+        SET end_time = $1
+        FROM batch
+        WHERE s.session_id = batch.session_id
+        RETURNING s.session_id, s.user_id
+    """,
+    "job_complete_expired_bookings": """
+        WITH batch AS (
+            SELECT booking_id FROM Bookings
+            WHERE status = 'active' AND end_time <= $1
+            ORDER BY end_time
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE Bookings b
+        SET status = 'completed'
+        FROM batch
+        WHERE b.booking_id = batch.booking_id
+        RETURNING b.booking_id
+    """,
+    # Выбор единственного исполнителя среди воркеров: сессионная advisory-блокировка
+    "job_try_lock": "SELECT pg_try_advisory_lock($1)",
+    "job_unlock": "SELECT pg_advisory_unlock($1)",
+
+    # --- Платежи ---
+    "payment_list_by_user": """
+        SELECT payment_id, user_id, amount, payment_date
+        FROM Payments
+        WHERE user_id = $1
+        ORDER BY payment_date DESC
+    """,
+    "payment_insert": """
+        INSERT INTO Payments (user_id, amount)
+        VALUES ($1, $2)
+    """,
+    "payment_insert_dated": """
+        INSERT INTO Payments (user_id, amount, payment_date)
+        VALUES ($1, $2, $3)
+        RETURNING payment_id
+    """,
+    "payment_delete": """
+        DELETE FROM Payments WHERE payment_id = $1
+    """,
+}
+
+# Основа запросов постраничных списков. Фильтры, условие курсора, сортировку и LIMIT
+# добавляет pagination.KeysetQuery, поэтому их варианты идут в запас кэша (DYNAMIC_STATEMENTS).
+LIST_QUERIES: Dict[str, str] = {
+    "user_page": """
+        SELECT u.user_id, u.first_name, u.last_name, u.email, u.role_id, r.role_name
+        FROM Users u
+        JOIN Roles r ON u.role_id = r.role_id
+    """,
+    "booking_page": """
+        SELECT booking_id, user_id, resource_id, start_time, end_time, status
+        FROM Bookings
+    """,
+    "session_page": """
+        SELECT session_id, user_id, start_time, end_time
+        FROM Sessions
+    """,
+    "payment_page": """
+        SELECT payment_id, user_id, amount, payment_date
+        FROM Payments
+    """,
+    "session_log_page": """
+        SELECT log_id, session_id, user_id, event_type, event_time
+        FROM session_logs
+    """,
+}
+
+# Время выполнения каждого именованного запроса
+query_latency: Dict[str, LatencyWindow] = {name: LatencyWindow(200) for name in QUERIES}
+
+def statement_cache_size() -> int:
+    """
+    Размер кэша подготовленных запросов asyncpg на соединение: весь реестр
+    плюс запас под динамические запросы, чтобы запросы реестра не вытеснялись.
+    """
+    if not PREPARE_QUERIES:
+        return 0
+    return len(QUERIES) + DYNAMIC_STATEMENTS
+
+async def _run(conn, name: str, method: str, *args):
+    # Запрос подготавливается при первом вызове на соединении и дальше берётся из кэша
+    # asyncpg (ключ — текст запроса); после изменения схемы кэш перестраивается сам
+    started = time.perf_counter()
+    try:
+        return await getattr(conn, method)(QUERIES[name], *args)
+    finally:
+        query_latency[name].record(time.perf_counter() - started)
+
+async def fetch(conn, name: str, *args):
+    return await _run(conn, name, 'fetch', *args)
+
+async def fetchrow(conn, name: str, *args):
+    return await _run(conn, name, 'fetchrow', *args)
+
+async def fetchval(conn, name: str, *args):
+    return await _run(conn, name, 'fetchval', *args)
+
+async def execute(conn, name: str, *args) -> str:
+    """Выполнение запроса без результата; возвращает статус, например 'DELETE 1'."""
+    return await _run(conn, name, 'execute', *args)
+
+async def fetch_dynamic(conn, name: str, sql: str, *args):
+    """
+    Запрос, текст которого собирается в обработчике (фильтры, курсор страницы).
+    Выполняется через кэш подготовленных запросов asyncpg, время пишется под именем name.
+    """
+    started = time.perf_counter()
+    try:
+        return await conn.fetch(sql, *args)
+    finally:
+        query_latency.setdefault(name, LatencyWindow(200)).record(time.perf_counter() - started)
+
+def stats() -> Dict:
+    return {name: window.stats() for name, window in query_latency.items() if window.count}
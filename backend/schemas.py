@@ -24,6 +24,9 @@ class UserRegister(BaseModel):
     email: str
     password: str
 
+class AdminUserCreate(UserRegister):
+    role_id: int
+
 class UserLogin(BaseModel):
     email: str
     password: str
@@ -0,0 +1,86 @@
+# backend/serialization.py
+
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Type
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него используется стандартный json
+    orjson = None
+
+# Быстрый путь для списков: строки asyncpg сразу превращаются в байты JSON,
+# без сборки моделей pydantic и повторной проверки по response_model.
+# FAST_SERIALIZATION=0 возвращает обычный путь FastAPI (например, для сравнения ответов).
+FAST_SERIALIZATION = os.getenv('FAST_SERIALIZATION', '1') == '1'
+
+def json_default(value: Any):
+    """Типы, которых нет в JSON. Decimal отдаётся числом, как поля float в моделях."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=json_default)
+    return json.dumps(value, default=json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+class FastJSONResponse(Response):
+    """JSON-ответ: готовые байты отдаются как есть, остальное кодируется через dumps."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def model_fields(model: Type[BaseModel]) -> List[str]:
+    fields = getattr(model, "model_fields", None)
+    return list(fields if fields is not None else model.__fields__)
+
+class RowEncoder:
+    """
+    Кодировщик строк asyncpg с заранее известным набором полей (поля модели ответа).
+    Если колонки запроса совпадают с полями, строка копируется в dict целиком,
+    иначе берутся только нужные поля.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+
+    @classmethod
+    def for_model(cls, model: Type[BaseModel]) -> "RowEncoder":
+        return cls(model_fields(model))
+
+    def to_dicts(self, rows: Sequence) -> List[Dict]:
+        if not rows:
+            return []
+        fields = self.fields
+        if tuple(rows[0].keys()) == fields:
+            return [dict(row) for row in rows]
+        return [{field: row[field] for field in fields} for row in rows]
+
+    def encode(self, rows: Sequence) -> bytes:
+        return dumps(self.to_dicts(rows))
+
+def json_response(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Готовый JSON-ответ без проверки по response_model. Заголовки, выставленные
+    обработчиком в response (например, X-Next-Cursor), переносятся в ответ.
+    """
+    headers = {}
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, headers=headers)
+
+def rows_response(rows: Sequence, encoder: RowEncoder, response: Optional[Response] = None):
+    """Ответ со списком строк."""
+    if not FAST_SERIALIZATION:
+        return encoder.to_dicts(rows)
+    return json_response(encoder.encode(rows), response)
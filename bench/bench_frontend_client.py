@@ -0,0 +1,90 @@
+# bench/bench_frontend_client.py
+#
+# Время запросов одной отрисовки страницы frontend к запущенному backend:
+#   before — как раньше в app.py: новый event loop и новый httpx.AsyncClient на каждый запрос;
+#   after  — frontend/api_client.py: общий цикл в фоновом потоке и общий клиент с keep-alive;
+#   gather — то же, но запросы идут одновременно, как в prefetch_page.
+# Страница — независимые GET страницы администратора «Бронирования»: открытая таблица,
+# поиск пользователя в формах добавления и удаления, справочник ресурсов.
+# Все запросы разные, поэтому все три варианта отправляют одинаковый набор запросов.
+#
+#   python bench/bench_frontend_client.py [число отрисовок]
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "frontend"))
+from backend.auth import create_access_token
+import api_client
+
+API_URL = os.getenv('API_URL', "http://127.0.0.1:8000")
+RENDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+PAGE_REQUESTS = [
+    ("/admin/bookings", {"limit": 100}),
+    ("/users/search", {"q": "1", "limit": 20}),
+    ("/users/search", {"q": "u", "limit": 20}),
+    ("/admin/resources", None),
+]
+
+TOKEN = create_access_token({"sub": "bench@bench", "role": "admin", "user_id": 0}, timedelta(minutes=30))
+
+async def get_before(path, params):
+    async with httpx.AsyncClient() as client:
+        return await client.get(f"{API_URL}{path}", params=params, headers={"Authorization": f"Bearer {TOKEN}"})
+
+async def get_after(path, params):
+    return await api_client.get(f"{API_URL}{path}", params=params, headers={"Authorization": f"Bearer {api_client.token()}"})
+
+def render_before():
+    for path, params in PAGE_REQUESTS:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(get_before(path, params)).raise_for_status()
+        loop.close()
+
+def render_after(runner):
+    # Новый прогон скрипта — новый набор запомненных GET
+    memo = {}
+    for path, params in PAGE_REQUESTS:
+        runner.run(get_after(path, params), TOKEN, memo).raise_for_status()
+
+def render_gather(runner):
+    responses = runner.gather([get_after(path, params) for path, params in PAGE_REQUESTS], TOKEN, {})
+    for response in responses:
+        response.raise_for_status()
+
+def measure(render):
+    render()  # прогрев
+    timings = []
+    for _ in range(RENDERS):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def main():
+    runner = api_client.ApiRunner()
+    results = {
+        "before": measure(render_before),
+        "after": measure(lambda: render_after(runner)),
+        "gather": measure(lambda: render_gather(runner)),
+    }
+    print(f"Отрисовок: {RENDERS}, запросов на отрисовку: {len(PAGE_REQUESTS)}")
+    for name, timings in results.items():
+        timings.sort()
+        print(f"{name:7} медиана {statistics.median(timings) * 1000:7.1f} мс, "
+              f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.1f} мс")
+    for name in ("after", "gather"):
+        print(f"Ускорение {name}: {statistics.median(results['before']) / statistics.median(results[name]):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench/bench_serialization.py
+#
+# Сравнение сериализации списка из 100k строк asyncpg:
+#   models — прежний путь: модели Booking в обработчике, проверка по response_model и json FastAPI;
+#   fast   — backend/serialization.py: строки сразу в байты JSON.
+# Оба обработчика вызываются через FastAPI (TestClient), строки заранее получены из базы,
+# поэтому замер не включает время запроса к Postgres.
+#
+#   python bench/bench_serialization.py [число строк] [повторы]
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+import asyncpg
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.database import DATABASE_CONFIG
+from backend.models import Booking
+from backend.serialization import RowEncoder, orjson, rows_response
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+# Строки той же формы, что у booking_page
+ROWS_SQL = """
+    SELECT i AS booking_id, i % 500 + 1 AS user_id, i % 20 + 1 AS resource_id,
+           TIMESTAMP '2024-01-01 10:00' + i * INTERVAL '1 minute' AS start_time,
+           TIMESTAMP '2024-01-01 11:00' + i * INTERVAL '1 minute' AS end_time,
+           'completed'::varchar AS status
+    FROM generate_series(1, $1) AS i
+"""
+
+async def load_rows():
+    conn = await asyncpg.connect(**DATABASE_CONFIG)
+    try:
+        return await conn.fetch(ROWS_SQL, ROWS)
+    finally:
+        await conn.close()
+
+rows = asyncio.run(load_rows())
+app = FastAPI()
+encoder = RowEncoder.for_model(Booking)
+
+@app.get("/models", response_model=List[Booking])
+async def via_models():
+    return [
+        Booking(
+            booking_id=row['booking_id'],
+            user_id=row['user_id'],
+            resource_id=row['resource_id'],
+            start_time=row['start_time'],
+            end_time=row['end_time'],
+            status=row['status'],
+        )
+        for row in rows
+    ]
+
+@app.get("/fast", response_model=List[Booking])
+async def via_encoder():
+    return rows_response(rows, encoder)
+
+def measure(client, path):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - started)
+    return timings, response
+
+def main():
+    print(f"Строк: {ROWS}, повторов: {REPEATS}, orjson: {'да' if orjson else 'нет (json)'}")
+    with TestClient(app) as client:
+        results = {path: measure(client, path) for path in ("/models", "/fast")}
+    models_body = results["/models"][1].json()
+    fast_body = results["/fast"][1].json()
+    assert models_body == fast_body, "Ответы двух путей различаются"
+    for path, (timings, response) in results.items():
+        print(f"{path:8} медиана {statistics.median(timings) * 1000:8.1f} мс, "
+              f"мин {min(timings) * 1000:8.1f} мс, ответ {len(response.content) / 1e6:.1f} МБ")
+    speedup = statistics.median(results["/models"][0]) / statistics.median(results["/fast"][0])
+    print(f"Ускорение: {speedup:.1f}x")
+
+if __name__ == "__main__":
+    main()
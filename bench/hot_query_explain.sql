@@ -0,0 +1,38 @@
+-- bench/hot_query_explain.sql
+-- Горячие запросы API; используется из hot_query_indexes.sql
+-- (ожидает переменные :bench_user и :bench_resource).
+
+\echo '--- /resources/bookings: бронирования нескольких ресурсов за неделю'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT booking_id, user_id, resource_id, start_time, end_time, status
+FROM Bookings
+WHERE resource_id = ANY(ARRAY[:bench_resource, :bench_resource + 1, :bench_resource + 2])
+  AND start_time >= TIMESTAMP '2021-06-01' AND start_time < TIMESTAMP '2021-06-08'
+ORDER BY resource_id, start_time;
+
+\echo '--- /user/bookings, /staff/users/{id}/bookings: бронирования пользователя'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT booking_id, user_id, resource_id, start_time, end_time, status
+FROM Bookings
+WHERE user_id = :bench_user
+ORDER BY start_time DESC;
+
+\echo '--- /staff/sessions/end: последнее активное бронирование пользователя'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT booking_id FROM Bookings
+WHERE user_id = :bench_user AND status = 'active'
+ORDER BY start_time DESC
+LIMIT 1;
+
+\echo '--- /staff/sessions/active: открытая сессия пользователя'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT session_id, user_id, start_time, end_time
+FROM Sessions
+WHERE user_id = :bench_user AND end_time IS NULL;
+
+\echo '--- /staff/users/{id}/payments: платежи пользователя'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT payment_id, user_id, amount, payment_date
+FROM Payments
+WHERE user_id = :bench_user
+ORDER BY payment_date DESC;
@@ -0,0 +1,79 @@
+-- bench/hot_query_indexes.sql
+-- Планы и время горячих запросов API до и после индексов из
+-- migrations/0003_hot_path_indexes.sql на сгенерированных данных
+-- (100 тыс. пользователей, 3 млн бронирований, 2 млн сессий, 2 млн платежей).
+--
+-- Запускать только на отдельной базе, созданной из init_db.sql:
+--   createdb anticafe_bench
+--   psql -d anticafe_bench -f init_db.sql
+--   psql -d anticafe_bench -f bench/hot_query_indexes.sql > bench_output.txt
+
+\set ON_ERROR_STOP on
+\timing on
+
+-- Исходное состояние: без индексов горячих запросов
+DROP INDEX IF EXISTS bookings_resource_start_idx;
+DROP INDEX IF EXISTS bookings_user_start_idx;
+DROP INDEX IF EXISTS bookings_user_active_idx;
+DROP INDEX IF EXISTS sessions_user_start_idx;
+DROP INDEX IF EXISTS sessions_open_user_idx;
+DROP INDEX IF EXISTS payments_user_date_idx;
+
+-- --- Генерация данных ---
+INSERT INTO Users (first_name, last_name, email, password_hash, role_id)
+SELECT 'Имя' || g, 'Фамилия' || g, 'user' || g || '@bench.local', 'x',
+       (SELECT role_id FROM Roles WHERE role_name = 'client')
+FROM generate_series(1, 100000) AS g;
+
+INSERT INTO Resources (name, description, hourly_rate)
+SELECT 'Ресурс ' || g, NULL, 100 + g FROM generate_series(1, 200) AS g;
+
+-- 15 000 непересекающихся двухчасовых слотов на каждый из 200 ресурсов;
+-- последние 50 слотов каждого ресурса активны, остальные завершены
+INSERT INTO Bookings (user_id, resource_id, start_time, end_time, status)
+SELECT 1 + (hashint4(r * 15000 + s) & 2147483647) % 100000,
+       r,
+       TIMESTAMP '2020-01-01 10:00' + (s * INTERVAL '2 hours'),
+       TIMESTAMP '2020-01-01 11:30' + (s * INTERVAL '2 hours'),
+       CASE WHEN s >= 14950 THEN 'active' ELSE 'completed' END
+FROM (SELECT min(resource_id) AS base FROM Resources) AS b,
+     generate_series(b.base, b.base + 199) AS r,
+     generate_series(0, 14999) AS s;
+
+-- Закрытые сессии и по одной открытой у первой тысячи пользователей
+INSERT INTO Sessions (user_id, start_time, end_time)
+SELECT u, TIMESTAMP '2020-01-01 10:00' + (g * INTERVAL '1 minute'),
+       TIMESTAMP '2020-01-01 12:00' + (g * INTERVAL '1 minute')
+FROM (SELECT min(user_id) AS base FROM Users) AS b,
+     generate_series(1, 2000000) AS g,
+     LATERAL (SELECT b.base + (g % 100000) AS u) AS x;
+
+INSERT INTO Sessions (user_id, start_time, end_time)
+SELECT user_id, NOW() - INTERVAL '1 hour', NULL FROM Users ORDER BY user_id LIMIT 1000;
+
+INSERT INTO Payments (user_id, amount, payment_date)
+SELECT b.base + (g % 100000), 300, TIMESTAMP '2020-01-01 10:00' + (g * INTERVAL '1 minute')
+FROM (SELECT min(user_id) AS base FROM Users) AS b, generate_series(1, 2000000) AS g;
+
+VACUUM ANALYZE Users;
+VACUUM ANALYZE Resources;
+VACUUM ANALYZE Bookings;
+VACUUM ANALYZE Sessions;
+VACUUM ANALYZE Payments;
+
+-- Параметры запросов: средний пользователь и ресурс
+SELECT min(user_id) + 4242 AS bench_user, (SELECT min(resource_id) + 42 FROM Resources) AS bench_resource
+FROM Users \gset
+
+-- --- Горячие запросы ---
+\echo '=== ДО ИНДЕКСОВ ==='
+\ir hot_query_explain.sql
+
+-- --- Индексы из миграции ---
+\ir ../migrations/0003_hot_path_indexes.sql
+VACUUM ANALYZE Bookings;
+VACUUM ANALYZE Sessions;
+VACUUM ANALYZE Payments;
+
+\echo '=== ПОСЛЕ ИНДЕКСОВ ==='
+\ir hot_query_explain.sql
@@ -0,0 +1,108 @@
+# frontend/api_client.py
+
+import asyncio
+import contextvars
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Coroutine, Dict, List, Optional
+
+import httpx
+import streamlit as st
+
+# Общий клиент и токен пользователя для корутины, выполняемой через run()
+_client: contextvars.ContextVar[httpx.AsyncClient] = contextvars.ContextVar("api_client")
+_token: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("api_token", default=None)
+# GET-запросы текущего прогона скрипта: ключ запроса -> задача (см. get())
+_memo: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("api_memo", default=None)
+
+class ApiRunner:
+    """
+    Один event loop в фоновом потоке и один httpx.AsyncClient с keep-alive на процесс
+    Streamlit. Страницы вызывают запросы синхронно через run(): цикл не создаётся
+    заново на каждый вызов, а TCP-соединения с backend переиспользуются.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="api-client-loop", daemon=True)
+        self._thread.start()
+        self.client = self._submit(self._open())
+
+    async def _open(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(event_hooks={"request": [_forget_on_change]})
+
+    def _submit(self, coro: Coroutine) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def run(self, coro: Coroutine, token: Optional[str], memo: Optional[Dict] = None) -> Any:
+        # Поток цикла не видит st.session_state сессии, поэтому токен передаётся через contextvar;
+        # у каждой задачи свой контекст, и токены разных сессий не смешиваются
+        async def with_context():
+            _client.set(self.client)
+            _token.set(token)
+            _memo.set(memo)
+            return await coro
+        return self._submit(with_context())
+
+    def gather(self, coros: List[Coroutine], token: Optional[str], memo: Optional[Dict] = None) -> List[Any]:
+        async def together():
+            return await asyncio.gather(*coros)
+        return self.run(together(), token, memo)
+
+@st.cache_resource
+def get_runner() -> ApiRunner:
+    return ApiRunner()
+
+def begin_run():
+    """Начало прогона скрипта: GET-запросы предыдущего прогона больше не переиспользуются."""
+    st.session_state['api_memo'] = {}
+
+def run(coro: Coroutine) -> Any:
+    """Синхронное выполнение корутины запроса к API от имени текущего пользователя."""
+    return get_runner().run(coro, st.session_state.get('token'), st.session_state.get('api_memo'))
+
+def gather(*coros: Coroutine) -> List[Any]:
+    """
+    Одновременное выполнение независимых запросов; результаты в порядке аргументов.
+    Время ожидания определяется самым долгим запросом, а не суммой.
+    """
+    return get_runner().gather(list(coros), st.session_state.get('token'), st.session_state.get('api_memo'))
+
+def token() -> Optional[str]:
+    """Токен пользователя, от имени которого выполняется текущий запрос."""
+    return _token.get()
+
+@asynccontextmanager
+async def client():
+    """Общий httpx.AsyncClient; в отличие от async with httpx.AsyncClient() не закрывается после запроса."""
+    yield _client.get()
+
+async def get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> httpx.Response:
+    """
+    GET через общий клиент. Одинаковые GET в одном прогоне скрипта (в том числе
+    выполняющиеся одновременно в gather) отправляются один раз, остальные ждут тот же ответ.
+    """
+    client = _client.get()
+    memo = _memo.get()
+    if memo is None:
+        return await client.get(url, params=params, headers=headers)
+    key = (url, repr(sorted((params or {}).items())), _token.get())
+    task = memo.get(key)
+    if task is None:
+        task = asyncio.ensure_future(client.get(url, params=params, headers=headers))
+        memo[key] = task
+
+        # Неудавшийся запрос не запоминается: следующий такой же GET отправится заново
+        def forget_failed(done: asyncio.Future):
+            if done.cancelled() or done.exception() is not None:
+                memo.pop(key, None)
+        task.add_done_callback(forget_failed)
+    # shield: отмена одного ожидающего не отменяет запрос для остальных
+    return await asyncio.shield(task)
+
+async def _forget_on_change(request: httpx.Request):
+    # Изменяющий запрос: ответы GET, полученные раньше в этом прогоне, могли устареть
+    if request.method != "GET":
+        memo = _memo.get()
+        if memo:
+            memo.clear()
@@ -3,16 +3,17 @@
 import streamlit as st
 import httpx
 from typing import Dict
-import asyncio
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List
 from typing import Optional
 
+import api_client
+
 # Настройки Backend API
 API_URL = "http://127.0.0.1:8000"
 
-# Конфигурация Streamlit для использования с asyncio
+# Запросы к API выполняются на общем event loop (см. api_client.py)
 st.set_page_config(page_title="Управление Антикафе", page_icon="☕️")
 
 # Хелперы для отображения уведомлений
@@ -25,8 +26,256 @@ def show_error(message):
 def show_info(message):
     st.info(message)
 
+# Размер страницы в таблицах и в списках выбора записи для удаления
+PAGE_SIZE = 100
+
+async def fetch_page(path: str, params: Optional[Dict] = None, cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Dict:
+    """
+    Получение одной страницы списка.
+    Возвращает {"items": [...], "next_cursor": ...}; next_cursor равен None на последней странице.
+    """
+    query = dict(params or {})
+    query["limit"] = limit
+    if cursor:
+        query["cursor"] = cursor
+    try:
+        response = await api_client.get(
+            f"{API_URL}{path}",
+            params=query,
+            headers={"Authorization": f"Bearer {api_client.token()}"}
+        )
+        if response.status_code == 200:
+            return {"items": response.json(), "next_cursor": response.headers.get("X-Next-Cursor")}
+        else:
+            try:
+                error_detail = response.json().get("detail", response.text)
+            except:
+                error_detail = "Неизвестная ошибка"
+            return {"error": error_detail}
+    except httpx.HTTPError as http_err:
+        return {"error": f"Ошибка HTTP: {str(http_err)}"}
+    except Exception as e:
+        return {"error": f"Неизвестная ошибка: {str(e)}"}
+
+def paged_table(key: str, path: str, params: Optional[Dict] = None, transform=None):
+    """
+    Таблица с постраничным просмотром. Курсоры открытых страниц хранятся
+    в st.session_state[f"{key}_cursors"]; transform преобразует строки страницы перед выводом.
+    """
+    cursors_key = f"{key}_cursors"
+    if cursors_key not in st.session_state:
+        return
+    cursors = st.session_state[cursors_key]
+
+    page = api_client.run(fetch_page(path, params, cursors[-1]))
+
+    if "error" in page:
+        st.error(page["error"])
+        return
+    items = transform(page["items"]) if transform else page["items"]
+    if items:
+        st.dataframe(pd.DataFrame(items))
+    else:
+        st.info("Записей нет.")
+
+    col_prev, col_page, col_next = st.columns(3)
+    with col_prev:
+        if len(cursors) > 1:
+            st.button("← Назад", key=f"{key}_prev", on_click=lambda: cursors.pop())
+    with col_page:
+        st.write(f"Страница {len(cursors)}")
+    with col_next:
+        if page["next_cursor"]:
+            st.button("Далее →", key=f"{key}_next", on_click=lambda: cursors.append(page["next_cursor"]))
+
+def open_paged_table(key: str):
+    """Открытие таблицы с первой страницы."""
+    st.session_state[f"{key}_cursors"] = [None]
+
+# Справочные данные (роли, ресурсы) кэшируются на REFERENCE_TTL секунд
+# отдельно для каждого токена; успешные изменения сбрасывают кэш своего справочника
+REFERENCE_TTL = 60
+
+class ReferenceLoadError(Exception):
+    """Ошибка загрузки справочника; исключение не даёт st.cache_data запомнить ответ с ошибкой."""
+
+@st.cache_resource
+def reference_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Счётчики обращений и промахов кэша справочников (общие для процесса)."""
+    return {}
+
+def _reference_stats(name: str) -> Dict[str, int]:
+    return reference_cache_stats().setdefault(name, {"calls": 0, "misses": 0})
+
+def _loaded(name: str, result):
+    _reference_stats(name)["misses"] += 1
+    if isinstance(result, dict):
+        raise ReferenceLoadError(result.get("error") or result.get("detail") or "Неизвестная ошибка")
+    return result
+
+@st.cache_data(ttl=REFERENCE_TTL, show_spinner=False)
+def _cached_roles(token: str) -> List[Dict]:
+    return _loaded("roles", api_client.run(fetch_roles()))
+
+@st.cache_data(ttl=REFERENCE_TTL, show_spinner=False)
+def _cached_resources(token: str) -> List[Dict]:
+    return _loaded("resources", api_client.run(fetch_resources(resources_cache())))
+
+REFERENCE_LOADERS = {
+    "roles": _cached_roles,
+    "resources": _cached_resources,
+}
+
+def reference(name: str):
+    """Справочник из кэша; при ошибке загрузки — {"error": ...}, как у остальных запросов."""
+    _reference_stats(name)["calls"] += 1
+    try:
+        return REFERENCE_LOADERS[name](st.session_state['token'])
+    except ReferenceLoadError as e:
+        return {"error": str(e)}
+
+def invalidate_reference(*names: str):
+    for name in names:
+        REFERENCE_LOADERS[name].clear()
+
+def reference_cache_panel():
+    """Отладочная панель: доля попаданий в кэш справочников."""
+    with st.sidebar.expander("Кэш справочников"):
+        rows = []
+        for name, stats in reference_cache_stats().items():
+            hits = stats["calls"] - stats["misses"]
+            ratio = hits / stats["calls"] if stats["calls"] else 0
+            rows.append({"справочник": name, "обращений": stats["calls"], "промахов": stats["misses"], "попаданий": f"{ratio:.0%}"})
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+        else:
+            st.write("Обращений пока не было.")
+        st.caption(f"TTL: {REFERENCE_TTL} с")
+
+# Сколько совпадений показывает поиск пользователя
+USER_SEARCH_LIMIT = 20
+
+async def search_users(q: str, limit: int = USER_SEARCH_LIMIT) -> List[Dict]:
+    """Поиск пользователей на сервере по части имени, email или ID."""
+    try:
+        response = await api_client.get(
+            f"{API_URL}/users/search",
+            params={"q": q, "limit": limit},
+            headers={"Authorization": f"Bearer {api_client.token()}"}
+        )
+        if response.status_code == 200:
+            return response.json()
+        try:
+            error_detail = response.json().get("detail", response.text)
+        except:
+            error_detail = "Неизвестная ошибка"
+        return {"error": error_detail}
+    except httpx.HTTPError as http_err:
+        return {"error": f"Ошибка HTTP: {str(http_err)}"}
+
+def user_picker(label: str, key: str) -> Optional[int]:
+    """
+    Выбор пользователя без загрузки всего списка: поле поиска и выпадающий список
+    из не более чем USER_SEARCH_LIMIT совпадений. Возвращает user_id или None.
+    """
+    query = st.text_input(f"{label}: имя, email или ID", key=f"{key}_query").strip()
+    if not query:
+        st.caption("Введите часть имени, email или ID пользователя.")
+        return None
+    users = api_client.run(search_users(query))
+    if "error" in users:
+        st.error(users["error"])
+        return None
+    if not users:
+        st.warning("Пользователи не найдены.")
+        return None
+    user_options = {
+        f"{user['first_name']} {user['last_name']} ({user['email']}, ID: {user['user_id']})": user['user_id']
+        for user in users
+    }
+    selected_user = st.selectbox(label, list(user_options.keys()), key=f"{key}_select")
+    return user_options[selected_user]
+
+def user_record_picker(label: str, key: str, path: str, id_field: str, format_row, params: Optional[Dict] = None) -> Optional[int]:
+    """
+    Выбор записи для удаления без загрузки всей истории: пользователь ищется через
+    user_picker, в списке — одна страница (последние PAGE_SIZE) его записей.
+    Возвращает значение поля id_field выбранной записи или None.
+    """
+    user_id = user_picker("Пользователь", key=f"{key}_user")
+    if user_id is None:
+        return None
+    page = api_client.run(fetch_page(path, dict(params or {}, user_id=user_id)))
+    if "error" in page:
+        st.error(page["error"])
+        return None
+    if not page["items"]:
+        st.info("У пользователя нет записей для удаления.")
+        return None
+    if page["next_cursor"]:
+        st.caption(f"Показаны последние {PAGE_SIZE} записей пользователя.")
+    options = {format_row(row): row[id_field] for row in page["items"]}
+    selected = st.selectbox(label, list(options.keys()), key=f"{key}_select")
+    return options[selected]
+
+async def fetch_labels(user_ids: List[int] = (), resource_ids: List[int] = ()) -> Dict:
+    """
+    Подписи для id одним запросом: {"users": {user_id: email}, "resources": {resource_id: name}}.
+    Запрашиваются только переданные id, а не полные справочники.
+    """
+    params = {"user_id": sorted(set(user_ids)), "resource_id": sorted(set(resource_ids))}
+    try:
+        response = await api_client.get(
+            f"{API_URL}/lookup/labels",
+            params=params,
+            headers={"Authorization": f"Bearer {api_client.token()}"}
+        )
+        if response.status_code == 200:
+            # Ключи объектов JSON — строки, в таблицах id — числа
+            return {
+                kind: {int(key): label for key, label in labels.items()}
+                for kind, labels in response.json().items()
+            }
+        return {"error": response.text}
+    except httpx.HTTPError as http_err:
+        return {"error": f"Ошибка HTTP: {str(http_err)}"}
+
+def prefetch_page(table_key: str, table_path: str, picker_keys: List[str]):
+    """
+    Одновременная отправка независимых GET страницы до её отрисовки: открытая страница
+    таблицы и поиски пользователей в формах (текст поиска уже лежит в st.session_state).
+    Ответы запоминаются на прогон скрипта (api_client.get), поэтому таблица и формы
+    ниже получают их без повторного запроса.
+    """
+    requests = []
+    cursors = st.session_state.get(f"{table_key}_cursors")
+    if cursors:
+        requests.append(fetch_page(table_path, None, cursors[-1]))
+    for key in picker_keys:
+        query = st.session_state.get(f"{key}_query", "").strip()
+        if query:
+            requests.append(search_users(query))
+    if requests:
+        api_client.gather(*requests)
+
+def with_user_emails(rows: List[Dict]) -> List[Dict]:
+    """Замена user_id на email пользователя в строках таблицы (подписи только для id этой страницы)."""
+    if not rows:
+        return rows
+    labels = api_client.run(fetch_labels(user_ids=[row["user_id"] for row in rows]))
+    if "error" in labels:
+        st.error(labels["error"])
+        return rows
+    user_email_map = labels["users"]
+    result = []
+    for row in rows:
+        row = dict(row)
+        row["email"] = user_email_map.get(row.pop("user_id"), "Неизвестный пользователь")
+        result.append(row)
+    return result
+
 async def register_user(first_name, last_name, email, password):
-    async with httpx.AsyncClient() as client:
+    async with api_client.client() as client:
         try:
             response = await client.post(f"{API_URL}/register", json={
                 "first_name": first_name,
@@ -44,7 +293,7 @@ async def register_user(first_name, last_name, email, password):
 
 
 async def login_user(email, password):
-    async with httpx.AsyncClient() as client:
+    async with api_client.client() as client:
         try:
             response = await client.post(
                 f"{API_URL}/login",
@@ -61,7 +310,7 @@ async def login_user(email, password):
             return False, str(e)
 
 async def get_current_user(token):
-    async with httpx.AsyncClient() as client:
+    async with api_client.client() as client:
         try:
             response = await client.get(f"{API_URL}/users/me", headers={
                 "Authorization": f"Bearer {token}"
@@ -94,78 +343,20 @@ def admin_page():
     elif choice == "Логи":
         manage_logs()
 
-async def fetch_users() -> Dict:
-    """Получение списка пользователей с сервера"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/admin/users",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                # Обработка ошибок от сервера
-                try:
-                    error_detail = response.json().get("detail", "Неизвестная ошибка")
-                except:
-                    error_detail = "Неизвестная ошибка"
-                return {"error": error_detail}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
-
-async def fetch_session_logs() -> List[Dict]:
-    """Получение логов сессий."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/logs/sessions",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                try:
-                    error_detail = response.json().get("detail", response.text)
-                except:
-                    error_detail = "Неизвестная ошибка"
-                return {"error": error_detail}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
-
 def manage_logs():
     st.write("Логи системы")
     if st.button("Показать логи сессий"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        session_logs = loop.run_until_complete(fetch_session_logs())
-        loop.close()
-
-        if isinstance(session_logs, dict) and "error" in session_logs:
-            st.error(session_logs["error"])
-        else:
-            # Преобразуем логи в DataFrame
-            df_logs = pd.DataFrame(session_logs)
-            if not df_logs.empty:
-                # Преобразуем колонку event_time в читаемый формат
-                if 'event_time' in df_logs.columns:
-                    df_logs['event_time'] = pd.to_datetime(df_logs['event_time'])
-                st.dataframe(df_logs)
-            else:
-                st.info("Логи сессий отсутствуют.")
+        open_paged_table("session_logs")
+    paged_table("session_logs", "/logs/sessions")
 
 async def add_user(user_data: Dict) -> Dict:
     """Добавление нового пользователя через сервер"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.post(
                 f"{API_URL}/admin/users",
                 json=user_data,
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200 or response.status_code == 201:
                 return {"message": response.json().get("message", "Пользователь успешно добавлен")}
@@ -184,10 +375,10 @@ async def add_user(user_data: Dict) -> Dict:
 async def delete_user(user_id: int) -> Dict:
     """Удаление пользователя через сервер"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.delete(
                 f"{API_URL}/admin/users/{user_id}",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return {"message": response.json().get("message", "Пользователь успешно удалён")}
@@ -204,9 +395,9 @@ async def delete_user(user_id: int) -> Dict:
         return {"error": f"Неизвестная ошибка: {str(e)}"}
 
 async def fetch_roles():
-    async with httpx.AsyncClient() as client:
+    async with api_client.client() as client:
         response = await client.get(f"{API_URL}/roles", headers={
-            "Authorization": f"Bearer {st.session_state['token']}"
+            "Authorization": f"Bearer {api_client.token()}"
         })
         return response.json()
 
@@ -215,16 +406,8 @@ def manage_users():
 
     # Отображение списка пользователей
     if st.button("Показать всех пользователей"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        users = loop.run_until_complete(fetch_users())
-        loop.close()
-
-        if "error" in users:
-            st.error(users["error"])
-        else:
-            df = pd.DataFrame(users)
-            st.dataframe(df)
+        open_paged_table("users")
+    paged_table("users", "/admin/users")
 
     # Форма для добавления пользователя
     st.subheader("Добавить нового пользователя")
@@ -234,10 +417,7 @@ def manage_users():
     password = st.text_input("Пароль", type="password", key="add_user_password")
 
     # Получение списка ролей
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    roles = loop.run_until_complete(fetch_roles())
-    loop.close()
+    roles = reference("roles")
 
     if "error" in roles:
         st.error(roles["error"])
@@ -256,10 +436,7 @@ def manage_users():
                 "password": password,
                 "role_id": selected_role_id
             }
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(add_user(user_data))
-            loop.close()
+            response = api_client.run(add_user(user_data))
 
             if "message" in response:
                 st.session_state["add_message"] = response["message"]
@@ -280,35 +457,19 @@ def manage_users():
 
     # Форма для удаления пользователя
     st.subheader("Удалить пользователя")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    users = loop.run_until_complete(fetch_users())
-    loop.close()
+    # Пользователь ищется на сервере, полный список не загружается
+    user_id = user_picker("Выберите пользователя для удаления", key="delete_user")
 
-    if "error" in users:
-        st.error(users["error"])
-    else:
-        if users:
-            # Создаём словарь для отображения в selectbox
-            user_options = {f"{user['user_id']} - {user['email']}": user['user_id'] for user in users}
-            selected_user = st.selectbox("Выберите пользователя для удаления", list(user_options.keys()))
-    
-            if st.button("Удалить пользователя"):
-                user_id = user_options[selected_user]
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(delete_user(user_id))
-                loop.close()
-    
-                if "message" in response:
-                    st.session_state["delete_message"] = response["message"]
-                    st.rerun()  # Обновление страницы после удаления
-                elif "error" in response:
-                    st.error(response["error"])
-                else:
-                    st.error("Ошибка при удалении пользователя")
+    if user_id is not None and st.button("Удалить пользователя"):
+        response = api_client.run(delete_user(user_id))
+
+        if "message" in response:
+            st.session_state["delete_message"] = response["message"]
+            st.rerun()  # Обновление страницы после удаления
+        elif "error" in response:
+            st.error(response["error"])
         else:
-            st.info("Нет пользователей для удаления.")
+            st.error("Ошибка при удалении пользователя")
     
     if "delete_message" in st.session_state:
         st.success(st.session_state["delete_message"])
@@ -316,36 +477,14 @@ def manage_users():
 
 
 
-async def fetch_bookings() -> Dict:
-    """Получение списка бронирований с сервера"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/admin/bookings",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                # Обработка ошибок от сервера
-                try:
-                    error_detail = response.json().get("detail", "Неизвестная ошибка")
-                except:
-                    error_detail = "Неизвестная ошибка"
-                return {"error": error_detail}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
-        
 async def add_booking(booking_data: Dict) -> Dict:
     """Добавление нового бронирования через сервер"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.post(
                 f"{API_URL}/admin/bookings",
                 json=booking_data,
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 201:
                 return {"message": "Бронирование успешно добавлено"}
@@ -364,10 +503,10 @@ async def add_booking(booking_data: Dict) -> Dict:
 async def delete_booking(booking_id: int) -> Dict:
     """Удаление бронирования через сервер"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.delete(
                 f"{API_URL}/admin/bookings/{booking_id}",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return {"message": "Бронирование успешно удалено"}
@@ -395,46 +534,24 @@ def manage_bookings():
         st.success(st.session_state["delete_booking_message"])
         del st.session_state["delete_booking_message"]
 
+    prefetch_page("bookings", "/admin/bookings", ["booking_user", "delete_booking_user"])
+
     # Отображение списка бронирований
     if st.button("Показать все бронирования"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        bookings = loop.run_until_complete(fetch_bookings())
-        loop.close()
-
-        if "error" in bookings:
-            st.error(bookings["error"])
-        else:
-            df = pd.DataFrame(bookings)
-            st.dataframe(df)
+        open_paged_table("bookings")
+    paged_table("bookings", "/admin/bookings")
 
     st.markdown("---")  # Разделитель между выводом и добавлением бронирования
 
     # Форма для добавления бронирования
     st.write("Добавить новое бронирование")
-    # Запрос пользователей и ресурсов с сервера
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    users = loop.run_until_complete(fetch_users())
-    resources = loop.run_until_complete(fetch_resources())
-    loop.close()
-
-    # Проверка и обработка полученных данных
-    if "error" in users:
-        st.error(users["error"])
-        users = []
+    # Пользователь ищется на сервере, ресурсы берутся из справочника
+    resources = reference("resources")
     if "error" in resources:
         st.error(resources["error"])
         resources = []
 
-    # Выпадающий список пользователей по email
-    if users:
-        user_options = {f"{user['email']}": user['user_id'] for user in users}
-        selected_user_email = st.selectbox("Выберите пользователя (email)", list(user_options.keys()))
-        selected_user_id = user_options[selected_user_email]
-    else:
-        st.warning("Пользователи не найдены.")
-        selected_user_id = None
+    selected_user_id = user_picker("Выберите пользователя", key="booking_user")
 
     # Выпадающий список ресурсов по названию
     if resources:
@@ -467,10 +584,7 @@ def manage_bookings():
                     "end_time": end_datetime.isoformat(),
                     "status": status
                 }
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(add_booking(booking_data))
-                loop.close()
+                response = api_client.run(add_booking(booking_data))
 
                 if "message" in response:
                     st.session_state["add_booking_message"] = response["message"]
@@ -487,71 +601,60 @@ def manage_bookings():
     # Форма для удаления бронирования
     st.write("Удалить бронирование")
 
-    # Получаем данные о бронированиях, пользователях и ресурсах
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    bookings = loop.run_until_complete(fetch_bookings())
-    users = loop.run_until_complete(fetch_users())
-    resources = loop.run_until_complete(fetch_resources())
-    loop.close()
-
-    # Проверяем наличие ошибок
-    if "error" in bookings:
-        st.error(bookings["error"])
-    if "error" in users:
-        st.error(users["error"])
-        users = []
-    if "error" in resources:
-        st.error(resources["error"])
-        resources = []
-
-    # Создаём словарь отображения email и названий ресурсов
-    if bookings and users and resources:
-        user_dict = {user["user_id"]: user["email"] for user in users}
-        resource_dict = {resource["resource_id"]: resource["name"] for resource in resources}
-
-        # Создаем отображение для selectbox
-        booking_options = {
-            f"{user_dict.get(booking['user_id'], 'Неизвестный пользователь')} - {resource_dict.get(booking['resource_id'], 'Неизвестный ресурс')}": booking['booking_id']
-            for booking in bookings
-        }
-        selected_booking = st.selectbox("Выберите бронирование для удаления", list(booking_options.keys()))
-
-        if st.button("Удалить бронирование"):
-            booking_id = booking_options[selected_booking]
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(delete_booking(booking_id))
-            loop.close()
+    # Бронирования выбранного пользователя приходят с названиями ресурсов (expand)
+    booking_id = user_record_picker(
+        "Выберите бронирование для удаления", "delete_booking", "/admin/bookings", "booking_id",
+        lambda booking: f"№{booking['booking_id']}: {booking['resource_name'] or 'Неизвестный ресурс'}, "
+                        f"{booking['start_time']} - {booking['end_time']} ({booking['status']})",
+        {"expand": "resource"},
+    )
+
+    if booking_id is not None and st.button("Удалить бронирование"):
+        response = api_client.run(delete_booking(booking_id))
+
+        if "message" in response:
+            st.session_state["delete_booking_message"] = response["message"]
+            st.rerun()  # Обновление страницы после удаления
+        elif "error" in response:
+            st.error(response["error"])
+        else:
+            st.error("Ошибка при удалении бронирования")
 
-            if "message" in response:
-                st.session_state["delete_booking_message"] = response["message"]
-                st.rerun()  # Обновление страницы после удаления
-            elif "error" in response:
-                st.error(response["error"])
-            else:
-                st.error("Ошибка при удалении бронирования")
-    else:
-        st.info("Нет бронирований для удаления.")
+def resources_cache() -> Dict:
+    """Сохранённые в st.session_state список ресурсов и его ETag."""
+    if "resources_cache" not in st.session_state:
+        st.session_state["resources_cache"] = {}
+    return st.session_state["resources_cache"]
 
-async def fetch_resources() -> List[Dict]:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{API_URL}/admin/resources", headers={
-            "Authorization": f"Bearer {st.session_state['token']}"
-        })
-        return response.json() if response.status_code == 200 else {"error": response.text}
+async def fetch_resources(cache: Dict) -> List[Dict]:
+    """
+    Список ресурсов с условным запросом: ETag из cache (см. resources_cache) уходит
+    в If-None-Match, и при ответе 304 используется сохранённый список.
+    """
+    headers = {"Authorization": f"Bearer {api_client.token()}"}
+    if cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+    response = await api_client.get(f"{API_URL}/admin/resources", headers=headers)
+    if response.status_code == 304 and "resources" in cache:
+        return cache["resources"]
+    if response.status_code != 200:
+        return {"error": response.text}
+    resources = response.json()
+    if response.headers.get("ETag"):
+        cache.update(etag=response.headers["ETag"], resources=resources)
+    return resources
 
 async def add_resource(resource_data: Dict) -> Dict:
-    async with httpx.AsyncClient() as client:
+    async with api_client.client() as client:
         response = await client.post(f"{API_URL}/admin/resources", json=resource_data, headers={
-            "Authorization": f"Bearer {st.session_state['token']}"
+            "Authorization": f"Bearer {api_client.token()}"
         })
         return response.json() if response.status_code == 200 else {"error": response.text}
 
 async def delete_resource(resource_id: int) -> Dict:
-    async with httpx.AsyncClient() as client:
+    async with api_client.client() as client:
         response = await client.delete(f"{API_URL}/admin/resources/{resource_id}", headers={
-            "Authorization": f"Bearer {st.session_state['token']}"
+            "Authorization": f"Bearer {api_client.token()}"
         })
         return response.json() if response.status_code == 200 else {"error": response.text}
 
@@ -560,10 +663,7 @@ def manage_resources():
 
     # Отображение списка ресурсов
     if st.button("Показать все ресурсы"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        resources = loop.run_until_complete(fetch_resources())
-        loop.close()
+        resources = reference("resources")
 
         if "error" in resources:
             st.error(resources["error"])
@@ -584,12 +684,10 @@ def manage_resources():
                 "description": resource_description,
                 "hourly_rate": hourly_rate
             }
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(add_resource(resource_data))
-            loop.close()
+            response = api_client.run(add_resource(resource_data))
 
             if "message" in response:
+                invalidate_reference("resources")
                 st.success(response["message"])
             elif "error" in response:
                 st.error(response["error"])
@@ -602,10 +700,7 @@ def manage_resources():
     st.write("Удалить ресурс")
 
     # Получение списка ресурсов с сервера
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    resources = loop.run_until_complete(fetch_resources())
-    loop.close()
+    resources = reference("resources")
 
     if "error" in resources:
         st.error(resources["error"])
@@ -617,12 +712,10 @@ def manage_resources():
 
             if st.button("Удалить ресурс"):
                 resource_id = resource_options[selected_resource_name]  # Получение ID выбранного ресурса
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(delete_resource(resource_id))
-                loop.close()
+                response = api_client.run(delete_resource(resource_id))
 
                 if "message" in response:
+                    invalidate_reference("resources")
                     st.success(response["message"])
                 elif "error" in response:
                     st.error(response["error"])
@@ -634,28 +727,11 @@ def manage_resources():
 async def add_session(session_data: dict) -> dict:
     """Добавление новой сессии через сервер"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.post(
                 f"{API_URL}/admin/sessions",
                 json=session_data,
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"error": response.text}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
-
-async def fetch_sessions() -> list:
-    """Получение списка сессий с сервера"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/admin/sessions",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -669,10 +745,10 @@ async def fetch_sessions() -> list:
 async def delete_session(session_id: int) -> dict:
     """Удаление сессии через сервер"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.delete(
                 f"{API_URL}/admin/sessions/{session_id}",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -686,58 +762,17 @@ async def delete_session(session_id: int) -> dict:
 def manage_sessions():
     st.subheader("Управление сессиями")
 
+    prefetch_page("sessions", "/admin/sessions", ["session_user", "delete_session_user"])
+
     # --- Отображение списка сессий ---
     if st.button("Показать все сессии"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        sessions = loop.run_until_complete(fetch_sessions())
-        users = loop.run_until_complete(fetch_users())
-        loop.close()
-
-        if "error" in sessions:
-            st.error(sessions["error"])
-        elif "error" in users:
-            st.error(users["error"])
-        else:
-            if sessions and users:
-                # Преобразование данных для отображения
-                user_dict = {user["user_id"]: user["email"] for user in users}
-                session_data = [
-                    {
-                        "session_id": session["session_id"],
-                        "email": user_dict.get(session["user_id"], "Неизвестный пользователь"),
-                        "start_time": session["start_time"],
-                        "end_time": session["end_time"],
-                    }
-                    for session in sessions
-                ]
-                # Отображение данных в виде таблицы
-                df = pd.DataFrame(session_data)
-                st.dataframe(df)
-            else:
-                st.info("Нет доступных сессий.")
+        open_paged_table("sessions")
+    paged_table("sessions", "/admin/sessions", transform=with_user_emails)
 
     # --- Добавление новой сессии ---
     st.write("Добавить новую сессию")
 
-    # Получение пользователей для выбора
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    users = loop.run_until_complete(fetch_users())
-    loop.close()
-
-    if "error" in users:
-        st.error(users["error"])
-        users = []
-
-    if users:
-        # Выпадающий список пользователей
-        user_options = {f"{user['email']}": user["user_id"] for user in users}
-        selected_user_email = st.selectbox("Выберите пользователя (email)", list(user_options.keys()))
-        selected_user_id = user_options[selected_user_email]
-    else:
-        st.warning("Нет пользователей для выбора.")
-        selected_user_id = None
+    selected_user_id = user_picker("Выберите пользователя", key="session_user")
 
     # Поля для выбора времени начала и окончания сессии
     start_date = st.date_input("Дата начала сессии", key="session_start_date")
@@ -758,10 +793,7 @@ def manage_sessions():
                     "start_time": start_datetime.isoformat(),
                     "end_time": end_datetime.isoformat(),
                 }
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(add_session(session_data))
-                loop.close()
+                response = api_client.run(add_session(session_data))
 
                 if "message" in response:
                     st.success(response["message"])
@@ -775,70 +807,20 @@ def manage_sessions():
     # --- Удаление сессии ---
     st.write("Удалить сессию")
 
-    # Получение списка сессий и пользователей
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    sessions = loop.run_until_complete(fetch_sessions())
-    users = loop.run_until_complete(fetch_users())
-    loop.close()
-
-    if "error" in sessions:
-        st.error(sessions["error"])
-    elif "error" in users:
-        st.error(users["error"])
-    else:
-        if sessions:
-            # Создаем словарь для сопоставления user_id с email
-            user_email_map = {user["user_id"]: user["email"] for user in users}
-
-            # Создание выпадающего списка сессий с email
-            session_options = {
-                f"{session['start_time']} - {session['end_time']} ( {user_email_map.get(session['user_id'], 'Неизвестный пользователь')})": session["session_id"]
-                for session in sessions
-            }
+    session_id = user_record_picker(
+        "Выберите сессию для удаления", "delete_session", "/admin/sessions", "session_id",
+        lambda session: f"№{session['session_id']}: {session['start_time']} - {session['end_time'] or 'не закрыта'}",
+    )
 
-            selected_session = st.selectbox("Выберите сессию для удаления", list(session_options.keys()))
+    if session_id is not None and st.button("Удалить сессию"):
+        response = api_client.run(delete_session(session_id))
 
-            if st.button("Удалить сессию"):
-                session_id = session_options[selected_session]
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(delete_session(session_id))
-                loop.close()
-
-                if "message" in response:
-                    st.success(response["message"])
-                elif "error" in response:
-                    st.error(response["error"])
-                else:
-                    st.error("Ошибка при удалении сессии.")
+        if "message" in response:
+            st.success(response["message"])
+        elif "error" in response:
+            st.error(response["error"])
         else:
-            st.info("Нет доступных сессий для удаления.")
-
-# --- Получение списка платежей ---
-async def fetch_payments():
-    """
-    Получение списка платежей с сервера.
-    """
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/admin/payments",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                # Обработка ошибок от сервера
-                try:
-                    error_detail = response.json().get("detail", "Неизвестная ошибка")
-                except:
-                    error_detail = "Неизвестная ошибка"
-                return {"error": error_detail}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
+            st.error("Ошибка при удалении сессии.")
 
 # --- Добавление платежа ---
 async def add_payment(payment_data):
@@ -846,11 +828,11 @@ async def add_payment(payment_data):
     Добавление нового платежа через сервер.
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.post(
                 f"{API_URL}/admin/payments",
                 json=payment_data,
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200 or response.status_code == 201:
                 return response.json()
@@ -872,10 +854,10 @@ async def delete_payment(payment_id):
     Удаление платежа через сервер.
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.delete(
                 f"{API_URL}/admin/payments/{payment_id}",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -894,59 +876,17 @@ async def delete_payment(payment_id):
 def manage_payments():
     st.subheader("Управление платежами")
 
+    prefetch_page("payments", "/admin/payments", ["payment_user", "delete_payment_user"])
+
     # --- Отображение списка платежей ---
     if st.button("Показать все платежи"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        payments = loop.run_until_complete(fetch_payments())
-        users = loop.run_until_complete(fetch_users())
-        loop.close()
-
-        if "error" in payments:
-            st.error(payments["error"])
-        elif "error" in users:
-            st.error(users["error"])
-        else:
-            if payments and users:
-                # Создаем словарь для сопоставления user_id с email
-                user_email_map = {user["user_id"]: user["email"] for user in users}
-
-                # Преобразование данных для отображения
-                payment_data = [
-                    {
-                        "payment_id": payment["payment_id"],
-                        "email": user_email_map.get(payment["user_id"], "Неизвестный пользователь"),
-                        "amount": payment["amount"],
-                    }
-                    for payment in payments
-                ]
-                # Отображение данных в виде таблицы
-                df = pd.DataFrame(payment_data)
-                st.dataframe(df)
-            else:
-                st.info("Нет доступных платежей.")
+        open_paged_table("payments")
+    paged_table("payments", "/admin/payments", transform=with_user_emails)
 
     # --- Добавление нового платежа ---
     st.write("Добавить новый платеж")
 
-    # Получение списка пользователей
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    users = loop.run_until_complete(fetch_users())
-    loop.close()
-
-    if "error" in users:
-        st.error(users["error"])
-        users = []
-
-    if users:
-        # Выпадающий список пользователей
-        user_options = {f"{user['email']}": user["user_id"] for user in users}
-        selected_user_email = st.selectbox("Выберите пользователя (email)", list(user_options.keys()))
-        selected_user_id = user_options[selected_user_email]
-    else:
-        st.warning("Нет пользователей для выбора.")
-        selected_user_id = None
+    selected_user_id = user_picker("Выберите пользователя", key="payment_user")
 
     # Поле для ввода суммы платежа
     amount = st.number_input("Сумма платежа", min_value=0.01, step=0.01, key="payment_amount")
@@ -957,10 +897,7 @@ def manage_payments():
                 "user_id": selected_user_id,
                 "amount": amount,
             }
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(add_payment(payment_data))
-            loop.close()
+            response = api_client.run(add_payment(payment_data))
 
             if "message" in response:
                 st.success(response["message"])
@@ -974,106 +911,47 @@ def manage_payments():
     # --- Удаление платежа ---
     st.write("Удалить платеж")
 
-    # Получение списка платежей и пользователей
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    payments = loop.run_until_complete(fetch_payments())
-    users = loop.run_until_complete(fetch_users())
-    loop.close()
-
-    if "error" in payments:
-        st.error(payments["error"])
-    elif "error" in users:
-        st.error(users["error"])
-    else:
-        if payments:
-            # Создаём словарь email пользователей
-            user_emails = {user['user_id']: user['email'] for user in users}
-
-            # Создание выпадающего списка платежей
-            payment_options = {
-                f"{payment['amount']} - {user_emails.get(payment['user_id'], 'Неизвестный')}": payment["payment_id"]
-                for payment in payments
-            }
-            selected_payment = st.selectbox("Выберите платеж для удаления", list(payment_options.keys()))
+    payment_id = user_record_picker(
+        "Выберите платеж для удаления", "delete_payment", "/admin/payments", "payment_id",
+        lambda payment: f"№{payment['payment_id']}: {payment['amount']} ({payment['payment_date']})",
+    )
 
-            if st.button("Удалить платеж"):
-                payment_id = payment_options[selected_payment]
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(delete_payment(payment_id))
-                loop.close()
+    if payment_id is not None and st.button("Удалить платеж"):
+        response = api_client.run(delete_payment(payment_id))
 
-                if "message" in response:
-                    st.success(response["message"])
-                elif "error" in response:
-                    st.error(response["error"])
-                else:
-                    st.error("Ошибка при удалении платежа.")
+        if "message" in response:
+            st.success(response["message"])
+        elif "error" in response:
+            st.error(response["error"])
         else:
-            st.info("Нет доступных платежей для удаления.")
-
-def calculate_free_windows(bookings, start_hour=10, end_hour=1):
-    """
-    Рассчитать свободные окна для ресурса с учётом рабочего времени (10:00 до 01:00 следующего дня).
-    Если end_hour <= start_hour, считаем, что конец рабочего дня наступает на следующий день.
-    """
-
-    # Базовая дата для расчётов (можно любую дату, важны только время)
-    base_date = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # Начало
-    work_start = base_date + timedelta(hours=start_hour)
-
-    # Конец
-    if end_hour <= start_hour:
-        hours_to_end = 24 - (start_hour - end_hour)
-        work_end = work_start + timedelta(hours=hours_to_end)
-    else:
-        
-        work_end = base_date + timedelta(hours=end_hour)
-        if work_end <= work_start:
-            work_end += timedelta(days=1)
-
-    # Преобразуем бронирования в datetime и сортируем
-    reserved_windows = []
-    for booking in bookings:
-        try:
-            reserved_start = datetime.fromisoformat(booking["start_time"])
-            reserved_end = datetime.fromisoformat(booking["end_time"])
-            reserved_windows.append((reserved_start, reserved_end))
-        except Exception:
-            continue
-
-    reserved_windows.sort()
-
-    free_windows = []
-    current_start = work_start
-
-    for reserved_start, reserved_end in reserved_windows:
-        # Если начало брони позже current_start — есть свободный промежуток
-        if reserved_start > current_start:
-            free_windows.append({
-                "start": current_start.strftime("%H:%M"),
-                "end": reserved_start.strftime("%H:%M")
-            })
-        current_start = max(current_start, reserved_end)
-
-    # Проверка свободного времени после последнего бронирования до конца рабочего дня
-    if current_start < work_end:
-        free_windows.append({
-            "start": current_start.strftime("%H:%M"),
-            "end": work_end.strftime("%H:%M")
-        })
-
-    return free_windows
-async def fetch_resource_bookings(resource_id: int, date: str) -> List[Dict]:
-    """Получение информации о бронированиях ресурса на определённую дату."""
-    async with httpx.AsyncClient() as client:
+            st.error("Ошибка при удалении платежа.")
+
+async def fetch_resource_bookings(resource_ids: List[int], date: str, date_to: str = None) -> Dict:
+    """Получение бронирований нескольких ресурсов за дату или интервал дат (сгруппировано по resource_id)."""
+    params = {"resource_id": resource_ids, "date": date}
+    if date_to:
+        params["date_to"] = date_to
+    async with api_client.client() as client:
         response = await client.get(
             f"{API_URL}/resources/bookings",
-            params={"resource_id": resource_id, "date": date},
-            headers={"Authorization": f"Bearer {st.session_state['token']}"}
+            params=params,
+            headers={"Authorization": f"Bearer {api_client.token()}"}
+        )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return {"error": response.text}
+
+async def fetch_resource_availability(resource_ids: List[int], date: str, date_to: str = None, min_minutes: int = 0) -> Dict:
+    """Получение свободных окон ресурсов за дату или интервал дат (сгруппировано по resource_id)."""
+    params = {"resource_id": resource_ids, "date": date, "min_minutes": min_minutes}
+    if date_to:
+        params["date_to"] = date_to
+    async with api_client.client() as client:
+        response = await client.get(
+            f"{API_URL}/resources/availability",
+            params=params,
+            headers={"Authorization": f"Bearer {api_client.token()}"}
         )
         if response.status_code == 200:
             return response.json()
@@ -1083,27 +961,10 @@ async def fetch_resource_bookings(resource_id: int, date: str) -> List[Dict]:
 async def fetch_user_bookings() -> List[Dict]:
     """Получение бронирований текущего пользователя."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.get(
                 f"{API_URL}/user/bookings",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"error": response.text}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
-
-async def fetch_user_bookings_staff(user_id: int) -> List[Dict]:
-    """Получение бронирований конкретного пользователя (для staff)."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/staff/users/{user_id}/bookings",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -1117,27 +978,10 @@ async def fetch_user_bookings_staff(user_id: int) -> List[Dict]:
 async def cancel_booking_staff(booking_id: int) -> Dict:
     """Отмена бронирования (для staff)."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.patch(
                 f"{API_URL}/staff/bookings/{booking_id}/cancel",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"error": response.text}
-    except httpx.HTTPError as http_err:
-        return {"error": f"Ошибка HTTP: {str(http_err)}"}
-    except Exception as e:
-        return {"error": f"Неизвестная ошибка: {str(e)}"}
-
-async def fetch_user_payments(user_id: int) -> List[Dict]:
-    """Получение платежей пользователя (для staff)."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_URL}/staff/users/{user_id}/payments",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -1151,11 +995,11 @@ async def fetch_user_payments(user_id: int) -> List[Dict]:
 async def add_user_payment(user_id: int, payment: Dict) -> Dict:
     """Добавление нового платежа для пользователя (для staff)."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.post(
                 f"{API_URL}/staff/users/{user_id}/payments",
                 json=payment,
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 201:
                 return response.json()
@@ -1169,7 +1013,7 @@ async def add_user_payment(user_id: int, payment: Dict) -> Dict:
 async def start_session_staff(user_id: int, start_time: str) -> Dict:
     """Установка начала сессии для пользователя (для staff)."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             session_data = {
                 "user_id": user_id,
                 "start_time": start_time
@@ -1177,7 +1021,7 @@ async def start_session_staff(user_id: int, start_time: str) -> Dict:
             response = await client.post(
                 f"{API_URL}/staff/sessions/start",
                 json=session_data,
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -1191,11 +1035,11 @@ async def start_session_staff(user_id: int, start_time: str) -> Dict:
 async def end_session_staff(session_id: int, end_time: str) -> Dict:
     """Установка конца сессии для пользователя (для staff)."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.post(
                 f"{API_URL}/staff/sessions/end",
                 params={"session_id": session_id, "end_time": end_time},
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -1206,34 +1050,48 @@ async def end_session_staff(session_id: int, end_time: str) -> Dict:
     except Exception as e:
         return {"error": f"Неизвестная ошибка: {str(e)}"}
 
-async def complete_booking_staff(booking_id: int) -> Dict:
-    """Завершение бронирования (установка статуса 'completed')."""
+async def checkout_staff(user_id: int, record_payment: bool) -> Dict:
+    """Расчёт посещения: закрытие сессии, завершение бронирований, стоимость и платёж."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"{API_URL}/staff/bookings/{booking_id}/complete",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+        async with api_client.client() as client:
+            response = await client.post(
+                f"{API_URL}/staff/checkout",
+                json={"user_id": user_id, "record_payment": record_payment},
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
             else:
-                try:
-                    error_detail = response.json().get("detail", response.text)
-                except:
-                    error_detail = "Неизвестная ошибка"
-                return {"error": error_detail}
+                return {"error": response.text}
     except httpx.HTTPError as http_err:
         return {"error": f"Ошибка HTTP: {str(http_err)}"}
     except Exception as e:
         return {"error": f"Неизвестная ошибка: {str(e)}"}
 
-async def fetch_all_users() -> List[Dict]:
-    """Получение списка всех пользователей (для staff)."""
+async def fetch_open_sessions() -> List[Dict]:
+    """Получение открытых сессий — клиентов, которые сейчас в антикафе."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with api_client.client() as client:
             response = await client.get(
-                f"{API_URL}/admin/users",
-                headers={"Authorization": f"Bearer {st.session_state['token']}"}
+                f"{API_URL}/staff/sessions/open",
+                headers={"Authorization": f"Bearer {api_client.token()}"}
+            )
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": response.text}
+    except httpx.HTTPError as http_err:
+        return {"error": f"Ошибка HTTP: {str(http_err)}"}
+    except Exception as e:
+        return {"error": f"Неизвестная ошибка: {str(e)}"}
+
+async def fetch_staff_dashboard(user_id: int) -> Dict:
+    """Получение данных клиента для экрана сотрудника: сессия, бронирования, платежи и стоимость."""
+    try:
+        async with api_client.client() as client:
+            response = await client.get(
+                f"{API_URL}/staff/users/{user_id}/dashboard",
+                headers={"Authorization": f"Bearer {api_client.token()}"}
             )
             if response.status_code == 200:
                 return response.json()
@@ -1247,62 +1105,41 @@ async def fetch_all_users() -> List[Dict]:
 # --- Страница Staff ---
 def staff_page():
     st.title("Страница Сотрудника")
+
+    # --- Клиенты в зале ---
+    if st.button("Кто сейчас в антикафе"):
+        open_sessions = api_client.run(fetch_open_sessions())
+
+        if "error" in open_sessions:
+            st.error(open_sessions["error"])
+        elif open_sessions:
+            df_open = pd.DataFrame(open_sessions)
+            df_open['start_time'] = pd.to_datetime(df_open['start_time']).dt.strftime('%Y-%m-%d %H:%M')
+            st.dataframe(df_open[['session_id', 'user_id', 'start_time']])
+        else:
+            st.info("Сейчас в антикафе никого нет.")
     
     # --- Выбор пользователя ---
     st.subheader("Выбор пользователя")
     
-    # Загрузка списка пользователей
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    users = loop.run_until_complete(fetch_all_users())
-    loop.close()
-    
-    if "error" in users:
-        st.error(users["error"])
-        users = []
-    
-    if users:
-        user_options = {f"{user['first_name']} {user['last_name']} (ID: {user['user_id']})": user['user_id'] for user in users}
-        selected_user_display = st.selectbox("Выберите пользователя", list(user_options.keys()))
-        selected_user_id = user_options[selected_user_display]
-    else:
-        st.warning("Нет доступных пользователей.")
+    selected_user_id = user_picker("Выберите пользователя", key="staff_user")
+    if selected_user_id is None:
         return
     
     st.markdown("---")
     
+    # --- Данные клиента одним запросом ---
+    dashboard = api_client.run(fetch_staff_dashboard(selected_user_id))
+
+    if "error" in dashboard:
+        st.error(dashboard["error"])
+        return
+
     # --- Управление сессией ---
     st.subheader("Управление сессией пользователя")
-    
-    # Получение активных сессий пользователя
-    async def fetch_active_session(user_id: int) -> Optional[Dict]:
-        """Получение активной сессии пользователя."""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{API_URL}/staff/sessions/active",
-                    params={"user_id": user_id},
-                    headers={"Authorization": f"Bearer {st.session_state['token']}"}
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data if data else None
-                else:
-                    return {"error": response.text}
-        except httpx.HTTPError as http_err:
-            return {"error": f"Ошибка HTTP: {str(http_err)}"}
-        except Exception as e:
-            return {"error": f"Неизвестная ошибка: {str(e)}"}
-    
 
-    # Проверяем наличие активной сессии
-    # Здесь предполагается, что такой маршрут существует
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    active_session = loop.run_until_complete(fetch_active_session(selected_user_id))
-    loop.close()
-    
-    if active_session and "error" not in active_session:
+    active_session = dashboard["active_session"]
+    if active_session:
         st.info(f"Активная сессия: Начало - {active_session['start_time']}")
         if st.button("Установить конец сессии"):
             # Используйте st.date_input и st.time_input для выбора даты и времени
@@ -1310,10 +1147,7 @@ def staff_page():
             end_time = st.time_input("Выберите время окончания сессии", value=datetime.now().time())
             end_datetime = datetime.combine(end_date, end_time)
             end_time_iso = end_datetime.isoformat()
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(end_session_staff(active_session['session_id'], end_time_iso))
-            loop.close()
+            response = api_client.run(end_session_staff(active_session['session_id'], end_time_iso))
             if "error" in response:
                 st.error(response["error"])
             else:
@@ -1326,10 +1160,7 @@ def staff_page():
             start_time = st.time_input("Выберите время начала сессии", value=datetime.now().time())
             start_datetime = datetime.combine(start_date, start_time)
             start_time_iso = start_datetime.isoformat()
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(start_session_staff(selected_user_id, start_time_iso))
-            loop.close()
+            response = api_client.run(start_session_staff(selected_user_id, start_time_iso))
             if "error" in response:
                 st.error(response["error"])
             else:
@@ -1342,48 +1173,27 @@ def staff_page():
     st.subheader("Просмотр и управление бронированиями пользователя")
     
     if st.button("Показать бронирования пользователя"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        user_bookings = loop.run_until_complete(fetch_user_bookings_staff(selected_user_id))
-        loop.close()
-        
-        if "error" in user_bookings:
-            st.error(user_bookings["error"])
+        user_bookings = dashboard["bookings"]
+        if user_bookings:
+            # Преобразуем данные в DataFrame для удобного отображения
+            df_user_bookings = pd.DataFrame(user_bookings)
+            # Преобразуем столбцы с датой и временем в читаемый формат
+            df_user_bookings['start_time'] = pd.to_datetime(df_user_bookings['start_time']).dt.strftime('%Y-%m-%d %H:%M')
+            df_user_bookings['end_time'] = pd.to_datetime(df_user_bookings['end_time']).dt.strftime('%Y-%m-%d %H:%M')
+
+            # Добавим колонку с кнопками для отмены бронирования
+            for index, row in df_user_bookings.iterrows():
+                if st.button(f"Отменить бронирование ID: {row['booking_id']}"):
+                    response = api_client.run(cancel_booking_staff(row['booking_id']))
+                    if "error" in response:
+                        st.error(response["error"])
+                    else:
+                        st.success(f"Бронирование ID: {row['booking_id']} отменено.")
+                        st.rerun()
+
+            st.dataframe(df_user_bookings[['booking_id', 'resource_name', 'start_time', 'end_time', 'status']])
         else:
-            if user_bookings:
-                # Запрос ресурсов для сопоставления resource_id с именами
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                resources = loop.run_until_complete(fetch_resources())
-                loop.close()
-        
-                resource_dict = {resource['resource_id']: resource['name'] for resource in resources} if resources and "error" not in resources else {}
-        
-                # Преобразуем данные в DataFrame для удобного отображения
-                df_user_bookings = pd.DataFrame(user_bookings)
-                # Преобразуем столбцы с датой и временем в читаемый формат
-                df_user_bookings['start_time'] = pd.to_datetime(df_user_bookings['start_time']).dt.strftime('%Y-%m-%d %H:%M')
-                df_user_bookings['end_time'] = pd.to_datetime(df_user_bookings['end_time']).dt.strftime('%Y-%m-%d %H:%M')
-                # Добавим название ресурса
-                df_user_bookings['resource_name'] = df_user_bookings['resource_id'].map(resource_dict).fillna('Неизвестный ресурс')
-                
-                # Добавим колонку с кнопками для отмены бронирования
-                for index, row in df_user_bookings.iterrows():
-                    if row['status'] != 'cancelled':
-                        if st.button(f"Отменить бронирование ID: {row['booking_id']}"):
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            response = loop.run_until_complete(cancel_booking_staff(row['booking_id']))
-                            loop.close()
-                            if "error" in response:
-                                st.error(response["error"])
-                            else:
-                                st.success(f"Бронирование ID: {row['booking_id']} отменено.")
-                                st.rerun()
-                
-                st.dataframe(df_user_bookings[['booking_id', 'resource_name', 'start_time', 'end_time', 'status']])
-            else:
-                st.info("У пользователя нет бронирований.")
+            st.info("У пользователя нет активных бронирований.")
     
     st.markdown("---")
     
@@ -1391,20 +1201,13 @@ def staff_page():
     st.subheader("Просмотр и добавление платежей пользователя")
     
     if st.button("Показать платежи пользователя"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        user_payments = loop.run_until_complete(fetch_user_payments(selected_user_id))
-        loop.close()
-        
-        if "error" in user_payments:
-            st.error(user_payments["error"])
+        user_payments = dashboard["payments"]
+        if user_payments:
+            df_user_payments = pd.DataFrame(user_payments)
+            df_user_payments['payment_date'] = pd.to_datetime(df_user_payments['payment_date']).dt.strftime('%Y-%m-%d %H:%M')
+            st.dataframe(df_user_payments[['payment_id', 'amount', 'payment_date']])
         else:
-            if user_payments:
-                df_user_payments = pd.DataFrame(user_payments)
-                df_user_payments['payment_date'] = pd.to_datetime(df_user_payments['payment_date']).dt.strftime('%Y-%m-%d %H:%M')
-                st.dataframe(df_user_payments[['payment_id', 'amount', 'payment_date']])
-            else:
-                st.info("У пользователя нет платежей.")
+            st.info("У пользователя нет платежей.")
     
     st.markdown("---")
     
@@ -1425,10 +1228,7 @@ def staff_page():
                     "amount": payment_amount,
                     "payment_date": payment_datetime.isoformat()
                 }
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(add_user_payment(selected_user_id, payment_data))
-                loop.close()
+                response = api_client.run(add_user_payment(selected_user_id, payment_data))
                 if "error" in response:
                     st.error(response["error"])
                 else:
@@ -1438,99 +1238,33 @@ def staff_page():
     st.markdown("---")
     
     # --- Расчет стоимости посещения ---
-    st.subheader("Расчет стоимости посещения пользователя")
-    
-    if st.button("Рассчитать стоимость"):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        active_session = loop.run_until_complete(fetch_active_session(selected_user_id))
-        loop.close()
-
-        if active_session and "error" not in active_session:
-            session_start = datetime.fromisoformat(active_session['start_time'])
-            session_duration = datetime.now() - session_start
-            session_minutes = int(session_duration.total_seconds() // 60)
-        else:
-            session_minutes = 0
-
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        active_bookings = loop.run_until_complete(fetch_user_bookings_staff(selected_user_id))
-        loop.close()
-
-        if "error" in active_bookings:
-            st.error(active_bookings["error"])
-            active_bookings = []
-
-        # Получаем ресурсы для определения hourly_rate
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        resources_data = loop.run_until_complete(fetch_resources())
-        loop.close()
-
-        if "error" in resources_data:
-            st.error(resources_data["error"])
-            resources_data = []
-        
-        # Создаём словарь id ресурса -> hourly_rate
-        resource_price = {}
-        for r in resources_data:
-            resource_price[r['resource_id']] = r['hourly_rate']
-
-        # Рассчитываем стоимость бронирований
-        active_booking_minutes = 0
-        booking_cost = 0.0
-        for booking in active_bookings:
-            if booking['status'] == 'active':
-                booking_start = datetime.fromisoformat(booking['start_time'])
-                booking_end = datetime.fromisoformat(booking['end_time'])
-                booking_duration = booking_end - booking_start
-                b_minutes = int(booking_duration.total_seconds() // 60)
-                active_booking_minutes += b_minutes
-
-                # Получаем цену ресурса
-                r_id = booking['resource_id']
-                if r_id in resource_price:
-                    hourly_rate = resource_price[r_id]
-                else:
-                    hourly_rate = 0.0
-                
-                # Цена за бронирование = (минуты / 60) * hourly_rate
-                booking_cost += (b_minutes / 60) * hourly_rate
-
-                # Завершаем бронирование, устанавливаем статус 'completed'
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                complete_response = loop.run_until_complete(complete_booking_staff(booking['booking_id']))
-                loop.close()
-                if "error" in complete_response:
-                    st.error(complete_response["error"])
-
-        # Стоимость сессии
-        rate_per_minute = 5  # 5 руб/минута
-        session_cost = session_minutes * rate_per_minute
+    st.subheader("Расчет стоимости и закрытие посещения")
 
-        # Общая стоимость
-        total_cost = booking_cost + session_cost
+    # Текущая стоимость рассчитана сервером вместе с остальными данными клиента
+    st.write(f"Текущая стоимость пребывания: {dashboard['cost']['total']} рублей.")
+    st.caption("Закрытие посещения завершает открытую сессию и активные бронирования пользователя; отменить это нельзя.")
+    record_payment = st.checkbox("Записать платеж на рассчитанную сумму", value=False)
 
-        # Проверка на стоп-чек
-        stop_check_hours = 3
-        stop_check_max = 900  # руб
-        if (session_minutes + active_booking_minutes) > stop_check_hours * 60:
-            total_cost = stop_check_max
-            st.info(f"Общее время превышает {stop_check_hours} часов. Применен стоп-чек: {stop_check_max} рублей.")
+    if st.button("Рассчитать и закрыть посещение"):
+        # Закрытие сессии, завершение бронирований и платёж — одной транзакцией на сервере
+        result = api_client.run(checkout_staff(selected_user_id, record_payment))
 
-        st.success(f"Общая стоимость пребывания: {total_cost} рублей.")
+        if "error" in result:
+            st.error(result["error"])
+        else:
+            cost = result["cost"]
+            if cost["stop_check"]:
+                st.info(f"Общее время превышает 3 часов. Применен стоп-чек: {cost['total']} рублей.")
+            st.success(f"Общая стоимость пребывания: {cost['total']} рублей.")
+            if result["payment_id"]:
+                st.success(f"Платеж ID: {result['payment_id']} записан.")
 
 def user_page():
 
     st.title("Бронирование оборудования и помещений")
 
     # Запрос ресурсов с сервера
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    resources = loop.run_until_complete(fetch_resources())
-    loop.close()
+    resources = reference("resources")
 
     if "error" in resources:
         st.error(resources["error"])
@@ -1550,14 +1284,12 @@ def user_page():
     
     if st.button("Показать занятые окна"):
         # Запрос информации о бронированиях
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        bookings = loop.run_until_complete(fetch_resource_bookings(selected_resource_id, selected_date.isoformat()))
-        loop.close()
+        grouped_bookings = api_client.run(fetch_resource_bookings([selected_resource_id], selected_date.isoformat()))
 
-        if "error" in bookings:
-            st.error(bookings["error"])
+        if "error" in grouped_bookings:
+            st.error(grouped_bookings["error"])
         else:
+            bookings = grouped_bookings.get(str(selected_resource_id), [])
             # Вывод занятых интервалов бронирования
             if bookings:
                 st.write("Занятые интервалы бронирования:")
@@ -1569,6 +1301,26 @@ def user_page():
             else:
                 st.warning("На выбранную дату ресурс не забронирован. Он свободен в течение всего рабочего дня (10:00 - 01:00).")
 
+    min_minutes = st.number_input("Минимальная длительность окна (мин)", min_value=0, value=30, step=15)
+    if st.button("Показать свободные окна"):
+        # Свободные окна рассчитываются на сервере с учётом рабочего дня 10:00 - 01:00
+        availability = api_client.run(
+            fetch_resource_availability([selected_resource_id], selected_date.isoformat(), min_minutes=int(min_minutes))
+        )
+
+        if "error" in availability:
+            st.error(availability["error"])
+        else:
+            windows = availability.get(str(selected_resource_id), [])
+            if windows:
+                st.write("Свободные окна:")
+                for window in windows:
+                    start_time = datetime.fromisoformat(window["start_time"]).strftime("%H:%M")
+                    end_time = datetime.fromisoformat(window["end_time"]).strftime("%H:%M")
+                    st.write(f"{start_time} - {end_time}")
+            else:
+                st.warning("Свободных окон нужной длительности на выбранную дату нет.")
+
     st.markdown("---")
 
     # Форма для добавления бронирования
@@ -1600,10 +1352,7 @@ def user_page():
                 "end_time": end_datetime.isoformat(),
                 "status": "active"
             }
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(add_booking(booking_data))
-            loop.close()
+            response = api_client.run(add_booking(booking_data))
 
             if "message" in response:
                 st.success(response["message"])
@@ -1637,6 +1386,7 @@ def user_page():
 
 
 def main():
+    api_client.begin_run()
     # Проверяем, есть ли токен и данные пользователя
     if 'token' not in st.session_state:
         st.session_state['token'] = None
@@ -1657,6 +1407,7 @@ def main():
         # Отображение страниц в зависимости от роли
         if st.session_state['user']['role_name'] == 'admin':
             admin_page()
+            reference_cache_panel()
         elif st.session_state['user']['role_name'] == 'staff':
             staff_page()
         else:
@@ -1675,18 +1426,12 @@ def main():
             if st.button("Войти"):
                 if email and password:
                     # Асинхронный вызов для входа
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    success, result = loop.run_until_complete(login_user(email, password))
-                    loop.close()
+                    success, result = api_client.run(login_user(email, password))
                     
                     if success:
                         st.session_state['token'] = result
                         # Получение данных пользователя
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        success, user = loop.run_until_complete(get_current_user(result))
-                        loop.close()
+                        success, user = api_client.run(get_current_user(result))
                         
                         if success:
                             st.session_state['user'] = user
@@ -1714,10 +1459,7 @@ def main():
                     show_error("Пароли не совпадают.")
                 else:
                     # Асинхронный вызов для регистрации
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    success, result = loop.run_until_complete(register_user(first_name, last_name, email, password))
-                    loop.close()
+                    success, result = api_client.run(register_user(first_name, last_name, email, password))
                     
                     if success:
                         show_success("Регистрация прошла успешно! Теперь вы можете войти.")
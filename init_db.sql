@@ -29,14 +29,15 @@ INSERT INTO Roles (role_name, description) VALUES
 CREATE TABLE Payments (
     payment_id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES Users(user_id) ON DELETE CASCADE,
-    amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0)
+    amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0),
+    payment_date TIMESTAMP NOT NULL DEFAULT NOW()
 );
 
 CREATE TABLE Sessions (
     session_id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES Users(user_id) ON DELETE CASCADE,
     start_time TIMESTAMP NOT NULL,
-    end_time TIMESTAMP NOT NULL
+    end_time TIMESTAMP  -- NULL, пока сессия открыта
 );
 
 -- Таблица ресурсов
@@ -44,9 +45,13 @@ CREATE TABLE Resources (
     resource_id SERIAL PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     type VARCHAR(50),
-    description TEXT
+    description TEXT,
+    hourly_rate NUMERIC(10, 2) NOT NULL DEFAULT 0 CHECK (hourly_rate >= 0)
 );
 
+-- Расширение для GiST-индекса по resource_id в ограничении исключения
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 -- Таблица бронирований
 CREATE TABLE Bookings (
     booking_id SERIAL PRIMARY KEY,
@@ -54,9 +59,33 @@ CREATE TABLE Bookings (
     resource_id INT REFERENCES Resources(resource_id),
     start_time TIMESTAMP NOT NULL,
     end_time TIMESTAMP NOT NULL,
-    status VARCHAR(50) DEFAULT 'pending'
+    status VARCHAR(50) DEFAULT 'pending',
+    -- Интервал бронирования [start_time, end_time)
+    period TSRANGE GENERATED ALWAYS AS (tsrange(start_time, end_time, '[)')) STORED,
+    CONSTRAINT bookings_time_order CHECK (end_time > start_time),
+    -- Активные бронирования одного ресурса не могут пересекаться по времени
+    CONSTRAINT bookings_no_overlap EXCLUDE USING gist (resource_id WITH =, period WITH &&)
+        WHERE (status = 'active')
 );
 
+-- Индексы для горячих запросов API (см. migrations/0003_hot_path_indexes.sql)
+CREATE INDEX bookings_resource_start_idx ON Bookings (resource_id, start_time);
+CREATE INDEX bookings_user_start_idx ON Bookings (user_id, start_time DESC);
+CREATE INDEX bookings_user_active_idx ON Bookings (user_id, start_time DESC) WHERE status = 'active';
+CREATE INDEX sessions_user_start_idx ON Sessions (user_id, start_time DESC);
+-- Не больше одной открытой сессии на пользователя (см. migrations/0007_sessions_one_open_per_user.sql)
+CREATE UNIQUE INDEX sessions_open_user_idx ON Sessions (user_id) WHERE end_time IS NULL;
+CREATE INDEX payments_user_date_idx ON Payments (user_id, payment_date DESC);
+-- Индексы постраничных списков (см. migrations/0004_keyset_pagination_indexes.sql)
+CREATE INDEX bookings_start_id_idx ON Bookings (start_time, booking_id);
+CREATE INDEX sessions_start_id_idx ON Sessions (start_time, session_id);
+CREATE INDEX payments_date_id_idx ON Payments (payment_date, payment_id);
+-- Истёкшие активные бронирования для задачи закрытия дня (см. migrations/0005_active_bookings_end_idx.sql)
+CREATE INDEX bookings_active_end_idx ON Bookings (end_time) WHERE status = 'active';
+-- Поиск пользователей по имени и email (см. migrations/0006_users_search_trgm.sql)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX users_search_trgm_idx ON Users USING gin ((first_name || ' ' || last_name || ' ' || email) gin_trgm_ops);
+
 -- Таблица для логирования сессий
 CREATE TABLE session_logs (
     log_id SERIAL PRIMARY KEY,
@@ -65,6 +94,7 @@ CREATE TABLE session_logs (
     event_type TEXT NOT NULL CHECK (event_type IN ('start', 'end')),
     event_time TIMESTAMP NOT NULL DEFAULT NOW()
 );
+CREATE INDEX session_logs_time_id_idx ON session_logs (event_time, log_id);
 
 -- Таблица для логирования бронирований
 CREATE TABLE booking_logs (
@@ -0,0 +1,53 @@
+import asyncio
+from pathlib import Path
+import asyncpg
+from backend.database import DATABASE_CONFIG
+
+# Каталог с версионированными миграциями вида NNNN_описание.sql
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# Миграции с этой пометкой выполняются вне транзакции, по одному оператору
+# (нужно, например, для CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+def split_statements(sql: str):
+    """Разбиение файла миграции на отдельные операторы (без функций и DO-блоков)."""
+    statements = []
+    for chunk in sql.split(";\n"):
+        lines = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith("--")]
+        if lines:
+            statements.append("\n".join(lines))
+    return statements
+
+async def migrate():
+    """Применение ещё не применённых миграций по порядку версий."""
+    conn = await asyncpg.connect(**DATABASE_CONFIG)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+        applied = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            version = path.stem
+            if version in applied:
+                continue
+            print(f"Применение миграции {version}...")
+            sql = path.read_text(encoding="utf-8")
+            if NO_TRANSACTION_MARKER in sql:
+                for statement in split_statements(sql):
+                    await conn.execute(statement)
+                await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", version)
+            else:
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", version)
+            print(f"Миграция {version} применена.")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
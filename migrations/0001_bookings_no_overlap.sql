@@ -0,0 +1,29 @@
+-- migrations/0001_bookings_no_overlap.sql
+-- Ограничение исключения на пересечение активных бронирований одного ресурса.
+--
+-- Перед применением на существующей базе нужно устранить конфликтующие данные:
+--   SELECT * FROM Bookings WHERE end_time <= start_time;
+--   SELECT a.booking_id, b.booking_id FROM Bookings a JOIN Bookings b
+--     ON a.resource_id = b.resource_id AND a.booking_id < b.booking_id
+--    AND a.status = 'active' AND b.status = 'active'
+--    AND a.start_time < b.end_time AND b.start_time < a.end_time;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE Bookings
+    ADD COLUMN IF NOT EXISTS period TSRANGE
+    GENERATED ALWAYS AS (tsrange(start_time, end_time, '[)')) STORED;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'bookings_time_order') THEN
+        ALTER TABLE Bookings ADD CONSTRAINT bookings_time_order CHECK (end_time > start_time);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'bookings_no_overlap') THEN
+        ALTER TABLE Bookings ADD CONSTRAINT bookings_no_overlap
+            EXCLUDE USING gist (resource_id WITH =, period WITH &&)
+            WHERE (status = 'active');
+    END IF;
+END
+$$;
@@ -0,0 +1,8 @@
+-- migrations/0002_align_schema_with_api.sql
+-- Столбцы, которые API уже использует, но которых не было в исходной схеме.
+
+ALTER TABLE Resources ADD COLUMN IF NOT EXISTS hourly_rate NUMERIC(10, 2) NOT NULL DEFAULT 0;
+ALTER TABLE Payments ADD COLUMN IF NOT EXISTS payment_date TIMESTAMP NOT NULL DEFAULT NOW();
+
+-- Открытая сессия хранится с end_time = NULL
+ALTER TABLE Sessions ALTER COLUMN end_time DROP NOT NULL;
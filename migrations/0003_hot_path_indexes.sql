@@ -0,0 +1,30 @@
+-- migrations/0003_hot_path_indexes.sql
+-- migrate: no-transaction
+-- Индексы для горячих запросов API. Создаются CONCURRENTLY, чтобы не блокировать
+-- запись в таблицы на время построения; поэтому миграция идёт вне транзакции.
+-- Если построение прервалось, невалидный индекс нужно удалить (DROP INDEX CONCURRENTLY)
+-- и запустить миграцию повторно.
+
+-- /resources/bookings: бронирования ресурса за интервал времени
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_resource_start_idx
+    ON Bookings (resource_id, start_time);
+
+-- /user/bookings, /staff/users/{id}/bookings: бронирования пользователя, новые сначала
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_user_start_idx
+    ON Bookings (user_id, start_time DESC);
+
+-- /staff/sessions/end: последнее активное бронирование пользователя
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_user_active_idx
+    ON Bookings (user_id, start_time DESC) WHERE status = 'active';
+
+-- Сессии пользователя, новые сначала
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sessions_user_start_idx
+    ON Sessions (user_id, start_time DESC);
+
+-- /staff/sessions/active, /staff/sessions/end: открытые сессии
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sessions_open_user_idx
+    ON Sessions (user_id) WHERE end_time IS NULL;
+
+-- /staff/users/{id}/payments: платежи пользователя, новые сначала
+CREATE INDEX CONCURRENTLY IF NOT EXISTS payments_user_date_idx
+    ON Payments (user_id, payment_date DESC);
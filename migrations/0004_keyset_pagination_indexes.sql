@@ -0,0 +1,21 @@
+-- migrations/0004_keyset_pagination_indexes.sql
+-- migrate: no-transaction
+-- Индексы для постраничных списков администратора: сортировка по (время, id)
+-- и условие курсора (время, id) < ($1, $2) читаются обратным проходом по индексу.
+-- Создаются CONCURRENTLY, как и в 0003_hot_path_indexes.sql.
+
+-- /admin/bookings
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_start_id_idx
+    ON Bookings (start_time, booking_id);
+
+-- /admin/sessions
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sessions_start_id_idx
+    ON Sessions (start_time, session_id);
+
+-- /admin/payments
+CREATE INDEX CONCURRENTLY IF NOT EXISTS payments_date_id_idx
+    ON Payments (payment_date, payment_id);
+
+-- /logs/sessions
+CREATE INDEX CONCURRENTLY IF NOT EXISTS session_logs_time_id_idx
+    ON session_logs (event_time, log_id);
@@ -0,0 +1,8 @@
+-- migrations/0005_active_bookings_end_idx.sql
+-- migrate: no-transaction
+-- Задача закрытия дня (backend/jobs.py) выбирает активные бронирования с end_time <= момента
+-- закрытия. Частичный индекс содержит только активные строки и остаётся маленьким,
+-- пока истёкшие бронирования регулярно завершаются.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_active_end_idx
+    ON Bookings (end_time) WHERE status = 'active';
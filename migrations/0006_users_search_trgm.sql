@@ -0,0 +1,10 @@
+-- migrations/0006_users_search_trgm.sql
+-- migrate: no-transaction
+-- Поиск пользователей /users/search: подстрока имени, фамилии или email (ILIKE '%...%').
+-- Триграммный GIN-индекс по одному выражению обслуживает поиск без полного просмотра Users;
+-- выражение в запросе user_search должно совпадать с выражением индекса.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_search_trgm_idx
+    ON Users USING gin ((first_name || ' ' || last_name || ' ' || email) gin_trgm_ops);
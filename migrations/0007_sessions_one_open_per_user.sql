@@ -0,0 +1,17 @@
+-- migrations/0007_sessions_one_open_per_user.sql
+-- migrate: no-transaction
+-- У пользователя может быть только одна открытая сессия: проверка в /staff/sessions/start
+-- без ограничения в базе пропускает две одновременные вставки из разных процессов.
+-- Индекс sessions_open_user_idx становится уникальным: новый индекс строится без блокировки
+-- записи, затем заменяет старый под тем же именем.
+--
+-- Если у кого-то уже есть несколько открытых сессий, построение индекса завершится ошибкой
+-- и оставит невалидный индекс sessions_open_user_uniq: закройте лишние сессии, удалите
+-- его (DROP INDEX CONCURRENTLY sessions_open_user_uniq) и примените миграцию снова.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS sessions_open_user_uniq
+    ON Sessions (user_id) WHERE end_time IS NULL;
+
+DROP INDEX CONCURRENTLY IF EXISTS sessions_open_user_idx;
+
+ALTER INDEX sessions_open_user_uniq RENAME TO sessions_open_user_idx;
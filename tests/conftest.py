@@ -0,0 +1,24 @@
+# tests/conftest.py
+
+import asyncio
+
+import asyncpg
+import pytest
+
+from backend.database import DATABASE_CONFIG
+
+async def _database_available() -> bool:
+    try:
+        conn = await asyncpg.connect(**DATABASE_CONFIG, timeout=2)
+    except (OSError, asyncpg.PostgresError, asyncio.TimeoutError):
+        return False
+    await conn.close()
+    return True
+
+DATABASE_AVAILABLE = asyncio.run(_database_available())
+
+@pytest.fixture
+def database_required():
+    """Тесты на живой базе (параметры подключения — переменные POSTGRES_*); без базы пропускаются."""
+    if not DATABASE_AVAILABLE:
+        pytest.skip("База данных недоступна")
@@ -0,0 +1,29 @@
+# tests/test_auth.py
+
+import asyncio
+import threading
+
+from backend.auth import PasswordHasher
+
+def test_cancelled_request_keeps_its_slot_until_thread_finishes():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    release = threading.Event()
+
+    async def check():
+        task = asyncio.create_task(hasher.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        # Ожидающий запрос отменён, но bcrypt-поток ещё занят
+        busy = hasher.pending
+        release.set()
+        for _ in range(100):
+            if hasher.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        return busy, hasher.pending
+
+    try:
+        assert asyncio.run(check()) == (1, 0)
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,72 @@
+# tests/test_availability.py
+
+from datetime import date, datetime, time
+
+import pytest
+
+from backend import availability
+from backend.availability import free_windows
+
+DAY = date(2030, 1, 1)
+
+@pytest.fixture(autouse=True)
+def workday(monkeypatch):
+    # Рабочий день по умолчанию: с 10:00 до 01:00 следующих суток
+    monkeypatch.setattr(availability, "OPENING_TIME", time(10, 0))
+    monkeypatch.setattr(availability, "CLOSING_TIME", time(1, 0))
+
+def booking(start: datetime, end: datetime, resource_id: int = 1):
+    return {"resource_id": resource_id, "start_time": start, "end_time": end}
+
+def spans(windows):
+    return [(w["start_time"], w["end_time"]) for w in windows]
+
+def test_empty_day_is_one_window_past_midnight():
+    result = free_windows([], [1], DAY, DAY)
+    assert spans(result[1]) == [(datetime(2030, 1, 1, 10), datetime(2030, 1, 2, 1))]
+
+def test_booking_across_midnight():
+    bookings = [booking(datetime(2030, 1, 1, 23), datetime(2030, 1, 2, 0, 30))]
+    result = free_windows(bookings, [1], DAY, DAY)
+    assert spans(result[1]) == [
+        (datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 23)),
+        (datetime(2030, 1, 2, 0, 30), datetime(2030, 1, 2, 1)),
+    ]
+
+def test_booking_from_previous_night_shifts_next_opening():
+    # Бронирование началось в первый рабочий день и закончилось после открытия второго
+    bookings = [booking(datetime(2030, 1, 2, 0, 30), datetime(2030, 1, 2, 11))]
+    result = free_windows(bookings, [1], DAY, date(2030, 1, 2))
+    assert spans(result[1]) == [
+        (datetime(2030, 1, 1, 10), datetime(2030, 1, 2, 0, 30)),
+        (datetime(2030, 1, 2, 11), datetime(2030, 1, 3, 1)),
+    ]
+
+def test_overlapping_bookings_merge():
+    bookings = [
+        booking(datetime(2030, 1, 1, 12), datetime(2030, 1, 1, 14)),
+        booking(datetime(2030, 1, 1, 13), datetime(2030, 1, 1, 15)),
+        booking(datetime(2030, 1, 1, 13, 30), datetime(2030, 1, 1, 14, 30)),
+    ]
+    result = free_windows(bookings, [1], DAY, DAY)
+    assert spans(result[1]) == [
+        (datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 12)),
+        (datetime(2030, 1, 1, 15), datetime(2030, 1, 2, 1)),
+    ]
+
+def test_fully_booked_day_has_no_windows():
+    bookings = [
+        booking(datetime(2030, 1, 1, 9), datetime(2030, 1, 1, 18)),
+        booking(datetime(2030, 1, 1, 18), datetime(2030, 1, 2, 2)),
+    ]
+    result = free_windows(bookings, [1, 2], DAY, DAY)
+    assert result[1] == []
+    assert spans(result[2]) == [(datetime(2030, 1, 1, 10), datetime(2030, 1, 2, 1))]
+
+def test_short_windows_dropped():
+    bookings = [
+        booking(datetime(2030, 1, 1, 10, 20), datetime(2030, 1, 1, 12)),
+        booking(datetime(2030, 1, 1, 12, 45), datetime(2030, 1, 2, 1)),
+    ]
+    result = free_windows(bookings, [1], DAY, DAY, min_minutes=30)
+    assert spans(result[1]) == [(datetime(2030, 1, 1, 12), datetime(2030, 1, 1, 12, 45))]
@@ -0,0 +1,94 @@
+# tests/test_bulk_bookings.py
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend import bulk_bookings, database
+from backend.bulk_bookings import create_bookings, expand_recurrence
+from backend.models import BookingCreate, RecurrenceRule
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_created_ids_match_their_items(database_required):
+    # Бронирования идут не по времени, одно пересекается с предыдущим: номер каждого
+    # созданного бронирования должен указывать на строку с его же временем
+    base = datetime(2031, 3, 1, 10, 0)
+
+    async def check():
+        pool = await database.create_pool()
+        try:
+            async with pool.acquire() as conn:
+                user_id = await conn.fetchval(
+                    "INSERT INTO Users (first_name, last_name, email, password_hash) "
+                    "VALUES ('Bulk', 'Test', 'bulk-order@test.local', 'x') RETURNING user_id"
+                )
+                resource_id = await conn.fetchval(
+                    "INSERT INTO Resources (name, hourly_rate) VALUES ('bulk-order', 0) RETURNING resource_id"
+                )
+            try:
+                starts = [base + timedelta(hours=offset) for offset in (5, 1, 1, 3, 0)]
+                bookings = [
+                    BookingCreate(user_id=user_id, resource_id=resource_id,
+                                  start_time=start, end_time=start + timedelta(minutes=30))
+                    for start in starts
+                ]
+                result = await create_bookings(pool, bookings, "partial")
+                async with pool.acquire() as conn:
+                    rows = await conn.fetch(
+                        "SELECT booking_id, start_time FROM Bookings WHERE resource_id = $1", resource_id
+                    )
+                return result, {row["booking_id"]: row["start_time"] for row in rows}
+            finally:
+                async with pool.acquire() as conn:
+                    await conn.execute("DELETE FROM Bookings WHERE resource_id = $1", resource_id)
+                    await conn.execute("DELETE FROM Resources WHERE resource_id = $1", resource_id)
+                    await conn.execute("DELETE FROM Users WHERE user_id = $1", user_id)
+        finally:
+            await pool.close()
+
+    result, stored = run(check())
+    assert [item["result"] for item in result["items"]] == ["created", "created", "conflict", "created", "created"]
+    created = [item for item in result["items"] if item["result"] == "created"]
+    assert len(stored) == len(created)
+    for item in created:
+        assert stored[item["booking_id"]] == item["start_time"]
+
+def first_booking() -> BookingCreate:
+    return BookingCreate(user_id=1, resource_id=1,
+                         start_time=datetime(2031, 3, 1, 10), end_time=datetime(2031, 3, 1, 12))
+
+def test_recurrence_by_count():
+    occurrences = expand_recurrence(first_booking(), RecurrenceRule(frequency="weekly", interval=2, count=3))
+    assert [b.start_time for b in occurrences] == [
+        datetime(2031, 3, 1, 10), datetime(2031, 3, 15, 10), datetime(2031, 3, 29, 10),
+    ]
+    assert all(b.end_time - b.start_time == timedelta(hours=2) for b in occurrences)
+
+def test_recurrence_until_is_inclusive():
+    rule = RecurrenceRule(frequency="daily", until=datetime(2031, 3, 3, 10))
+    occurrences = expand_recurrence(first_booking(), rule)
+    assert [b.start_time.day for b in occurrences] == [1, 2, 3]
+
+def test_recurrence_stops_at_first_limit():
+    rule = RecurrenceRule(frequency="daily", count=5, until=datetime(2031, 3, 2, 10))
+    assert len(expand_recurrence(first_booking(), rule)) == 2
+
+@pytest.mark.parametrize("rule", [
+    RecurrenceRule(frequency="monthly", count=2),
+    RecurrenceRule(interval=0, count=2),
+    RecurrenceRule(),
+])
+def test_invalid_recurrence_rejected(rule):
+    with pytest.raises(HTTPException) as error:
+        expand_recurrence(first_booking(), rule)
+    assert error.value.status_code == 400
+
+def test_recurrence_limited_by_max_bulk_bookings(monkeypatch):
+    monkeypatch.setattr(bulk_bookings, "MAX_BULK_BOOKINGS", 3)
+    assert len(expand_recurrence(first_booking(), RecurrenceRule(frequency="daily", count=3))) == 3
+    with pytest.raises(HTTPException):
+        expand_recurrence(first_booking(), RecurrenceRule(frequency="daily", count=4))
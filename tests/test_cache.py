@@ -0,0 +1,44 @@
+# tests/test_cache.py
+
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from backend.cache import OpenSessionIndex
+from backend.database import InvalidationBus
+
+def test_refresh_users_keeps_session_until_fetch_returns():
+    index = OpenSessionIndex()
+    index.opened({"session_id": 1, "user_id": 7, "start_time": datetime(2030, 1, 1, 10), "end_time": None})
+    seen_during_fetch = []
+
+    class Conn:
+        async def fetch(self, sql, *args):
+            seen_during_fetch.append(index.get(7))
+            return [{"session_id": 2, "user_id": 7, "start_time": datetime(2030, 1, 1, 11), "end_time": None}]
+
+    asyncio.run(index.refresh_users(Conn(), [7]))
+    assert seen_during_fetch[0]["session_id"] == 1
+    assert index.get(7)["session_id"] == 2
+
+def test_events_of_one_topic_are_handled_in_order():
+    bus = InvalidationBus("test")
+    handled = []
+
+    async def handler(pool, data):
+        # Первое событие обрабатывается дольше второго
+        await asyncio.sleep(0.05 if data["n"] == 0 else 0)
+        handled.append(data["n"])
+
+    bus.subscribe("topic", handler)
+
+    async def deliver():
+        for n in range(3):
+            payload = json.dumps({"origin": "other", "topic": "topic", "data": {"n": n}, "sent": time.time()})
+            bus._on_notify(None, 0, "test", payload)
+        await asyncio.sleep(0.2)
+        await bus.stop()
+
+    asyncio.run(deliver())
+    assert handled == [0, 1, 2]
@@ -0,0 +1,113 @@
+# tests/test_cache_staleness.py
+#
+# Согласованность кэшей между процессами (database.InvalidationBus): несколько процессов
+# uvicorn на соседних портах, сессии открываются и закрываются через один из них,
+# остальные должны увидеть изменение в /staff/sessions/open не позже STALENESS_BOUND секунд.
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import httpx
+import pytest
+
+from backend.auth import create_access_token
+from backend.database import DATABASE_CONFIG
+
+pytestmark = pytest.mark.usefixtures("database_required")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+ROUNDS = 5
+BASE_PORT = int(os.getenv('STALENESS_BASE_PORT', 8100))
+STALENESS_BOUND = float(os.getenv('STALENESS_BOUND', 1.0))
+POLL_INTERVAL = 0.005
+
+def start_workers():
+    env = dict(os.environ, CLOSING_JOB_ENABLED='0')
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(BASE_PORT + i), "--log-level", "warning"],
+            cwd=ROOT,
+            env=env,
+        )
+        for i in range(WORKERS)
+    ]
+
+def wait_ready(clients):
+    deadline = time.monotonic() + 30
+    for client in clients:
+        while True:
+            try:
+                if client.get("/health/ready").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Процессы не запустились")
+            time.sleep(0.2)
+
+def is_open(client, user_id):
+    return any(s['user_id'] == user_id for s in client.get("/staff/sessions/open").json())
+
+def wait_state(client, user_id, expected):
+    """Время до того, как процесс увидит ожидаемое состояние открытой сессии пользователя."""
+    started = time.perf_counter()
+    while is_open(client, user_id) != expected:
+        if time.perf_counter() - started > STALENESS_BOUND * 10:
+            break
+        time.sleep(POLL_INTERVAL)
+    return time.perf_counter() - started
+
+async def _delete_user(user_id: int):
+    conn = await asyncpg.connect(**DATABASE_CONFIG)
+    try:
+        await conn.execute("DELETE FROM Sessions WHERE user_id = $1", user_id)
+        await conn.execute("DELETE FROM Users WHERE user_id = $1", user_id)
+    finally:
+        await conn.close()
+
+@pytest.fixture
+def workers():
+    clients = []
+    token = create_access_token({"sub": "staleness@test", "role": "staff", "user_id": 0}, timedelta(minutes=30))
+    headers = {"Authorization": f"Bearer {token}"}
+    processes = start_workers()
+    try:
+        clients = [httpx.Client(base_url=f"http://127.0.0.1:{BASE_PORT + i}", headers=headers) for i in range(WORKERS)]
+        wait_ready(clients)
+        yield clients
+    finally:
+        for client in clients:
+            client.close()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+def test_open_sessions_propagate_between_processes(workers):
+    user_id = workers[0].post("/register", json={
+        "first_name": "Test", "last_name": "Staleness",
+        "email": f"staleness-{uuid.uuid4().hex[:8]}@test", "password": "test",
+    }).json()['user_id']
+    try:
+        lags = []
+        for round_no in range(ROUNDS):
+            writer = workers[round_no % WORKERS]
+            readers = [client for client in workers if client is not writer]
+            session = writer.post("/staff/sessions/start", json={
+                "user_id": user_id, "start_time": datetime.now().isoformat(),
+            }).json()
+            lags += [wait_state(reader, user_id, True) for reader in readers]
+            writer.post("/staff/sessions/end", params={
+                "session_id": session['session_id'], "end_time": datetime.now().isoformat(),
+            }).raise_for_status()
+            lags += [wait_state(reader, user_id, False) for reader in readers]
+        assert max(lags) <= STALENESS_BOUND
+    finally:
+        asyncio.run(_delete_user(user_id))
@@ -0,0 +1,58 @@
+# tests/test_database.py
+
+import asyncio
+
+import pytest
+
+from backend import database
+
+pytestmark = pytest.mark.usefixtures("database_required")
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_session_settings_survive_release(monkeypatch):
+    # Пул из одного соединения: второй acquire получает то же физическое соединение
+    # после RESET ALL, который пул выполняет при возврате
+    monkeypatch.setattr(database, "SESSION_SETTINGS", {"statement_timeout": "4321"})
+    monkeypatch.setitem(database.POOL_CONFIG, "min_size", 1)
+    monkeypatch.setitem(database.POOL_CONFIG, "max_size", 1)
+
+    async def check():
+        pool = await database.create_pool()
+        try:
+            values = []
+            pids = []
+            for _ in range(2):
+                async with pool.acquire() as conn:
+                    pids.append(conn.get_server_pid())
+                    values.append(await conn.fetchval("SHOW statement_timeout"))
+            return pids, values
+        finally:
+            await pool.close()
+
+    pids, values = run(check())
+    assert pids[0] == pids[1]
+    assert values == ["4321ms", "4321ms"]
+
+def test_registry_query_prepared_once_per_connection(monkeypatch):
+    # Запрос реестра подготавливается при первом вызове и дальше берётся из кэша asyncpg,
+    # в том числе после возврата соединения в пул
+    monkeypatch.setitem(database.POOL_CONFIG, "min_size", 1)
+    monkeypatch.setitem(database.POOL_CONFIG, "max_size", 1)
+
+    async def check():
+        pool = await database.create_pool()
+        try:
+            for _ in range(3):
+                async with pool.acquire() as conn:
+                    await database.queries.fetch(conn, "role_list")
+            async with pool.acquire() as conn:
+                return await conn.fetchval(
+                    "SELECT count(*) FROM pg_prepared_statements WHERE statement = $1",
+                    database.queries.QUERIES["role_list"],
+                )
+        finally:
+            await pool.close()
+
+    assert run(check()) == 1
@@ -0,0 +1,48 @@
+# tests/test_export.py
+
+import asyncio
+import json
+
+import asyncpg
+import pytest
+
+from backend.database import DATABASE_CONFIG
+from backend.export import export_query, stream_export
+
+pytestmark = pytest.mark.usefixtures("database_required")
+
+async def _export(table: str, fmt: str, user_id: int) -> bytes:
+    pool = await asyncpg.create_pool(**DATABASE_CONFIG, min_size=1, max_size=1)
+    try:
+        sql, args = export_query(table, user_id, None, None)
+        return b"".join([chunk async for chunk in stream_export(pool, sql, args, fmt, compress=False)])
+    finally:
+        await pool.close()
+
+def test_empty_csv_export_has_header():
+    # Пользователя -1 не существует: строк нет, но заголовок отправляется
+    body = asyncio.run(_export("payments", "csv", -1))
+    assert body.decode().splitlines() == ["payment_id,user_id,amount,payment_date"]
+
+def test_empty_ndjson_export_is_empty():
+    assert asyncio.run(_export("payments", "ndjson", -1)) == b""
+
+def test_ndjson_matches_api_encoding():
+    async def check():
+        conn = await asyncpg.connect(**DATABASE_CONFIG)
+        try:
+            user_id = await conn.fetchval(
+                "INSERT INTO Users (first_name, last_name, email, password_hash) "
+                "VALUES ('Export', 'Test', 'export-ndjson@test.local', 'x') RETURNING user_id"
+            )
+            try:
+                await conn.execute("INSERT INTO Payments (user_id, amount) VALUES ($1, 123.45)", user_id)
+                return await _export("payments", "ndjson", user_id)
+            finally:
+                await conn.execute("DELETE FROM Users WHERE user_id = $1", user_id)
+        finally:
+            await conn.close()
+
+    row = json.loads(asyncio.run(check()))
+    # Сумма — число, как в JSON-ответах API (serialization.json_default)
+    assert row["amount"] == 123.45
@@ -0,0 +1,42 @@
+# tests/test_jobs.py
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from backend import database
+from backend.jobs import CLOSING_JOB_LOCK_KEY, ClosingJob
+
+pytestmark = pytest.mark.usefixtures("database_required")
+
+# Cutoff в прошлом: запуск ничего не закрывает, проверяется только выбор исполнителя
+CUTOFF = datetime(2000, 1, 1)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_closing_job_runs_in_one_worker_only():
+    async def check():
+        pool = await database.create_pool()
+        try:
+            async with pool.acquire() as other:
+                # Блокировку держит «другой воркер»: этот запуск пропускается
+                await other.fetchval("SELECT pg_advisory_lock($1)", CLOSING_JOB_LOCK_KEY)
+                skipped = await ClosingJob(10).run_elected(pool, CUTOFF)
+                await other.fetchval("SELECT pg_advisory_unlock($1)", CLOSING_JOB_LOCK_KEY)
+            # Блокировка свободна: запуск выполняется и отпускает её за собой
+            result = await ClosingJob(10).run_elected(pool, CUTOFF)
+            async with pool.acquire() as conn:
+                held = await conn.fetchval(
+                    "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND objid = $1",
+                    CLOSING_JOB_LOCK_KEY,
+                )
+            return skipped, result, held
+        finally:
+            await pool.close()
+
+    skipped, result, held = run(check())
+    assert skipped is None
+    assert result["sessions_closed"] == 0
+    assert held == 0
@@ -0,0 +1,30 @@
+# tests/test_pricing.py
+
+from decimal import Decimal
+
+from backend.pricing import STOP_CHECK_AMOUNT, STOP_CHECK_MINUTES, SESSION_RATE_PER_MINUTE, visit_cost
+
+def test_session_only():
+    cost = visit_cost(30, [])
+    assert cost["session_cost"] == 30 * SESSION_RATE_PER_MINUTE
+    assert cost["booking_minutes"] == 0
+    assert not cost["stop_check"]
+    assert cost["total"] == cost["session_cost"]
+
+def test_bookings_charged_by_hourly_rate():
+    # hourly_rate приходит из базы как Decimal
+    cost = visit_cost(10, [(90, Decimal("200.00")), (20, Decimal("150.00"))])
+    assert cost["booking_minutes"] == 110
+    assert cost["booking_cost"] == 350.0
+    assert cost["total"] == 10 * SESSION_RATE_PER_MINUTE + 350.0
+
+def test_stop_check_applies_only_above_limit():
+    assert not visit_cost(STOP_CHECK_MINUTES - 60, [(60, 100)])["stop_check"]
+    cost = visit_cost(STOP_CHECK_MINUTES - 60, [(61, 100)])
+    assert cost["stop_check"]
+    assert cost["total"] == STOP_CHECK_AMOUNT
+
+def test_costs_rounded_to_kopecks():
+    cost = visit_cost(0, [(1, Decimal("100.00"))])
+    assert cost["booking_cost"] == 1.67
+    assert cost["total"] == 1.67